@@ -8,6 +8,9 @@ import os
 import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def consolidate_phase_1(book_code, stage_1_path, stage_3_path, stage_5a_path, text_kernel_path, output_dir):
     """Consolidate Phase 1 stages into single kernel."""
     
@@ -22,9 +25,8 @@ def consolidate_phase_1(book_code, stage_1_path, stage_3_path, stage_5a_path, te
         stage_5a = json.load(f)
     
     # Get book title from text kernel
-    with open(text_kernel_path, 'r') as f:
-        text_kernel = json.load(f)
-    book_title = text_kernel.get('metadata', {}).get('title', book_code)
+    text_kernel = Kernel.load(text_kernel_path)
+    book_title = text_kernel.metadata.get('title', book_code)
     
     # Assemble phase 1 kernel
     phase_1_kernel = {
@@ -1,16 +1,19 @@
 # phase_1/review_for_drafts.py
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def review_angles_for_drafting(messages_path, kernel_path):
     """Display message angles ready for draft generation."""
     
     with open(messages_path, 'r') as f:
         messages = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     print("="*60)
     print("MESSAGE ANGLES FOR EXPLORATORY DRAFTS")
@@ -3,101 +3,57 @@
 import os
 import json
 import sys
-from anthropic import Anthropic
 
-def generate_audience_profile(kernel_path, prompt_path, output_path):
-    """Generate Stage 1 audience profile using Claude."""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from json_repair import extract_json
+from kernel_model import Kernel
+from llm_gateway import check_api_key, complete, print_api_error, split_prompt
+from prompt_budget import describe, dry_run_args, fit_prompt, print_report
+from stage_inputs import stage_1_devices, stage_1_fields
+
+def generate_audience_profile(kernel_path, prompt_path, output_path, dry_run=False):
+    """Generate Stage 1 audience profile using Claude (dry_run: report prompt size only)."""
     
     # Load kernel
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     # Load prompt template
     with open(prompt_path, 'r') as f:
         prompt_template = f.read()
     
-    # Extract kernel elements (v5.1 structure)
-    metadata = kernel.get('metadata', {})
-    alignment = kernel.get('alignment_pattern', {})
-    devices = kernel.get('micro_devices', [])
-    
-    # Prepare device list (top 8 devices)
-    device_priorities = alignment.get('device_priorities', [])
-    shown_devices = set()
-    device_list_items = []
+    # Fill in kernel details (top 8 devices, down to 5 if over the prompt budget)
+    fields = stage_1_fields(kernel)
     
-    # First show prioritized devices
-    for device_name in device_priorities[:5]:
-        if len(device_list_items) >= 8:
-            break
-        # Find device details
-        for device in devices:
-            if device['name'] == device_name and device_name not in shown_devices:
-                operational_layer = device.get('assigned_section', 'N/A')
-                device_list_items.append(f"- {device['name']} ({operational_layer})")
-                shown_devices.add(device_name)
-                break
+    def fewer_devices(fields):
+        fields['list_of_device_names_and_layers'] = stage_1_devices(kernel, 5)
     
-    # Then show remaining devices if needed
-    for device in devices:
-        if device['name'] not in shown_devices and len(device_list_items) < 8:
-            operational_layer = device.get('assigned_section', 'N/A')
-            device_list_items.append(f"- {device['name']} ({operational_layer})")
-            shown_devices.add(device['name'])
+    prompt, budget = fit_prompt(prompt_template, fields, [('top 5 devices', fewer_devices)])
+    if dry_run:
+        print_report("stage_1", budget)
+        return None
+    print(describe(budget))
     
-    device_list = "\n".join(device_list_items)
-    
-    # Fill in kernel details
-    prompt = prompt_template.format(
-        pattern_from_kernel=alignment.get('pattern_name', 'Not found'),
-        core_dynamic_from_kernel=alignment.get('core_dynamic', 'Not found'),
-        reader_effect_from_kernel=alignment.get('reader_effect', 'Not found'),
-        list_of_device_names_and_layers=device_list
-    )
+    # Static instructions go first as a prompt-cached system prompt, kernel data last
+    system, prompt = split_prompt(prompt)
     
     # Call Claude API
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("ERROR: ANTHROPIC_API_KEY environment variable not set")
-        sys.exit(1)
-    
-    client = Anthropic(api_key=api_key)
+    check_api_key()
     
     print("Calling Claude API for Stage 1: Audience Mapping...")
     print("(This may take 30-60 seconds)\n")
     
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        response_text = complete(
+            "stage_1",
+            prompt,
+            system=system,
             max_tokens=4000,
             temperature=1.0,
-            messages=[{"role": "user", "content": prompt}]
         )
         
-        # Parse response
-        response_text = response.content[0].text
-        
-        # Extract JSON (handle markdown fences)
-        if '```json' in response_text:
-            start = response_text.find('```json') + 7
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        elif '```' in response_text:
-            start = response_text.find('```') + 3
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        else:
-            json_text = response_text.strip()
-        
-        # Try to find JSON object if not in code block
-        if not json_text.startswith('{'):
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-        
+        # Extract JSON (fences, surrounding prose, trailing commas, truncated tail)
         try:
-            audience_profile = json.loads(json_text)
+            audience_profile, repairs = extract_json(response_text)
         except json.JSONDecodeError as e:
             print(f"ERROR: Failed to parse JSON")
             print(f"JSONDecodeError: {e}")
@@ -106,6 +62,8 @@ def generate_audience_profile(kernel_path, prompt_path, output_path):
             with open(f"{output_path}.raw", 'w') as f:
                 f.write(response_text)
             raise e
+        for note in repairs:
+            print(f"⚠ Repaired JSON: {note}")
         
         # Save result
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -120,20 +78,17 @@ def generate_audience_profile(kernel_path, prompt_path, output_path):
         return audience_profile
         
     except Exception as e:
-        print(f"ERROR: API call failed: {e}")
-        print("Check:")
-        print("  1. ANTHROPIC_API_KEY is set")
-        print("  2. Prompt length < 100k tokens")
-        print("  3. Internet connection working")
+        print_api_error(e)
         sys.exit(1)
 
 # Usage
 if __name__ == "__main__":
-    kernel_path = sys.argv[1] if len(sys.argv) > 1 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
-    prompt_path = sys.argv[2] if len(sys.argv) > 2 else "prompts/phase_1/stage_1_audience.txt"
-    output_path = sys.argv[3] if len(sys.argv) > 3 else "outputs/manual_exploration/phase_1/TKAM_stage_1_audience.json"
+    args, dry_run = dry_run_args(sys.argv)
+    kernel_path = args[1] if len(args) > 1 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
+    prompt_path = args[2] if len(args) > 2 else "prompts/phase_1/stage_1_audience.txt"
+    output_path = args[3] if len(args) > 3 else "outputs/manual_exploration/phase_1/TKAM_stage_1_audience.json"
     
-    audience = generate_audience_profile(kernel_path, prompt_path, output_path)
+    audience = generate_audience_profile(kernel_path, prompt_path, output_path, dry_run)
 
 
 
@@ -3,14 +3,30 @@
 import os
 import json
 import sys
-from anthropic import Anthropic
 
-def generate_message_matrix(kernel_path, audience_path, prompt_path, output_path):
-    """Generate Stage 3 message matrix using Claude."""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from json_repair import extract_json
+from json_stream import ArrayItems
+from kernel_model import Kernel
+from llm_gateway import check_api_key, print_api_error, split_prompt, stream
+from prompt_budget import describe, dry_run_args, fit_prompt, print_report
+from stage_inputs import stage_3_devices, stage_3_fields
+
+ANGLE_FIELDS = ['channel', 'message', 'kernel_elements', 'pain_point', 'hook_type', 'why_this_derives']
+
+def check_angle(angle, number):
+    """Report one streamed angle as it arrives, flagging missing fields."""
+    missing = [field for field in ANGLE_FIELDS if not angle.get(field)] if isinstance(angle, dict) else ANGLE_FIELDS
+    if missing:
+        print(f"  ⚠ Angle {number}: missing {', '.join(missing)}")
+    else:
+        print(f"  ✓ Angle {number}: {angle['channel']} - {angle['message'][:70]}")
+
+def generate_message_matrix(kernel_path, audience_path, prompt_path, output_path, dry_run=False):
+    """Generate Stage 3 message matrix using Claude (dry_run: report prompt size only)."""
     
     # Load inputs
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     with open(audience_path, 'r') as f:
         audience = json.load(f)
@@ -18,35 +34,6 @@ def generate_message_matrix(kernel_path, audience_path, prompt_path, output_path
     with open(prompt_path, 'r') as f:
         prompt_template = f.read()
     
-    # Prepare kernel summary (v5.1 structure)
-    alignment = kernel.get('alignment_pattern', {})
-    devices = kernel.get('micro_devices', [])
-    
-    # Get priority devices first
-    device_priorities = alignment.get('device_priorities', [])
-    shown_devices = set()
-    device_list_items = []
-    
-    # Show prioritized devices with effect
-    for device_name in device_priorities[:8]:
-        for device in devices:
-            if device['name'] == device_name and device_name not in shown_devices:
-                operational_layer = device.get('assigned_section', 'N/A')
-                effect = device.get('effect', '')[:80]
-                device_list_items.append(f"- {device['name']} ({operational_layer}): {effect}")
-                shown_devices.add(device_name)
-                break
-    
-    # Add remaining devices if needed
-    for device in devices:
-        if device['name'] not in shown_devices and len(device_list_items) < 8:
-            operational_layer = device.get('assigned_section', 'N/A')
-            effect = device.get('effect', '')[:80]
-            device_list_items.append(f"- {device['name']} ({operational_layer}): {effect}")
-            shown_devices.add(device['name'])
-    
-    device_list = "\n".join(device_list_items)
-    
     # Prepare audience summary
     segments = audience.get('segments', [])
     audience_summary = "\n".join([
@@ -63,76 +50,88 @@ def generate_message_matrix(kernel_path, audience_path, prompt_path, output_path
             search_terms_list.extend(seg.get('search_terms', []))
         high_intent = search_terms_list[:10]
     
-    search_terms = "\n".join([
-        f"- {term}"
-        for term in high_intent[:10]
-    ])
+    def format_searches(count):
+        return "\n".join([
+            f"- {term}"
+            for term in high_intent[:count]
+        ])
     
-    # Fill prompt
-    prompt = prompt_template.format(
-        pattern=alignment.get('pattern_name', 'Not found'),
-        core_dynamic=alignment.get('core_dynamic', 'Not found'),
-        reader_effect=alignment.get('reader_effect', 'Not found'),
-        device_list=device_list,
+    # Fill prompt (top 8 devices and 10 searches, fewer if over the prompt budget)
+    fields = dict(
+        stage_3_fields(kernel),
         audience_segments_summary=audience_summary,
-        search_terms=search_terms
+        search_terms=format_searches(10),
     )
     
-    # Call Claude
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("ERROR: ANTHROPIC_API_KEY environment variable not set")
-        sys.exit(1)
+    def fewer_searches(fields):
+        fields['search_terms'] = format_searches(5)
     
-    client = Anthropic(api_key=api_key)
+    def fewer_devices(fields):
+        fields['device_list'] = stage_3_devices(kernel, 5)
+    
+    prompt, budget = fit_prompt(prompt_template, fields, [
+        ('top 5 searches', fewer_searches),
+        ('top 5 devices', fewer_devices),
+    ])
+    if dry_run:
+        print_report("stage_3", budget)
+        return None
+    print(describe(budget))
+    
+    # Static instructions go first as a prompt-cached system prompt, kernel data last
+    system, prompt = split_prompt(prompt)
+    
+    # Call Claude
+    check_api_key()
     
     print("Calling Claude API for Stage 3: Message Derivation...")
     print("(This may take 60-90 seconds for 12-20 angles)\n")
     
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=6000,
-            temperature=1.0,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        # Parse response
-        response_text = response.content[0].text
-        
-        # Extract JSON
-        if '```json' in response_text:
-            start = response_text.find('```json') + 7
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        elif '```' in response_text:
-            start = response_text.find('```') + 3
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        else:
-            json_text = response_text.strip()
-        
-        # Try to find JSON object if not in code block
-        if not json_text.startswith('{'):
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
+        # Stream the response: each angle is checked and appended to
+        # <output>.partial.jsonl as soon as it is complete
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        partial_path = f"{output_path}.partial.jsonl"
+        angles_stream = ArrayItems('angles')
+        with open(partial_path, 'w') as partial:
+            def on_text(chunk):
+                new = angles_stream.feed(chunk)
+                for number, angle in enumerate(new, len(angles_stream.items) - len(new) + 1):
+                    partial.write(json.dumps(angle) + '\n')
+                    partial.flush()
+                    check_angle(angle, number)
+            
+            response_text, timing = stream(
+                "stage_3",
+                prompt,
+                on_text,
+                system=system,
+                max_tokens=6000,
+                temperature=1.0,
+            )
+        print(f"\nResponse complete in {timing['seconds']:.1f}s (first token after {timing['first_token']:.1f}s)")
         
+        # Extract JSON (fences, surrounding prose, trailing commas, truncated tail)
         try:
-            message_matrix = json.loads(json_text)
+            message_matrix, repairs = extract_json(response_text)
         except json.JSONDecodeError as e:
             print(f"ERROR: Failed to parse JSON")
             print(f"JSONDecodeError: {e}")
             print(f"\nSaving raw response to {output_path}.raw")
             with open(f"{output_path}.raw", 'w') as f:
                 f.write(response_text)
-            raise e
+            if not angles_stream.items:
+                raise e
+            # Beyond repair: keep every angle that arrived complete
+            print(f"⚠ Keeping the {len(angles_stream.items)} complete angle(s) received")
+            message_matrix, repairs = {'angles': angles_stream.items}, []
+        for note in repairs:
+            print(f"⚠ Repaired JSON: {note}")
         
         # Save result
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
         with open(output_path, 'w') as f:
             json.dump(message_matrix, f, indent=2)
+        os.remove(partial_path)
         
         print(f"✓ Message matrix saved to: {output_path}")
         
@@ -150,21 +149,18 @@ def generate_message_matrix(kernel_path, audience_path, prompt_path, output_path
         return message_matrix
         
     except Exception as e:
-        print(f"ERROR: API call failed: {e}")
-        print("Check:")
-        print("  1. ANTHROPIC_API_KEY is set")
-        print("  2. Prompt length < 100k tokens")
-        print("  3. Internet connection working")
+        print_api_error(e)
         sys.exit(1)
 
 # Usage
 if __name__ == "__main__":
-    kernel_path = sys.argv[1] if len(sys.argv) > 1 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
-    audience_path = sys.argv[2] if len(sys.argv) > 2 else "outputs/manual_exploration/phase_1/TKAM_stage_1_audience.json"
-    prompt_path = sys.argv[3] if len(sys.argv) > 3 else "prompts/phase_1/stage_3_messages.txt"
-    output_path = sys.argv[4] if len(sys.argv) > 4 else "outputs/manual_exploration/phase_1/TKAM_stage_3_messages.json"
+    args, dry_run = dry_run_args(sys.argv)
+    kernel_path = args[1] if len(args) > 1 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
+    audience_path = args[2] if len(args) > 2 else "outputs/manual_exploration/phase_1/TKAM_stage_1_audience.json"
+    prompt_path = args[3] if len(args) > 3 else "prompts/phase_1/stage_3_messages.txt"
+    output_path = args[4] if len(args) > 4 else "outputs/manual_exploration/phase_1/TKAM_stage_3_messages.json"
     
-    messages = generate_message_matrix(kernel_path, audience_path, prompt_path, output_path)
+    messages = generate_message_matrix(kernel_path, audience_path, prompt_path, output_path, dry_run)
 
 
 
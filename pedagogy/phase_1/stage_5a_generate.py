@@ -3,170 +3,137 @@
 import os
 import json
 import sys
-from anthropic import Anthropic
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from json_repair import extract_json
+from json_stream import ArrayItems
+from kernel_model import Kernel
+from llm_gateway import check_api_key, print_api_error, split_prompt, stream
+from prompt_budget import describe, dry_run_args, fit_prompt, print_report
+from stage_inputs import preview, stage_5a_devices, stage_5a_fields, stage_5a_title
+
+DRAFT_FIELDS = ['angle_message', 'channel', 'variations']
 
 def load_prompt_template(template_path):
     """Load prompt template from file."""
     with open(template_path, 'r') as f:
         return f.read()
 
-def prepare_kernel_context(kernel):
-    """Extract key kernel elements for prompt (v5.1 structure)."""
-    
-    # Pattern info (v5.1 structure)
-    alignment = kernel.get('alignment_pattern', {})
-    pattern = alignment.get('pattern_name', 'Not found')
-    core_dynamic = alignment.get('core_dynamic', 'Not found')
-    reader_effect = alignment.get('reader_effect', 'Not found')
-    
-    # Get devices (v5.1 uses 'micro_devices')
-    devices = kernel.get('micro_devices', [])
-    
-    # Get priority devices first
-    device_priorities = alignment.get('device_priorities', [])
-    shown_devices = set()
-    device_list_items = []
-    
-    # Show prioritized devices with effect
-    for device_name in device_priorities[:8]:
-        if len(device_list_items) >= 8:
-            break
-        for device in devices:
-            if device['name'] == device_name and device_name not in shown_devices:
-                effect = device.get('effect', 'No effect listed')
-                # Truncate effect to ~100 chars
-                effect_preview = effect[:100] + '...' if len(effect) > 100 else effect
-                device_list_items.append(f"- {device['name']}: {effect_preview}")
-                shown_devices.add(device_name)
-                break
-    
-    # Add remaining devices if needed
-    for device in devices:
-        if device['name'] not in shown_devices and len(device_list_items) < 8:
-            effect = device.get('effect', 'No effect listed')
-            effect_preview = effect[:100] + '...' if len(effect) > 100 else effect
-            device_list_items.append(f"- {device['name']}: {effect_preview}")
-            shown_devices.add(device['name'])
-    
-    device_list = "\n".join(device_list_items)
-    
-    # Sample quotes (first 5 devices with anchor_phrase)
-    quotes = []
-    quote_count = 0
-    for device_name in device_priorities[:5]:
-        if quote_count >= 5:
-            break
-        for device in devices:
-            if device['name'] == device_name and 'anchor_phrase' in device:
-                quote = device['anchor_phrase']
-                # Truncate quote to ~80 chars
-                quote_preview = quote[:80] + '...' if len(quote) > 80 else quote
-                quotes.append(f'"{quote_preview}" — {device["name"]}')
-                quote_count += 1
-                break
-    
-    # Add more quotes from remaining devices if needed
-    for device in devices:
-        if quote_count >= 5:
-            break
-        if device['name'] not in [q.split(' — ')[1] for q in quotes] and 'anchor_phrase' in device:
-            quote = device['anchor_phrase']
-            quote_preview = quote[:80] + '...' if len(quote) > 80 else quote
-            quotes.append(f'"{quote_preview}" — {device["name"]}')
-            quote_count += 1
-    
-    quote_list = "\n".join(quotes) if quotes else "See device entries for quotes"
-    
-    return {
-        'kernel_pattern': pattern,
-        'core_dynamic': core_dynamic,
-        'reader_effect': reader_effect,
-        'device_list_with_effects': device_list,
-        'sample_quotes': quote_list
-    }
+def check_draft(draft, number):
+    """Report one streamed draft as it arrives, flagging missing fields."""
+    missing = [field for field in DRAFT_FIELDS if not draft.get(field)] if isinstance(draft, dict) else DRAFT_FIELDS
+    if missing:
+        print(f"  ⚠ Draft {number}: missing {', '.join(missing)}")
+    else:
+        print(f"  ✓ Draft {number}: {draft['channel']} - {len(draft['variations'])} variation(s) "
+              f"for \"{preview(draft['angle_message'], 60)}\"")
 
-def generate_exploratory_drafts(messages_path, kernel_path, prompt_path, output_path):
-    """Generate Stage 5A exploratory drafts with selection-first approach."""
+def generate_exploratory_drafts(messages_path, kernel_path, prompt_path, output_path, dry_run=False):
+    """Generate Stage 5A exploratory drafts with selection-first approach (dry_run: report prompt size only)."""
     
     # Load inputs
     with open(messages_path, 'r') as f:
         messages = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     # Get book title from kernel metadata
-    metadata = kernel.get('metadata', {})
-    book_title = metadata.get('title', 'Unknown Book')
+    book_title = stage_5a_title(kernel)
     
     # Prepare prompt
     template = load_prompt_template(prompt_path)
-    kernel_context = prepare_kernel_context(kernel)
+    kernel_context = stage_5a_fields(kernel)
     
     # Format angles JSON
     angles = messages.get('angles', [])
     
-    # Format template (book_title will be replaced after due to escaping)
-    prompt = template.format(
-        angles_json=json.dumps(angles, indent=2),
-        **kernel_context
-    )
-    # Replace the placeholder with actual book title
-    prompt = prompt.replace("___BOOK_TITLE_PLACEHOLDER___", book_title)
+    # Format template (book_title will be replaced after due to escaping).
+    # Over the prompt budget: compact JSON, then leaner angles, then fewer devices
+    fields = dict(angles_json=json.dumps(angles, indent=2), **kernel_context)
     
-    # Call API
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("ERROR: ANTHROPIC_API_KEY environment variable not set")
-        sys.exit(1)
+    def render(fields):
+        # Replace the placeholder with actual book title
+        return template.format(**fields).replace("___BOOK_TITLE_PLACEHOLDER___", book_title)
+    
+    def compact_angles(fields):
+        fields['angles_json'] = json.dumps(angles, ensure_ascii=False)
+    
+    def lean_angles(fields):
+        lean = [{k: v for k, v in angle.items() if k != 'why_this_derives'} for angle in angles]
+        fields['angles_json'] = json.dumps(lean, ensure_ascii=False)
+    
+    def fewer_devices(fields):
+        fields['device_list_with_effects'] = stage_5a_devices(kernel, 5, 60)
+    
+    prompt, budget = fit_prompt(template, fields, [
+        ('compact angles JSON', compact_angles),
+        ('angles without why_this_derives', lean_angles),
+        ('top 5 devices, effects cut to 60 chars', fewer_devices),
+    ], render=render)
+    if dry_run:
+        print_report("stage_5a", budget)
+        return None
+    print(describe(budget))
     
-    client = Anthropic(api_key=api_key)
+    # Static instructions go first as a prompt-cached system prompt, kernel data last
+    system, prompt = split_prompt(prompt)
+    
+    # Call API
+    check_api_key()
     
     print("Generating exploratory drafts...")
     print(f"Reviewing {len(angles)} angles, selecting 2-3 per channel for drafting...")
     
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=16000,
-            temperature=1.0,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        # Extract JSON from response
-        response_text = response.content[0].text
+        # Stream the response: each draft is checked and appended to
+        # <output>.partial.jsonl as soon as it is complete
+        os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
+        partial_path = f"{output_path}.partial.jsonl"
+        drafts_stream = ArrayItems('drafts')
+        with open(partial_path, 'w') as partial:
+            def on_text(chunk):
+                new = drafts_stream.feed(chunk)
+                for number, draft in enumerate(new, len(drafts_stream.items) - len(new) + 1):
+                    partial.write(json.dumps(draft) + '\n')
+                    partial.flush()
+                    check_draft(draft, number)
+            
+            response_text, timing = stream(
+                "stage_5a",
+                prompt,
+                on_text,
+                system=system,
+                max_tokens=16000,
+                temperature=1.0,
+            )
+        print(f"\nResponse complete in {timing['seconds']:.1f}s (first token after {timing['first_token']:.1f}s)")
         
         # Save raw response
         raw_path = output_path.replace('.json', '.raw')
-        os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
         with open(raw_path, 'w') as f:
             f.write(response_text)
         print(f"Raw response saved: {raw_path}")
         
         # Parse JSON
         try:
-            # Handle markdown fences
-            if '```json' in response_text:
-                json_start = response_text.find('```json') + 7
-                json_end = response_text.find('```', json_start)
-                response_text = response_text[json_start:json_end]
-            elif '```' in response_text:
-                json_start = response_text.find('```') + 3
-                json_end = response_text.find('```', json_start)
-                response_text = response_text[json_start:json_end]
-            
-            # Try to find JSON object if not in code block
-            if not response_text.strip().startswith('{'):
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    response_text = response_text[json_start:json_end]
-            
-            drafts = json.loads(response_text.strip())
+            # Extract JSON (fences, surrounding prose, trailing commas, truncated tail)
+            try:
+                drafts, repairs = extract_json(response_text)
+            except json.JSONDecodeError as e:
+                if not drafts_stream.items:
+                    raise
+                # Beyond repair: keep every draft that arrived complete
+                print(f"JSON parse error: {e}")
+                print(f"⚠ Keeping the {len(drafts_stream.items)} complete draft(s) received")
+                drafts, repairs = {'stage': '5A', 'drafts': drafts_stream.items}, []
+            for note in repairs:
+                print(f"⚠ Repaired JSON: {note}")
+            drafts['book_title'] = book_title   # Kept out of the cached instructions
             
             # Save parsed output
             with open(output_path, 'w') as f:
                 json.dump(drafts, f, indent=2)
+            os.remove(partial_path)
             
             print(f"Drafts saved: {output_path}")
             draft_list = drafts.get('drafts', [])
@@ -186,20 +153,17 @@ def generate_exploratory_drafts(messages_path, kernel_path, prompt_path, output_
             return None
             
     except Exception as e:
-        print(f"ERROR: API call failed: {e}")
-        print("Check:")
-        print("  1. ANTHROPIC_API_KEY is set")
-        print("  2. Prompt length < 100k tokens")
-        print("  3. Internet connection working")
+        print_api_error(e)
         sys.exit(1)
 
 # Usage
 if __name__ == "__main__":
-    messages_path = sys.argv[1] if len(sys.argv) > 1 else "outputs/manual_exploration/phase_1/TKAM_stage_3_messages.json"
-    kernel_path = sys.argv[2] if len(sys.argv) > 2 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
-    prompt_path = sys.argv[3] if len(sys.argv) > 3 else "prompts/phase_1/stage_5a_exploratory.txt"
-    output_path = sys.argv[4] if len(sys.argv) > 4 else "outputs/manual_exploration/phase_1/TKAM_stage_5a_drafts.json"
+    args, dry_run = dry_run_args(sys.argv)
+    messages_path = args[1] if len(args) > 1 else "outputs/manual_exploration/phase_1/TKAM_stage_3_messages.json"
+    kernel_path = args[2] if len(args) > 2 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
+    prompt_path = args[3] if len(args) > 3 else "prompts/phase_1/stage_5a_exploratory.txt"
+    output_path = args[4] if len(args) > 4 else "outputs/manual_exploration/phase_1/TKAM_stage_5a_drafts.json"
     
-    drafts = generate_exploratory_drafts(messages_path, kernel_path, prompt_path, output_path)
+    drafts = generate_exploratory_drafts(messages_path, kernel_path, prompt_path, output_path, dry_run)
 
 
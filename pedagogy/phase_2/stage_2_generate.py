@@ -3,10 +3,14 @@
 import os
 import json
 import sys
-from anthropic import Anthropic
 
-def generate_channel_strategy(thread_path, prompt_path, output_path):
-    """Generate Stage 2 channel strategy from thread."""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from json_repair import extract_json
+from llm_gateway import check_api_key, complete, print_api_error, split_prompt
+from prompt_budget import describe, dry_run_args, fit_prompt, print_report
+
+def generate_channel_strategy(thread_path, prompt_path, output_path, dry_run=False):
+    """Generate Stage 2 channel strategy from thread (dry_run: report prompt size only)."""
     
     # Load thread
     with open(thread_path, 'r') as f:
@@ -17,61 +21,46 @@ def generate_channel_strategy(thread_path, prompt_path, output_path):
         prompt_template = f.read()
     
     # Fill prompt
-    prompt = prompt_template.format(
-        core_message=thread['core_message'],
-        agitation_register=thread['agitation_register'],
-        solution_register=thread['solution_register'],
-        kernel_pattern_reference=thread.get('kernel_pattern_reference', '')
-    )
+    prompt, budget = fit_prompt(prompt_template, {
+        'core_message': thread['core_message'],
+        'agitation_register': thread['agitation_register'],
+        'solution_register': thread['solution_register'],
+        'kernel_pattern_reference': thread.get('kernel_pattern_reference', ''),
+    })
+    if dry_run:
+        print_report("stage_2", budget)
+        return None
+    print(describe(budget))
     
-    # Call Claude
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("ERROR: ANTHROPIC_API_KEY environment variable not set")
-        sys.exit(1)
+    # Static instructions go first as a prompt-cached system prompt, kernel data last
+    system, prompt = split_prompt(prompt)
     
-    client = Anthropic(api_key=api_key)
+    # Call Claude
+    check_api_key()
     
     print("Calling Claude API for Stage 2: Channel Strategy...")
     print("(This may take 45-60 seconds)\n")
     
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        response_text = complete(
+            "stage_2",
+            prompt,
+            system=system,
             max_tokens=4000,
             temperature=1.0,
-            messages=[{"role": "user", "content": prompt}]
         )
         
-        # Parse
-        response_text = response.content[0].text
-        
-        if '```json' in response_text:
-            start = response_text.find('```json') + 7
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        elif '```' in response_text:
-            start = response_text.find('```') + 3
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        else:
-            json_text = response_text.strip()
-        
-        # Try to find JSON object if not in code block
-        if not json_text.startswith('{'):
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-        
+        # Extract JSON (fences, surrounding prose, trailing commas, truncated tail)
         try:
-            channels = json.loads(json_text)
+            channels, repairs = extract_json(response_text)
         except json.JSONDecodeError as e:
             print(f"ERROR: Failed to parse JSON")
             print(f"JSONDecodeError: {e}")
             with open(f"{output_path}.raw", 'w') as f:
                 f.write(response_text)
             raise e
+        for note in repairs:
+            print(f"⚠ Repaired JSON: {note}")
         
         # Save
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -87,17 +76,14 @@ def generate_channel_strategy(thread_path, prompt_path, output_path):
         return channels
         
     except Exception as e:
-        print(f"ERROR: API call failed: {e}")
-        print("Check:")
-        print("  1. ANTHROPIC_API_KEY is set")
-        print("  2. Prompt length < 100k tokens")
-        print("  3. Internet connection working")
+        print_api_error(e)
         sys.exit(1)
 
 # Usage
 if __name__ == "__main__":
-    thread_path = sys.argv[1] if len(sys.argv) > 1 else "outputs/manual_exploration/phase_2/TKAM_stage_4_thread.json"
-    prompt_path = sys.argv[2] if len(sys.argv) > 2 else "prompts/phase_2/stage_2_channels.txt"
-    output_path = sys.argv[3] if len(sys.argv) > 3 else "outputs/manual_exploration/phase_2/TKAM_stage_2_channels.json"
+    args, dry_run = dry_run_args(sys.argv)
+    thread_path = args[1] if len(args) > 1 else "outputs/manual_exploration/phase_2/TKAM_stage_4_thread.json"
+    prompt_path = args[2] if len(args) > 2 else "prompts/phase_2/stage_2_channels.txt"
+    output_path = args[3] if len(args) > 3 else "outputs/manual_exploration/phase_2/TKAM_stage_2_channels.json"
     
-    channels = generate_channel_strategy(thread_path, prompt_path, output_path)
+    channels = generate_channel_strategy(thread_path, prompt_path, output_path, dry_run)
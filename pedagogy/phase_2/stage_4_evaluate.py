@@ -3,9 +3,15 @@
 import os
 import json
 import sys
-from anthropic import Anthropic
 
-def evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_path, drafts_5a_path):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from json_repair import extract_json
+from kernel_model import Kernel
+from llm_gateway import check_api_key, complete, print_api_error, split_prompt
+from prompt_budget import describe, dry_run_args, fit_prompt, print_report
+from stage_inputs import stage_4_fields
+
+def evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_path, drafts_5a_path, dry_run=False):
     """
     Evaluate angles and select winning thread.
     
@@ -15,14 +21,14 @@ def evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_p
         prompt_path: Stage 4 evaluation prompt template
         output_path: Where to save evaluation results
         drafts_5a_path: Stage 5A drafts JSON (determines which angles to evaluate)
+        dry_run: Only report the prompt's estimated size, per section
     """
     
     # Load inputs
     with open(messages_path, 'r') as f:
         messages = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     with open(prompt_path, 'r') as f:
         prompt_template = f.read()
@@ -77,70 +83,51 @@ def evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_p
     # Fill prompt
     num_angles = len(angles_to_evaluate)
     
-    # Extract kernel pattern (v5.1 structure)
-    alignment = kernel.get('alignment_pattern', {})
-    pattern_name = alignment.get('pattern_name', 'Not found')
-    core_dynamic = alignment.get('core_dynamic', 'Not found')
-    reader_effect = alignment.get('reader_effect', 'Not found')
-    
-    kernel_pattern = f"Pattern: {pattern_name}\nCore Dynamic: {core_dynamic}\nReader Effect: {reader_effect}"
-    
-    prompt = prompt_template.format(
+    fields = dict(
+        stage_4_fields(kernel),
         num_angles=num_angles,
         json_of_all_angles=json.dumps(angles_to_evaluate, indent=2),
-        kernel_pattern=kernel_pattern
     )
     
-    # Call Claude
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("ERROR: ANTHROPIC_API_KEY environment variable not set")
-        sys.exit(1)
+    def compact_angles(fields):
+        fields['json_of_all_angles'] = json.dumps(angles_to_evaluate, ensure_ascii=False)
+    
+    prompt, budget = fit_prompt(prompt_template, fields, [('compact angles JSON', compact_angles)])
+    if dry_run:
+        print_report("stage_4", budget)
+        return None
+    print(describe(budget))
     
-    client = Anthropic(api_key=api_key)
+    # Static instructions go first as a prompt-cached system prompt, kernel data last
+    system, prompt = split_prompt(prompt)
+    
+    # Call Claude
+    check_api_key()
     
     print("Calling Claude API for Stage 4: Thread Selection...")
     print(f"Evaluating {num_angles} angles...")
     print("(This may take 90-120 seconds)\n")
     
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        response_text = complete(
+            "stage_4",
+            prompt,
+            system=system,
             max_tokens=8000,
             temperature=0.5,  # Lower temp for evaluation
-            messages=[{"role": "user", "content": prompt}]
         )
         
-        # Parse response
-        response_text = response.content[0].text
-        
-        # Extract JSON
-        if '```json' in response_text:
-            start = response_text.find('```json') + 7
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        elif '```' in response_text:
-            start = response_text.find('```') + 3
-            end = response_text.find('```', start)
-            json_text = response_text[start:end].strip()
-        else:
-            json_text = response_text.strip()
-        
-        # Try to find JSON object if not in code block
-        if not json_text.startswith('{'):
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-        
+        # Extract JSON (fences, surrounding prose, trailing commas, truncated tail)
         try:
-            evaluations = json.loads(json_text)
+            evaluations, repairs = extract_json(response_text)
         except json.JSONDecodeError as e:
             print(f"ERROR: Failed to parse JSON")
             print(f"JSONDecodeError: {e}")
             with open(f"{output_path}.raw", 'w') as f:
                 f.write(response_text)
             raise e
+        for note in repairs:
+            print(f"⚠ Repaired JSON: {note}")
         
         # Save full evaluation
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -163,19 +150,16 @@ def evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_p
         return evaluations
         
     except Exception as e:
-        print(f"ERROR: API call failed: {e}")
-        print("Check:")
-        print("  1. ANTHROPIC_API_KEY is set")
-        print("  2. Prompt length < 100k tokens")
-        print("  3. Internet connection working")
+        print_api_error(e)
         sys.exit(1)
 
 # Usage
 if __name__ == "__main__":
-    messages_path = sys.argv[1] if len(sys.argv) > 1 else "outputs/manual_exploration/phase_1/TKAM_stage_3_messages.json"
-    kernel_path = sys.argv[2] if len(sys.argv) > 2 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
-    prompt_path = sys.argv[3] if len(sys.argv) > 3 else "prompts/phase_2/stage_4_selection.txt"
-    output_path = sys.argv[4] if len(sys.argv) > 4 else "outputs/manual_exploration/phase_2/TKAM_stage_4_evaluations.json"
-    drafts_5a_path = sys.argv[5] if len(sys.argv) > 5 else "outputs/manual_exploration/phase_1/TKAM_stage_5a_drafts.json"
-    
-    evaluations = evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_path, drafts_5a_path)
+    args, dry_run = dry_run_args(sys.argv)
+    messages_path = args[1] if len(args) > 1 else "outputs/manual_exploration/phase_1/TKAM_stage_3_messages.json"
+    kernel_path = args[2] if len(args) > 2 else "To_Kill_a_Mockingbird_kernel_v5_1.json"
+    prompt_path = args[3] if len(args) > 3 else "prompts/phase_2/stage_4_selection.txt"
+    output_path = args[4] if len(args) > 4 else "outputs/manual_exploration/phase_2/TKAM_stage_4_evaluations.json"
+    drafts_5a_path = args[5] if len(args) > 5 else "outputs/manual_exploration/phase_1/TKAM_stage_5a_drafts.json"
+    
+    evaluations = evaluate_and_select_thread(messages_path, kernel_path, prompt_path, output_path, drafts_5a_path, dry_run)
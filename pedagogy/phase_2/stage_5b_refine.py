@@ -3,7 +3,10 @@
 import json
 import os
 import sys
-from anthropic import Anthropic
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from llm_gateway import PROMPT_INPUT_MARKER, cacheable, check_api_key, complete, print_api_error
+from prompt_budget import describe, dry_run_args, fit_prompt, print_report
 
 # Channel definitions - embedded, not external
 CHANNEL_DEFINITIONS = {
@@ -191,8 +194,8 @@ def parse_markdown_to_json(markdown_text, book_title):
     
     return result
 
-def refine_with_constraints(starting_path, channels_path, thread_path, prompt_path, output_path):
-    """Apply Stage 5B refinement."""
+def refine_with_constraints(starting_path, channels_path, thread_path, prompt_path, output_path, dry_run=False):
+    """Apply Stage 5B refinement (dry_run: report prompt size only)."""
     
     # Load inputs
     with open(starting_path, 'r') as f:
@@ -222,46 +225,49 @@ def refine_with_constraints(starting_path, channels_path, thread_path, prompt_pa
                 return v
         return {}
     
-    # Prepare prompt
-    social_channel = get_channel_data('social')
-    youtube_channel = get_channel_data('youtube')
-    seo_channel = get_channel_data('seo')
-    guide_channel = get_channel_data('guide')
-    
-    social_draft_data = get_draft('social')
-    youtube_draft_data = get_draft('youtube')
-    seo_draft_data = get_draft('seo')
-    guide_draft_data = get_draft('guide')
-    
     # Build channel format requirements
     channel_formats = build_channel_prompt_section()
     
-    # Build base prompt from template using string replacement to avoid brace escaping issues
-    base_prompt = template
-    base_prompt = base_prompt.replace('{core_message}', thread['core_message'])
-    base_prompt = base_prompt.replace('{agitation_register}', thread['agitation_register'])
-    base_prompt = base_prompt.replace('{solution_register}', thread['solution_register'])
-    base_prompt = base_prompt.replace('{starting_drafts_json}', json.dumps(drafts, indent=2))
-    base_prompt = base_prompt.replace('{channel_strategy_json}', json.dumps(channels, indent=2))
-    base_prompt = base_prompt.replace('{social_draft}', json.dumps(social_draft_data, indent=2))
-    base_prompt = base_prompt.replace('{social_job}', social_channel.get('job', 'Not defined'))
-    base_prompt = base_prompt.replace('{social_must_do}', json.dumps(social_channel.get('must_do', [])))
-    base_prompt = base_prompt.replace('{social_must_not_do}', json.dumps(social_channel.get('must_not_do', [])))
-    base_prompt = base_prompt.replace('{youtube_draft}', json.dumps(youtube_draft_data, indent=2))
-    base_prompt = base_prompt.replace('{youtube_job}', youtube_channel.get('job', 'Not defined'))
-    base_prompt = base_prompt.replace('{youtube_must_do}', json.dumps(youtube_channel.get('must_do', [])))
-    base_prompt = base_prompt.replace('{youtube_must_not_do}', json.dumps(youtube_channel.get('must_not_do', [])))
-    base_prompt = base_prompt.replace('{seo_draft}', json.dumps(seo_draft_data, indent=2))
-    base_prompt = base_prompt.replace('{seo_job}', seo_channel.get('job', 'Not defined'))
-    base_prompt = base_prompt.replace('{seo_must_do}', json.dumps(seo_channel.get('must_do', [])))
-    base_prompt = base_prompt.replace('{seo_must_not_do}', json.dumps(seo_channel.get('must_not_do', [])))
-    base_prompt = base_prompt.replace('{guide_draft}', json.dumps(guide_draft_data, indent=2))
-    base_prompt = base_prompt.replace('{guide_job}', guide_channel.get('job', 'Not defined'))
-    base_prompt = base_prompt.replace('{guide_must_do}', json.dumps(guide_channel.get('must_do', [])))
-    base_prompt = base_prompt.replace('{guide_must_not_do}', json.dumps(guide_channel.get('must_not_do', [])))
+    # Template fields, filled by string replacement to avoid brace escaping issues
+    def channel_fields(drafts_json):
+        fields = {
+            'core_message': thread['core_message'],
+            'agitation_register': thread['agitation_register'],
+            'solution_register': thread['solution_register'],
+            'starting_drafts_json': drafts_json(drafts),
+            'channel_strategy_json': drafts_json(channels),
+        }
+        for channel in ['social', 'youtube', 'seo', 'guide']:
+            channel_data = get_channel_data(channel)
+            fields[f'{channel}_draft'] = drafts_json(get_draft(channel))
+            fields[f'{channel}_job'] = channel_data.get('job', 'Not defined')
+            fields[f'{channel}_must_do'] = json.dumps(channel_data.get('must_do', []))
+            fields[f'{channel}_must_not_do'] = json.dumps(channel_data.get('must_not_do', []))
+        return fields
+    
+    def render(fields):
+        base_prompt = template
+        for name, value in fields.items():
+            base_prompt = base_prompt.replace('{' + name + '}', value)
+        return base_prompt
+    
+    # Over the prompt budget: drop alternate variations, then compact the
+    # JSON, then the STARTING DRAFTS block (each draft is repeated per channel)
+    def lean(value):
+        if isinstance(value, dict):
+            return {k: lean(v) for k, v in value.items() if k != 'all_variations'}
+        return value
+    
+    def drop_variations(fields):
+        fields.update(channel_fields(lambda value: json.dumps(lean(value), indent=2)))
     
-    # Add channel format requirements to prompt
-    prompt = base_prompt + """
+    def compact_json(fields):
+        fields.update(channel_fields(lambda value: json.dumps(lean(value), ensure_ascii=False)))
+    
+    def drop_starting_drafts(fields):
+        fields['starting_drafts_json'] = '(see CHANNEL DRAFTS AND CONSTRAINTS below)'
+    
+    format_requirements = """
 
 ## CRITICAL: Channel Format Requirements
 
@@ -292,28 +298,38 @@ You know TKAM feels different from other memory books—but you can't put your f
 ```
 
 """
+    prompt, budget = fit_prompt(template, channel_fields(lambda value: json.dumps(value, indent=2)), [
+        ('starting drafts without all_variations', drop_variations),
+        ('compact JSON', compact_json),
+        ('STARTING DRAFTS block (repeated per channel)', drop_starting_drafts),
+    ], system=format_requirements, render=render)
+    if dry_run:
+        print_report("stage_5b", budget)
+        return None
+    print(describe(budget))
     
-    # Call API
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("ERROR: ANTHROPIC_API_KEY environment variable not set")
-        sys.exit(1)
+    # Static instructions plus channel format requirements form the prompt-cached
+    # system prompt; the thread, drafts and channel jobs are the user message
+    instructions, _, prompt = prompt.partition(PROMPT_INPUT_MARKER)
+    prompt = prompt.strip()
+    instructions = instructions.strip() + format_requirements
+    system = cacheable(instructions)
     
-    client = Anthropic(api_key=api_key)
+    # Call API
+    check_api_key()
     
     print("Refining content with constraints...")
     print("(This may take 60-90 seconds)\n")
     
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        response_text = complete(
+            "stage_5b",
+            prompt,
+            system=system,
             max_tokens=6000,
             temperature=0.7,
-            messages=[{"role": "user", "content": prompt}]
         )
         
-        response_text = response.content[0].text
-        
         # Extract book title from file path or use default
         book_title = "To Kill a Mockingbird"  # Default
         if "TKAM" in starting_path.upper():
@@ -386,20 +402,17 @@ You know TKAM feels different from other memory books—but you can't put your f
             return None
             
     except Exception as e:
-        print(f"ERROR: API call failed: {e}")
-        print("Check:")
-        print("  1. ANTHROPIC_API_KEY is set")
-        print("  2. Prompt length < 100k tokens")
-        print("  3. Internet connection working")
+        print_api_error(e)
         sys.exit(1)
 
 # Usage
 if __name__ == "__main__":
-    starting_path = sys.argv[1] if len(sys.argv) > 1 else "outputs/manual_exploration/phase_2/TKAM_stage_5b_starting_drafts.json"
-    channels_path = sys.argv[2] if len(sys.argv) > 2 else "outputs/manual_exploration/phase_2/TKAM_stage_2_channels.json"
-    thread_path = sys.argv[3] if len(sys.argv) > 3 else "outputs/manual_exploration/phase_2/TKAM_stage_4_thread.json"
-    prompt_path = sys.argv[4] if len(sys.argv) > 4 else "prompts/phase_2/stage_5b_constrained.txt"
-    output_path = sys.argv[5] if len(sys.argv) > 5 else "outputs/manual_exploration/phase_2/TKAM_stage_5b_content.json"
+    args, dry_run = dry_run_args(sys.argv)
+    starting_path = args[1] if len(args) > 1 else "outputs/manual_exploration/phase_2/TKAM_stage_5b_starting_drafts.json"
+    channels_path = args[2] if len(args) > 2 else "outputs/manual_exploration/phase_2/TKAM_stage_2_channels.json"
+    thread_path = args[3] if len(args) > 3 else "outputs/manual_exploration/phase_2/TKAM_stage_4_thread.json"
+    prompt_path = args[4] if len(args) > 4 else "prompts/phase_2/stage_5b_constrained.txt"
+    output_path = args[5] if len(args) > 5 else "outputs/manual_exploration/phase_2/TKAM_stage_5b_content.json"
     
-    refine_with_constraints(starting_path, channels_path, thread_path, prompt_path, output_path)
+    refine_with_constraints(starting_path, channels_path, thread_path, prompt_path, output_path, dry_run)
 
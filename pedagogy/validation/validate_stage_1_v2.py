@@ -16,8 +16,12 @@ REASONING (human validates):
 """
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def validate_audience_profile(profile_path, kernel_path):
     """
     Validate Stage 1 audience profile.
@@ -36,14 +40,11 @@ def validate_audience_profile(profile_path, kernel_path):
     with open(profile_path, 'r') as f:
         profile = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     # Extract valid elements
-    devices = kernel.get('micro_devices', [])
-    valid_devices = {d['name'] for d in devices}
-    alignment = kernel.get('alignment_pattern', {})
-    valid_pattern = alignment.get('pattern_name', '')
+    valid_devices = kernel.device_names
+    valid_pattern = kernel.alignment.get('pattern_name', '')
     
     print("="*60)
     print("STAGE 1 VALIDATION: Audience Profile")
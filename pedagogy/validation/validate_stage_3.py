@@ -1,8 +1,12 @@
 # validation/validate_stage_3.py
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def validate_message_matrix(messages_path, kernel_path, audience_path):
     """
     Validate that messages derive from kernel and address real pain points.
@@ -15,18 +19,14 @@ def validate_message_matrix(messages_path, kernel_path, audience_path):
     with open(messages_path, 'r') as f:
         messages = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     with open(audience_path, 'r') as f:
         audience = json.load(f)
     
     # Extract valid elements (PRECISION)
-    # v5.1 structure
-    devices = kernel.get('micro_devices', [])
-    valid_devices = {d['name'] for d in devices}
-    alignment = kernel.get('alignment_pattern', {})
-    valid_pattern = alignment.get('pattern_name', '')
+    valid_devices = kernel.device_names
+    valid_pattern = kernel.alignment.get('pattern_name', '')
     
     # Get pain points from audience profile
     segments = audience.get('segments', [])
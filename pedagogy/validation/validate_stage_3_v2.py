@@ -15,8 +15,12 @@ REASONING (human validates):
 """
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def categorize_reference(ref, kernel):
     """
     Categorize a reference as exact match or needs manual review.
@@ -24,14 +28,11 @@ def categorize_reference(ref, kernel):
     PRECISION task: Exact string matching only.
     """
     
-    # Extract exact match sets
-    devices = kernel.get('micro_devices', [])
-    device_names = {d['name'] for d in devices}
-    alignment = kernel.get('alignment_pattern', {})
-    pattern_name = alignment.get('pattern_name', '')
+    # Exact match sets come precomputed on the Kernel model
+    pattern_name = kernel.alignment.get('pattern_name', '')
     
     # Check exact matches
-    if ref in device_names:
+    if ref in kernel.device_names:
         return 'exact_device', ref
     
     # Check pattern reference (exact or partial)
@@ -39,8 +40,8 @@ def categorize_reference(ref, kernel):
         return 'exact_pattern', ref
     
     # Check if it appears in kernel text (fuzzy matching)
-    reader_effect = alignment.get('reader_effect', '').lower()
-    core_dynamic = alignment.get('core_dynamic', '').lower()
+    reader_effect = kernel.alignment.get('reader_effect', '').lower()
+    core_dynamic = kernel.alignment.get('core_dynamic', '').lower()
     
     ref_lower = ref.lower()
     
@@ -55,10 +56,9 @@ def categorize_reference(ref, kernel):
         return 'text_match_dynamic', f"Found in core_dynamic: '...{snippet}...'"
     
     # Check device effects for matches
-    for device in devices:
-        effect = device.get('effect', '').lower()
-        if ref_lower in effect:
-            return 'text_match_device_effect', f"Found in {device['name']} effect description"
+    for device in kernel.devices:
+        if ref_lower in device.effect.lower():
+            return 'text_match_device_effect', f"Found in {device.name} effect description"
     
     # Check word overlap for better fuzzy matching
     ref_words = set(ref_lower.split())
@@ -86,8 +86,7 @@ def validate_stage_3(messages_path, kernel_path, audience_path):
     with open(messages_path, 'r') as f:
         messages = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     with open(audience_path, 'r') as f:
         audience = json.load(f)
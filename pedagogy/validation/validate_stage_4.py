@@ -1,8 +1,12 @@
 # validation/validate_stage_4.py
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def validate_and_confirm_winner(evaluations_path, kernel_path):
     """
     Validate thread selection and potentially override with human judgment.
@@ -15,8 +19,7 @@ def validate_and_confirm_winner(evaluations_path, kernel_path):
     with open(evaluations_path, 'r') as f:
         evals = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     print("="*60)
     print("STAGE 4 VALIDATION: Thread Selection")
@@ -71,8 +74,7 @@ def validate_and_confirm_winner(evaluations_path, kernel_path):
         print("  Consider: Is this the best available, or should we regenerate messages?")
     
     # Check: Pattern reference
-    alignment = kernel.get('alignment_pattern', {})
-    pattern = alignment.get('pattern_name', 'Not found')
+    pattern = kernel.pattern_name
     pattern_ref = winner.get('kernel_pattern_reference', '')
     
     print(f"\nPATTERN CONNECTION:")
@@ -17,8 +17,12 @@ REASONING (human validates):
 """
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def validate_stage_5a(drafts_path, kernel_path, messages_path):
     """Validate Stage 5A drafts using reasoning/precision split."""
     
@@ -26,18 +30,14 @@ def validate_stage_5a(drafts_path, kernel_path, messages_path):
     with open(drafts_path, 'r') as f:
         drafts = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
     with open(messages_path, 'r') as f:
         messages = json.load(f)
     
-    # Build reference sets for validation (v5.1 structure)
-    devices = kernel.get('micro_devices', [])
-    device_names = {d['name'].lower() for d in devices}
-    
-    alignment = kernel.get('alignment_pattern', {})
-    pattern_name = alignment.get('pattern_name', '').lower()
+    # Build reference sets for validation
+    device_names = kernel.device_names_lower
+    pattern_name = kernel.alignment.get('pattern_name', '').lower()
     
     print("="*60)
     print("STAGE 5A VALIDATION")
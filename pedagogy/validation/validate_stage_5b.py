@@ -1,8 +1,12 @@
 # validation/validate_stage_5b.py
 
 import json
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from kernel_model import Kernel
+
 def validate_stage_5b(content_path, channels_path, kernel_path):
     """Validate Stage 5B output with reasoning/precision split."""
     
@@ -12,12 +16,10 @@ def validate_stage_5b(content_path, channels_path, kernel_path):
     with open(channels_path, 'r') as f:
         channels = json.load(f)
     
-    with open(kernel_path, 'r') as f:
-        kernel = json.load(f)
+    kernel = Kernel.load(kernel_path)
     
-    # Get device names from kernel (v5.1 structure)
-    devices = kernel.get('micro_devices', [])
-    device_names = {d['name'].lower() for d in devices}
+    # Get device names from kernel
+    device_names = kernel.device_names_lower
     
     print("="*60)
     print("STAGE 5B VALIDATION")
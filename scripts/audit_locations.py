@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Audit Locations
+Cross-checks every device's location_percent, band, assigned_section and
+chapter against its kernel's band ranges, for a whole corpus at once.
+
+All devices from all kernels are loaded into flat NumPy arrays, with each
+kernel's bands laid out as rows of one corpus-wide band table. Locations
+are recomputed from quote_offset (written by verify_quotes.py --write) and
+band membership is found with a single searchsorted over the band table,
+so the checks cost the same handful of array operations whether the corpus
+holds three kernels or ten thousand.
+
+Band ranges come from band_extraction start/end percents, or from the
+cumulative chapter_alignment percentages for kernels without band text.
+In those (v5.1) kernels location_percent is the position within the
+device's assigned section, so it is mapped through that section's range
+before band lookup, and the section check (true by construction) is
+skipped. A device's chapter is its verified quote_chapter when present.
+
+Usage:
+    python scripts/audit_locations.py kernels/
+    python scripts/audit_locations.py kernels/ --write
+
+    --write   store recomputed location_percent and band back into each
+              kernel (assigned_section is reported, never rewritten)
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from chapter_index import ChapterIndex
+from kernel_archive import is_member_path, kernel_paths
+from kernel_model import BAND_IDS, BANDS, Kernel
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+LOCATION_TOLERANCE = 1.0    # Percentage points of drift before a location is flagged
+KERNEL_STRIDE = 1000        # Spaces kernels apart on the percentage axis for lookups
+CHAPTER_STRIDE = 10000      # Spaces kernels apart on the chapter axis for lookups
+
+CHECKS = ['location_drift', 'band_mismatch', 'section_mismatch', 'chapter_mismatch']
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def band_lengths(kernel):
+    """Return band text lengths in chars (BANDS order), or None without band text."""
+    if not kernel.data.band_names():
+        return None
+    spans = {band: end - start for band, start, end in ChapterIndex.load(kernel.data).index['bands']}
+    return [spans.get(band, 0) for band in BANDS]
+
+
+def chapter_bands(kernel):
+    """Return {chapter: band id} from chapter_alignment."""
+    mapping = {}
+    for band, meta in kernel.data.get('chapter_alignment', {}).items():
+        for chapter in meta.get('chapters', []):
+            if band in BAND_IDS:
+                mapping[chapter] = BAND_IDS[band]
+    return mapping
+
+
+def _number(value, default=np.nan):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+# =============================================================================
+# CORPUS TABLES
+# =============================================================================
+
+def build_tables(kernels):
+    """
+    Flatten a list of Kernels into corpus-wide arrays.
+
+    Band rows are kernel_id * len(BANDS) + band id. Device columns hold -1
+    (ints) or NaN (floats) where a field is missing.
+    """
+    band_start, band_end, band_chars = [], [], []
+    chapter_keys, chapter_rows = [], []
+    columns = {name: [] for name in (
+        'kernel', 'device', 'location', 'relative', 'offset', 'offset_band', 'band', 'section', 'chapter',
+    )}
+
+    for kernel_id, kernel in enumerate(kernels):
+        ranges = kernel.band_ranges() or [(np.nan, np.nan)] * len(BANDS)
+        # Without band_extraction, location_percent is relative to the assigned section
+        relative = kernel.locations_relative
+        has_offsets = any('quote_offset' in device.raw for device in kernel.devices)
+        lengths = (band_lengths(kernel) if has_offsets else None) or [0] * len(BANDS)
+        for (start, end), chars in zip(ranges, lengths):
+            band_start.append(start)
+            band_end.append(end)
+            band_chars.append(chars)
+
+        base = kernel_id * len(BANDS)
+        for chapter, band_id in chapter_bands(kernel).items():
+            chapter_keys.append(kernel_id * CHAPTER_STRIDE + chapter)
+            chapter_rows.append(base + band_id)
+
+        for device in kernel.devices:
+            columns['kernel'].append(kernel_id)
+            columns['device'].append(device.index)
+            columns['location'].append(_number(device.location_percent))
+            columns['relative'].append(relative)
+            columns['offset'].append(_number(device.get('quote_offset')))
+            columns['band'].append(base + BAND_IDS[device.band] if device.band in BAND_IDS else -1)
+            section = device.assigned_section
+            columns['section'].append(base + BAND_IDS[section] if section in BAND_IDS else -1)
+            # quote_offset is relative to the band the quote was found in
+            offset_band = device.get('quote_band') or device.band or section
+            columns['offset_band'].append(base + BAND_IDS[offset_band] if offset_band in BAND_IDS else -1)
+            columns['chapter'].append(int(_number(device.get('quote_chapter', device.get('chapter')), -1)))
+
+    order = np.argsort(chapter_keys, kind='stable')
+    return {
+        'band_start': np.array(band_start, dtype=np.float64),
+        'band_end': np.array(band_end, dtype=np.float64),
+        'band_chars': np.array(band_chars, dtype=np.float64),
+        'chapter_keys': np.array(chapter_keys, dtype=np.int64)[order],
+        'chapter_rows': np.array(chapter_rows, dtype=np.int64)[order],
+        'kernel': np.array(columns['kernel'], dtype=np.int64),
+        'device': np.array(columns['device'], dtype=np.int64),
+        'location': np.array(columns['location'], dtype=np.float64),
+        'relative': np.array(columns['relative'], dtype=bool),
+        'offset': np.array(columns['offset'], dtype=np.float64),
+        'offset_band': np.array(columns['offset_band'], dtype=np.int64),
+        'band': np.array(columns['band'], dtype=np.int64),
+        'section': np.array(columns['section'], dtype=np.int64),
+        'chapter': np.array(columns['chapter'], dtype=np.int64),
+    }
+
+
+# =============================================================================
+# VECTORIZED CHECKS
+# =============================================================================
+
+def audit(tables):
+    """
+    Recompute locations and band membership for every device.
+
+    Returns a dict of arrays: recomputed location, located band row, the
+    band row implied by the device's chapter, and one boolean mask per check.
+    """
+    kernel = tables['kernel']
+    stride = len(BANDS)
+    starts, ends, chars = tables['band_start'], tables['band_end'], tables['band_chars']
+
+    # Location from quote_offset, relative to the band the quote was found in
+    offset = tables['offset']
+    has_offset = ~np.isnan(offset) & (tables['offset_band'] >= 0)
+    row = np.where(has_offset, tables['offset_band'], 0)
+    span_chars = chars[row]
+    has_offset &= span_chars > 0
+    from_offset = starts[row] + (ends[row] - starts[row]) * np.divide(
+        offset, span_chars, out=np.zeros_like(offset), where=span_chars > 0
+    )
+    location = np.where(has_offset, np.round(from_offset, 1), tables['location'])
+
+    # Whole-book position: section-relative locations are mapped through the section's range
+    relative = tables['relative'] & ~has_offset
+    section = tables['section']
+    section_row = np.where(section >= 0, section, 0)
+    within_section = np.where(
+        section >= 0,
+        starts[section_row] + (ends[section_row] - starts[section_row]) * tables['location'] / 100,
+        np.nan,
+    )
+    precise = np.where(has_offset, from_offset, np.where(relative, within_section, tables['location']))
+
+    # Band containing each location: one searchsorted over all kernels' band starts
+    # (unrounded, so a quote at the very end of a band is not pushed into the next)
+    band_keys = np.arange(len(starts)) // stride * KERNEL_STRIDE + np.nan_to_num(starts, nan=-1)
+    device_keys = kernel * KERNEL_STRIDE + np.clip(precise, 0, 100)
+    located = np.searchsorted(band_keys, device_keys, side='right') - 1
+    has_location = ~np.isnan(precise) & ~np.isnan(starts[kernel * stride])
+    located = np.where(has_location & (located // stride == kernel), located, -1)
+
+    # Band implied by the device's chapter
+    chapter_rows = np.full(len(kernel), -1, dtype=np.int64)
+    has_chapter = tables['chapter'] >= 0
+    if len(tables['chapter_keys']):
+        keys = kernel * CHAPTER_STRIDE + tables['chapter']
+        found = np.searchsorted(tables['chapter_keys'], keys)
+        found = np.clip(found, 0, len(tables['chapter_keys']) - 1)
+        matched = has_chapter & (tables['chapter_keys'][found] == keys)
+        chapter_rows = np.where(matched, tables['chapter_rows'][found], -1)
+
+    return {
+        'location': location,
+        'located': located,
+        'chapter_band': chapter_rows,
+        'location_drift': has_offset & (np.abs(location - np.nan_to_num(tables['location'], nan=-1e9)) > LOCATION_TOLERANCE),
+        'band_mismatch': (tables['band'] >= 0) & (located >= 0) & (tables['band'] != located),
+        'section_mismatch': ~relative & (tables['section'] >= 0) & (located >= 0) & (tables['section'] != located),
+        'chapter_mismatch': (chapter_rows >= 0) & (tables['section'] >= 0) & (chapter_rows != tables['section']),
+    }
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def band_name(row):
+    return BANDS[row % len(BANDS)] if row >= 0 else '-'
+
+
+def write_repairs(kernel, tables, result, rows):
+    """Store recomputed location_percent and band for one kernel's devices."""
+    data = kernel.data.materialize()
+    for i in rows:
+        device = data['micro_devices'][tables['device'][i]]
+        if not np.isnan(result['location'][i]):
+            device['location_percent'] = float(result['location'][i])
+        if 'band' in device and result['located'][i] >= 0:
+            device['band'] = band_name(result['located'][i])
+    with open(kernel.data.path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def audit_locations(paths, write=False):
+    """Audit a list of kernel files and print a report."""
+    kernels = [Kernel.load(path) for path in paths]
+    tables = build_tables(kernels)
+    result = audit(tables)
+
+    flagged = np.zeros(len(tables['kernel']), dtype=bool)
+    for check in CHECKS:
+        flagged |= result[check]
+
+    for kernel_id, kernel in enumerate(kernels):
+        rows = np.flatnonzero(flagged & (tables['kernel'] == kernel_id))
+        print(f'Processing: {kernel.data.path}')
+        for i in rows:
+            device = kernel.devices[tables['device'][i]]
+            problems = [check for check in CHECKS if result[check][i]]
+            print(f'  ⚠ {device.name} [{device.index}]: {", ".join(problems)}')
+            print(f'      location {device.location_percent} -> {result["location"][i]:.1f}, '
+                  f'band {device.band or "-"} -> {band_name(result["located"][i])}, '
+                  f'section {device.assigned_section}, chapter {device.get("quote_chapter", device.get("chapter", "-"))} '
+                  f'({band_name(result["chapter_band"][i])})')
+        repairable = [i for i in rows if result['location_drift'][i] or result['band_mismatch'][i]]
+        if write and repairable and is_member_path(kernel.data.path):
+            print('  ⚠ Archive member is read-only, not written')
+        elif write and repairable:
+            write_repairs(kernel, tables, result, repairable)
+            print(f'  Written: {kernel.data.path}')
+        if not len(rows):
+            print('  ✓ Consistent')
+        print()
+
+    print(f'Devices: {len(tables["kernel"]):,} across {len(kernels)} kernel(s)')
+    for check in CHECKS:
+        print(f'  {check}: {int(result[check].sum())}')
+    return tables, result
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: python audit_locations.py <kernel.json | kernels/> [...] [--write]')
+        sys.exit(1)
+
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            continue
+        paths.extend(kernel_paths(arg))
+
+    audit_locations(paths, write='--write' in sys.argv[1:])
+
+
+if __name__ == '__main__':
+    main()
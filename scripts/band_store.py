@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Band Store
+Moves kernel band texts into a flat UTF-8 file with an offset table, so
+consumers can read any band or chapter as an mmap-backed slice instead of
+decoding the whole kernel.
+
+For a kernel kernels/Book_kernel_v6_1.json the store is two files:
+    kernels/Book_kernel_v6_1.bands.txt     # band texts, concatenated in order
+    kernels/Book_kernel_v6_1.bands.index   # JSON offset table (bytes + chars)
+
+Usage:
+    python scripts/band_store.py export kernels/Book_kernel_v6_1.json [--strip]
+    python scripts/band_store.py import kernels/Book_kernel_v6_1.json [output.json]
+
+    --strip   also rewrite the kernel without band text (load_kernel and
+              band_text() then read from the store transparently)
+"""
+
+import json
+import mmap
+import sys
+from pathlib import Path
+
+from chapter_index import ChapterIndex
+from kernel_loader import load_kernel
+
+TEXT_SUFFIX = '.bands.txt'
+INDEX_SUFFIX = '.bands.index'
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def store_paths(kernel_path):
+    """Return (text_path, index_path) for a kernel's band store."""
+    kernel_path = Path(kernel_path)
+    base = kernel_path.parent / kernel_path.stem
+    return base.with_name(base.name + TEXT_SUFFIX), base.with_name(base.name + INDEX_SUFFIX)
+
+
+def has_band_store(kernel_path):
+    """Return True if an exported band store sits next to the kernel."""
+    text_path, index_path = store_paths(kernel_path)
+    return text_path.exists() and index_path.exists()
+
+
+def band_chapters(kernel, band):
+    """Return the chapter numbers a band covers."""
+    meta = kernel.get('band_extraction', {}).get('bands', {}).get(band, {})
+    chapters = meta.get('chapters')
+    if chapters is None:
+        chapters = kernel.get('chapter_alignment', {}).get(band, {}).get('chapters', [])
+    return chapters
+
+
+# =============================================================================
+# BAND STORE
+# =============================================================================
+
+class BandStore:
+    """Read-only, mmap-backed view over an exported band store."""
+
+    def __init__(self, kernel_path):
+        text_path, index_path = store_paths(kernel_path)
+        with open(index_path, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self._file = open(text_path, 'rb')
+        size = text_path.stat().st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.buffer = memoryview(self._mmap)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.buffer.release()
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    @property
+    def bands(self):
+        return list(self.index['bands'])
+
+    def band(self, name):
+        """Return a zero-copy memoryview of one band's UTF-8 bytes."""
+        entry = self.index['bands'][name]
+        return self.buffer[entry['start']:entry['end']]
+
+    def band_text(self, name):
+        """Return one band decoded to str."""
+        return str(self.band(name), 'utf-8')
+
+    def chapter(self, number):
+        """Return a zero-copy memoryview of the bytes holding a chapter."""
+        entry = self.index['chapters'][str(number)]
+        return self.buffer[entry['start']:entry['end']]
+
+    def chapter_text(self, number):
+        """Return one chapter's text decoded to str."""
+        return str(self.chapter(number), 'utf-8')
+
+    def band_at(self, offset):
+        """Return the band containing a byte offset, or None."""
+        for name, entry in self.index['bands'].items():
+            if entry['start'] <= offset < entry['end']:
+                return name
+        return None
+
+    def find(self, phrase, band=None):
+        """Return the byte offset of phrase (in the band, if given), or -1."""
+        needle = phrase.encode('utf-8')
+        if band is None:
+            return self._mmap.find(needle) if self._mmap else -1
+        entry = self.index['bands'][band]
+        return self._mmap.find(needle, entry['start'], entry['end']) if self._mmap else -1
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def export_band_store(kernel_path, strip=False):
+    """Write a kernel's band texts to a flat file plus offset table."""
+    kernel = load_kernel(kernel_path)
+    bands = kernel.band_names()
+    if not bands or not all(('band_extraction', 'bands', b, 'text') in kernel.deferred for b in bands):
+        raise ValueError(f'{kernel_path} has no band_extraction text to export')
+
+    text_path, index_path = store_paths(kernel_path)
+    index = {
+        'kernel': Path(kernel_path).name,
+        'encoding': 'utf-8',
+        'bands': {},
+        'chapters': {},
+    }
+
+    offset = 0
+    with open(text_path, 'wb') as out:
+        for band in bands:
+            data = kernel.band_text(band).encode('utf-8')
+            out.write(data)
+            index['bands'][band] = {
+                'start': offset,
+                'end': offset + len(data),
+                'chars': len(data.decode('utf-8')),
+            }
+            # Chapters default to their band's span; detected chapters are refined below
+            for chapter in band_chapters(kernel, band):
+                index['chapters'][str(chapter)] = {'band': band, 'start': offset, 'end': offset + len(data)}
+            offset += len(data)
+
+    # Byte spans for every chapter the chapter index could locate
+    chapters = ChapterIndex.load(kernel)
+    text = chapters.text
+    for number, entry in chapters.chapters.items():
+        start = len(text[:entry['start']].encode('utf-8'))
+        end = start + len(text[entry['start']:entry['end']].encode('utf-8'))
+        index['chapters'][str(number)] = {
+            'band': entry['band'],
+            'start': start,
+            'end': end,
+            'word_count': entry['word_count'],
+        }
+
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+
+    if strip:
+        stripped = kernel.materialize()
+        for band in bands:
+            stripped['band_extraction']['bands'][band].pop('text', None)
+        with open(kernel_path, 'w', encoding='utf-8') as f:
+            json.dump(stripped, f, indent=2)
+
+    return {'text_path': str(text_path), 'index_path': str(index_path), 'bytes': offset}
+
+
+def import_band_store(kernel_path, output_path=None):
+    """Write the band texts from a store back into a kernel JSON file."""
+    kernel = load_kernel(kernel_path).materialize()
+    with BandStore(kernel_path) as store:
+        for band in store.bands:
+            meta = kernel.setdefault('band_extraction', {}).setdefault('bands', {}).setdefault(band, {})
+            meta['text'] = store.band_text(band)
+
+    output_path = output_path or kernel_path
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(kernel, f, indent=2)
+    return {'output_path': str(output_path)}
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'import'):
+        print('Usage: python band_store.py export <kernel.json> [--strip]')
+        print('       python band_store.py import <kernel.json> [output.json]')
+        sys.exit(1)
+
+    command, kernel_path = sys.argv[1], sys.argv[2]
+    if command == 'export':
+        result = export_band_store(kernel_path, strip='--strip' in sys.argv[3:])
+        print(f'Written: {result["text_path"]} ({result["bytes"]:,} bytes)')
+        print(f'Written: {result["index_path"]}')
+    else:
+        output_path = sys.argv[3] if len(sys.argv) > 3 else None
+        result = import_band_store(kernel_path, output_path)
+        print(f'Written: {result["output_path"]}')
+
+
+if __name__ == '__main__':
+    main()
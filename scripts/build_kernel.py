@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Build Kernel
+Builds the structural part of a kernel straight from a raw novel text file.
+
+The source is read once, in fixed-size chunks. While reading, the builder
+counts words, detects chapter headings ('Chapter 12', 'CHAPTER XII' or a
+bare '12' opening a sentence, skipping a table of contents) and spools the
+whitespace-normalized text to a temp file. It then assigns chapters and
+text to the five Freytag bands by percentage range and writes the kernel,
+streaming each band's text from the spool into the JSON output. Memory use
+stays flat no matter how long the novel is.
+
+The result has metadata, text_structure, structure_detection,
+chapter_alignment and band_extraction filled in; macro_variables,
+alignment_pattern and micro_devices are left empty for the analysis pass.
+
+Usage:
+    python scripts/build_kernel.py novels/Book.txt "Title" "Author" [output.json]
+    python scripts/build_kernel.py novels/Book.txt "Title" "Author" --bands 0,10,65,68,91,100
+
+    --bands   band boundaries as percentages (six values, default 0,10,60,70,90,100)
+    --force   overwrite an existing kernel file
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+KERNELS_DIR = Path('./kernels')
+KERNEL_VERSION = '6.1'
+BANDS = ['exposition', 'rising_action', 'climax', 'falling_action', 'resolution']
+DEFAULT_BOUNDARIES = [0, 10, 60, 70, 90, 100]
+
+CHUNK_SIZE = 1 << 20        # Characters read from the source per chunk
+MIN_CHAPTER_WORDS = 50      # Headings closer together than this are a contents list
+
+_ROMAN = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100}
+_GLUED_NUMBER = re.compile(r'^(?:.*[.!?”’"\')])?(\d{1,3})$')
+_PART_WORDS = {'part', 'book', 'volume'}
+_SENTENCE_END = re.compile(r'[.!?”’"\')\]]$')
+_NUMBER_WORDS = {
+    word: i for i, word in enumerate(
+        ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten'], 1
+    )
+}
+_TEXT_MARKER = '\x00band:{}\x00'
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def parse_number(token):
+    """Parse '12', '12.', 'XII', 'xii:' or 'Two' into an int, or None."""
+    token = token.strip('.:;,—-')
+    if token.isdigit():
+        return int(token)
+    if token.lower() in _NUMBER_WORDS:
+        return _NUMBER_WORDS[token.lower()]
+    token = token.upper()
+    if not token or any(char not in _ROMAN for char in token):
+        return None
+    total = 0
+    for char, following in zip(token, token[1:] + ' '):
+        value = _ROMAN[char]
+        total += -value if following != ' ' and _ROMAN[following] > value else value
+    return total
+
+
+def opens_sentence(token):
+    """Return True if a token looks like the first word of a chapter."""
+    return bool(token) and (token[0].isupper() or token[0] in '“"‘\'')
+
+
+def part_heading(before, word, number, following):
+    """
+    Return the number of a 'Part II' / 'BOOK I' / 'Volume Two' heading
+    made of word and number, or None.
+
+    Line breaks are gone by the time words are scanned, so a heading is
+    told from running prose ('the book I loved') the way chapter headings
+    are, by its context: the part word is capitalized, it follows the end
+    of a sentence, the start of the text or a capitalized title line, and
+    the next word opens a sentence.
+    """
+    if word.lower() not in _PART_WORDS or not word[0].isupper() or not opens_sentence(following):
+        return None
+    if before is not None and not _SENTENCE_END.search(before) and not (len(before) > 1 and before.isupper()):
+        return None
+    return parse_number(number)
+
+
+def read_words(path):
+    """Yield whitespace-separated words from a text file, one chunk at a time."""
+    remainder = ''
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), ''):
+            words = (remainder + chunk).split()
+            # The last word may continue in the next chunk
+            remainder = words.pop() if words and not chunk[-1].isspace() else ''
+            yield from words
+    if remainder:
+        yield remainder
+
+
+def scan_novel(source_path, spool):
+    """
+    Stream the novel once, writing normalized text to spool.
+
+    Returns (total_words, chapter_starts, parts) where chapter_starts maps
+    chapter number -> index of the chapter's first word and parts is the
+    number of distinct Part/Book/Volume headings.
+    """
+    starts = {}
+    expected = 1
+    parts = set()
+    index = 0
+    before = None
+    previous = None
+    current = None
+
+    def check(i, prev, word, following):
+        """Detect a heading at word i given its neighbours."""
+        nonlocal expected
+        number = None
+        start = i
+        if prev is not None and prev.lower().strip('.:') == 'chapter':
+            number = parse_number(word)
+            start = i - 1
+        elif opens_sentence(following):
+            match = _GLUED_NUMBER.match(word)
+            if match:
+                number = int(match.group(1))
+                start = i if match.group(1) == word else i + 1
+
+        if number != expected:
+            return
+        if expected > 1 and start - starts[expected - 1] < MIN_CHAPTER_WORDS:
+            # Headings this close together are a table of contents
+            starts.clear()
+            expected = 1
+            return
+        starts[expected] = start
+        expected += 1
+
+    for word in read_words(source_path):
+        spool.write(word if index == 0 else ' ' + word)
+        if current is not None:
+            check(index - 1, previous, current, word)
+            if previous is not None:
+                part = part_heading(before, previous, current, word)
+                if part:
+                    parts.add(part)
+        before, previous, current = previous, current, word
+        index += 1
+
+    if current is not None:
+        check(index - 1, previous, current, None)
+
+    return index, starts, len(parts)
+
+
+def band_layout(total_words, chapter_starts, boundaries):
+    """Assign word spans and chapters to each band."""
+    total_units = len(chapter_starts)
+    chapters = sorted(chapter_starts)
+    layout = {}
+
+    for i, band in enumerate(BANDS):
+        start_percent, end_percent = boundaries[i], boundaries[i + 1]
+        first_word = total_words * start_percent // 100
+        last_word = total_words * end_percent // 100
+        midpoint = (start_percent + end_percent) / 2
+
+        # Chapters by position in the chapter sequence, as in chapter_alignment
+        low = total_units * start_percent // 100
+        high = total_units * end_percent // 100
+        band_chapters = chapters[low:high]
+
+        # Chapter containing the band's midpoint word
+        middle_word = total_words * midpoint / 100
+        primary = None
+        for number in chapters:
+            if chapter_starts[number] <= middle_word:
+                primary = number
+        if not band_chapters and primary is not None:
+            band_chapters = [primary]
+
+        layout[band] = {
+            'start_percent': start_percent,
+            'end_percent': end_percent,
+            'midpoint': midpoint,
+            'first_word': first_word,
+            'last_word': last_word,
+            'chapters': band_chapters,
+            'primary_chapter': primary,
+        }
+
+    return layout
+
+
+def chapter_range(chapters):
+    """Format a chapter list as '4-20' or '21'."""
+    if not chapters:
+        return ''
+    if len(chapters) == 1:
+        return str(chapters[0])
+    return f'{chapters[0]}-{chapters[-1]}'
+
+
+def build_skeleton(title, author, source_path, total_words, chapter_starts, parts, layout):
+    """Build the kernel dict, with a marker standing in for each band's text."""
+    total_units = len(chapter_starts)
+    if parts:
+        notes = f'{parts} parts with {total_units} numbered chapters (detected by build_kernel.py)'
+    elif total_units:
+        notes = f'{total_units} numbered chapters (detected by build_kernel.py)'
+    else:
+        notes = 'No chapter headings detected (build_kernel.py)'
+
+    return {
+        'metadata': {
+            'title': title,
+            'author': author,
+            'source_file': Path(source_path).name,
+            'creation_date': datetime.now().isoformat(),
+            'kernel_version': KERNEL_VERSION,
+            'chapter_aware': bool(total_units),
+            'total_words': total_words,
+        },
+        'text_structure': {
+            'has_chapters': bool(total_units),
+            'total_chapters_estimate': total_units,
+            'notes': 'Chapter breaks detected from headings in the source text',
+        },
+        'structure_detection': {
+            'structure_type': 'NEST' if parts else 'LINEAR',
+            'total_units': total_units,
+            'special_elements': [],
+            'notes': notes,
+        },
+        'chapter_alignment': {
+            band: {
+                'chapter_range': chapter_range(meta['chapters']),
+                'chapters': meta['chapters'],
+                'primary_chapter': meta['primary_chapter'],
+                'percentage': meta['end_percent'] - meta['start_percent'],
+            }
+            for band, meta in layout.items()
+        },
+        'band_extraction': {
+            'extraction_method': 'freytag_aligned_bands',
+            'bands': {
+                band: {
+                    'range': f'{meta["start_percent"]}-{meta["end_percent"]}%',
+                    'start_percent': meta['start_percent'],
+                    'end_percent': meta['end_percent'],
+                    'midpoint': meta['midpoint'],
+                    'chapters': meta['chapters'],
+                    'word_count': meta['last_word'] - meta['first_word'],
+                    'text': _TEXT_MARKER.format(band),
+                }
+                for band, meta in layout.items()
+            },
+        },
+        'narrative_position_mapping': {},
+        'macro_variables': {},
+        'alignment_pattern': {},
+        'micro_devices': [],
+    }
+
+
+def write_band_text(out, spool_path, layout):
+    """Generator that streams each band's words from the spool as JSON string content."""
+    words = read_words(spool_path)
+    for band in BANDS:
+        meta = layout[band]
+        separator = ''
+        batch = []
+        for i in range(meta['last_word'] - meta['first_word']):
+            batch.append(next(words))
+            if len(batch) >= 10000 or i == meta['last_word'] - meta['first_word'] - 1:
+                out.write(separator + json.dumps(' '.join(batch))[1:-1])
+                separator = ' '
+                batch = []
+        yield band
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def default_output_path(title):
+    """Return kernels/<Title>_kernel_v6_1.json for a title."""
+    return KERNELS_DIR / f'{re.sub(r"[^A-Za-z0-9]+", "_", title).strip("_")}_kernel_v6_1.json'
+
+
+def check_boundaries(boundaries):
+    """Raise ValueError unless boundaries are len(BANDS) + 1 ascending percentages from 0 to 100."""
+    if (len(boundaries) != len(BANDS) + 1 or boundaries != sorted(boundaries)
+            or boundaries[0] != 0 or boundaries[-1] != 100):
+        raise ValueError(f'Band boundaries must be {len(BANDS) + 1} ascending percentages from 0 to 100')
+
+
+def build_kernel(source_path, title, author, output_path=None, boundaries=None):
+    """Build a structural kernel from a raw novel text file."""
+    boundaries = boundaries or DEFAULT_BOUNDARIES
+    check_boundaries(boundaries)
+
+    output_path = Path(output_path or default_output_path(title))
+
+    fd, spool_path = tempfile.mkstemp(suffix='.txt', prefix='kernel_spool_')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as spool:
+            total_words, chapter_starts, parts = scan_novel(source_path, spool)
+
+        layout = band_layout(total_words, chapter_starts, boundaries)
+        skeleton = json.dumps(
+            build_skeleton(title, author, source_path, total_words, chapter_starts, parts, layout),
+            indent=2,
+        )
+
+        # Split the dumped skeleton at each band's text marker and stream the text in between
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_output = output_path.with_name(output_path.name + '.tmp')
+        with open(tmp_output, 'w', encoding='utf-8') as out:
+            streamer = write_band_text(out, spool_path, layout)
+            for band in BANDS:
+                marker = json.dumps(_TEXT_MARKER.format(band))[1:-1]
+                before, skeleton = skeleton.split(marker, 1)
+                out.write(before)
+                next(streamer)
+            out.write(skeleton)
+        os.replace(tmp_output, output_path)
+    finally:
+        os.unlink(spool_path)
+
+    return {
+        'output_path': str(output_path),
+        'total_words': total_words,
+        'total_units': len(chapter_starts),
+        'layout': layout,
+    }
+
+
+def usage(error=None):
+    if error:
+        print(f'✗ {error}')
+    print('Usage: python build_kernel.py <novel.txt> "<title>" "<author>" [output.json] [--bands 0,10,60,70,90,100] [--force]')
+    sys.exit(1)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+
+    boundaries = None
+    if '--bands' in sys.argv:
+        position = sys.argv.index('--bands') + 1
+        value = sys.argv[position] if position < len(sys.argv) else ''
+        if not value or value.startswith('--'):
+            usage('--bands needs a value')
+        if not all(p.strip().isdigit() for p in value.split(',')):
+            usage(f'--bands takes comma-separated whole-number percentages, got {value!r}')
+        boundaries = [int(p) for p in value.split(',')]
+        try:
+            check_boundaries(boundaries)
+        except ValueError as e:
+            usage(str(e))
+        args.remove(value)
+
+    if len(args) < 3:
+        usage()
+
+    source_path, title, author = args[:3]
+    output_path = Path(args[3]) if len(args) > 3 else default_output_path(title)
+    if output_path.exists() and '--force' not in sys.argv:
+        print(f'✗ {output_path} exists (use --force to overwrite)')
+        sys.exit(1)
+
+    print(f'Processing: {source_path}')
+    result = build_kernel(source_path, title, author, output_path, boundaries)
+    print(f'  Words: {result["total_words"]:,}')
+    print(f'  Chapters: {result["total_units"]}')
+    for band, meta in result['layout'].items():
+        chapters = chapter_range(meta['chapters']) or '-'
+        print(f'    {band:<15} {meta["start_percent"]:>3}-{meta["end_percent"]:<3}% '
+              f'{meta["last_word"] - meta["first_word"]:>8,} words  chapters {chapters}')
+    print(f'  Written: {result["output_path"]}')
+
+
+if __name__ == '__main__':
+    main()
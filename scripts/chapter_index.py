@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Chapter Index
+Finds where each chapter starts inside a kernel's band text.
+
+Kernels list which chapters each band covers but not where those chapters
+are. This walks the concatenated band text (kernel band order) looking for
+chapter headings 1, 2, 3 ... in sequence, skipping a leading table of
+contents, and records each chapter's character span, the band it starts in
+and its word count. Chapters are then sliced straight from those offsets.
+
+Offsets are in the same coordinates as concordance.py: chars into the band
+texts joined in kernel order. The index is cached as a kernel sidecar.
+
+Usage:
+    python scripts/chapter_index.py kernels/To_Kill_a_Mockingbird_kernel_v6_1.json
+    python scripts/chapter_index.py kernels/To_Kill_a_Mockingbird_kernel_v6_1.json 12
+    python scripts/chapter_index.py kernels/To_Kill_a_Mockingbird_kernel_v6_1.json 12-14
+"""
+
+import re
+import sys
+from bisect import bisect_right
+
+from kernel_loader import load_sidecar
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+INDEX_VERSION = 1
+TOC_WINDOW = 0.05       # A table of contents must sit in the first 5% of the text
+TOC_GAP = 40            # Max chars between consecutive contents entries
+
+_TOC_ENTRY = re.compile(r'\bchapter\s+(\d{1,3})\b', re.IGNORECASE)
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def _heading(number):
+    """Match chapter `number`'s heading: 'Chapter 12' or a bare '12' opening a sentence."""
+    return re.compile(
+        r'\b(?:[Cc]hapter|CHAPTER)\s+%d\b|(?:(?<=[\s.!?”’"\')])|^)%d\s*(?=[A-Z“"‘])' % (number, number)
+    )
+
+
+def chapter_count(kernel):
+    """Return the highest chapter number the kernel's band metadata mentions."""
+    numbers = [0]
+    for meta in kernel.get('band_extraction', {}).get('bands', {}).values():
+        numbers.extend(meta.get('chapters', []))
+    for meta in kernel.get('chapter_alignment', {}).values():
+        numbers.extend(meta.get('chapters', []))
+    return max(numbers)
+
+
+def skip_contents(text):
+    """Return the offset just past a leading table of contents (0 if there is none)."""
+    limit = int(len(text) * TOC_WINDOW)
+    end = 0
+    run = 0
+    previous = None
+    for match in _TOC_ENTRY.finditer(text, 0, limit):
+        if previous is not None and match.start() - previous.end() <= TOC_GAP:
+            run += 1
+        else:
+            run = 1
+        if run >= 3:
+            end = match.end()
+        previous = match
+    return end
+
+
+def detect_chapters(text, count):
+    """
+    Return {chapter: start_offset} for headings found in sequence.
+
+    Chapters whose heading cannot be found after the previous chapter are
+    left out rather than guessed.
+    """
+    starts = {}
+    pos = skip_contents(text)
+    for number in range(1, count + 1):
+        match = _heading(number).search(text, pos)
+        if match is None:
+            continue
+        starts[number] = match.start()
+        pos = match.end()
+    return starts
+
+
+def build_index(kernel):
+    """Build the chapter index payload for a LazyKernel."""
+    bands = []
+    texts = []
+    offset = 0
+    for band in kernel.band_names():
+        text = kernel.band_text(band)
+        bands.append((band, offset, offset + len(text)))
+        texts.append(text)
+        offset += len(text)
+    text = ''.join(texts)
+
+    starts = detect_chapters(text, chapter_count(kernel))
+    numbers = sorted(starts)
+    band_starts = [start for _, start, _ in bands]
+
+    chapters = {}
+    for i, number in enumerate(numbers):
+        start = starts[number]
+        end = starts[numbers[i + 1]] if i + 1 < len(numbers) else len(text)
+        first_band = bisect_right(band_starts, start) - 1
+        last_band = bisect_right(band_starts, max(start, end - 1)) - 1
+        chapters[number] = {
+            'start': start,
+            'end': end,
+            'band': bands[first_band][0],
+            'bands': [name for name, _, _ in bands[first_band:last_band + 1]],
+            'word_count': len(text[start:end].split()),
+        }
+
+    return {'bands': bands, 'chapters': chapters, 'length': len(text)}
+
+
+# =============================================================================
+# CHAPTER INDEX
+# =============================================================================
+
+class ChapterIndex:
+    """Chapter offsets over one kernel's concatenated band text."""
+
+    def __init__(self, index, kernel, text=None):
+        self.index = index
+        self.kernel = kernel
+        self.chapters = index['chapters']
+        self._text = text
+        self._numbers = sorted(self.chapters)
+        self._starts = [self.chapters[n]['start'] for n in self._numbers]
+
+    @classmethod
+    def load(cls, kernel, text=None):
+        """
+        Return the chapter index for a LazyKernel, building it if stale.
+
+        Pass the concatenated band text if the caller already holds it;
+        otherwise it is read on the first chapter() call.
+        """
+        if not kernel.band_names():
+            raise ValueError(f'{kernel.path} has no band_extraction text to index')
+        index = load_sidecar(kernel.path, 'chapters.pickle', lambda: build_index(kernel), version=INDEX_VERSION)
+        return cls(index, kernel, text)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = ''.join(self.kernel.band_text(band) for band, _, _ in self.index['bands'])
+        return self._text
+
+    def span(self, first, last=None):
+        """Return (start, end) offsets for a chapter or inclusive chapter range."""
+        last = first if last is None else last
+        return self.chapters[first]['start'], self.chapters[last]['end']
+
+    def chapter(self, first, last=None):
+        """Return the text of a chapter or inclusive chapter range."""
+        start, end = self.span(first, last)
+        return self.text[start:end]
+
+    def chapter_at(self, offset):
+        """Return the chapter containing a char offset, or None (front matter)."""
+        i = bisect_right(self._starts, offset) - 1
+        return self._numbers[i] if i >= 0 else None
+
+    def band_offset(self, band):
+        """Return the char offset where a band starts."""
+        for name, start, _ in self.index['bands']:
+            if name == band:
+                return start
+        raise KeyError(band)
+
+    def chapters_in(self, band):
+        """Return the chapters whose text starts in a band."""
+        return [n for n in self._numbers if self.chapters[n]['band'] == band]
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    from kernel_loader import load_kernel
+
+    if len(sys.argv) < 2:
+        print('Usage: python chapter_index.py <kernel.json> [chapter | first-last]')
+        sys.exit(1)
+
+    kernel = load_kernel(sys.argv[1])
+    index = ChapterIndex.load(kernel)
+
+    if len(sys.argv) > 2:
+        first, _, last = sys.argv[2].partition('-')
+        print(index.chapter(int(first), int(last) if last else None))
+        return
+
+    expected = chapter_count(kernel)
+    print(f'{sys.argv[1]}')
+    print(f'  Chapters found: {len(index.chapters)} of {expected}')
+    for number in range(1, expected + 1):
+        entry = index.chapters.get(number)
+        if entry is None:
+            print(f'  ✗ {number:>3}: heading not found')
+            continue
+        bands = ', '.join(entry['bands'])
+        print(f'    {number:>3}: {entry["start"]:>8,}-{entry["end"]:<8,} {entry["word_count"]:>6,} words  {bands}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Concordance
+Keyword-in-context lookups over a kernel's band text.
+
+The band texts are concatenated in kernel order, tokenized into words and
+indexed with a word-level suffix array. A phrase lookup is two binary
+searches over the array, so it stays in the millisecond range on full
+novels. Every hit comes back with its band, chapter (from chapter_index.py)
+and the surrounding sentences.
+
+The index is cached as a kernel sidecar and rebuilt only when the kernel
+file changes.
+
+Usage:
+    python scripts/concordance.py kernels/To_Kill_a_Mockingbird_kernel_v6_1.json "mockingbird" [sentences]
+
+    from concordance import Concordance
+
+    concordance = Concordance.load(load_kernel(path))
+    concordance.query('shoot all the bluejays', sentences=1)
+"""
+
+import re
+import sys
+from array import array
+from bisect import bisect_right
+
+from chapter_index import ChapterIndex
+from kernel_loader import load_sidecar
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+INDEX_VERSION = 1
+
+_WORD = re.compile(r"\w+(?:['’]\w+)*")
+_SENTENCE_END = re.compile(r'[.!?][”’"\')\]]*\s+')
+
+
+# =============================================================================
+# INDEX BUILDING
+# =============================================================================
+
+def tokenize(text):
+    """Return (words, starts, ends) for the lowercased words in text."""
+    words = []
+    starts = array('I')
+    ends = array('I')
+    for match in _WORD.finditer(text):
+        words.append(match.group().lower().replace('’', "'"))
+        starts.append(match.start())
+        ends.append(match.end())
+    return words, starts, ends
+
+
+def build_suffix_array(tokens):
+    """Sort suffix start positions of a token id sequence by prefix doubling."""
+    n = len(tokens)
+    if n == 0:
+        return array('I')
+
+    rank = list(tokens)
+    suffixes = list(range(n))
+    step = 1
+    while True:
+        def key(i):
+            return rank[i], rank[i + step] if i + step < n else -1
+
+        suffixes.sort(key=key)
+        new_rank = [0] * n
+        for j in range(1, n):
+            new_rank[suffixes[j]] = new_rank[suffixes[j - 1]] + (key(suffixes[j]) != key(suffixes[j - 1]))
+        rank = new_rank
+        if rank[suffixes[-1]] == n - 1 or step >= n:
+            break
+        step *= 2
+
+    return array('I', suffixes)
+
+
+def build_index(kernel):
+    """Build the concordance index payload for a LazyKernel."""
+    bands = []
+    texts = []
+    offset = 0
+    for band in kernel.band_names():
+        text = kernel.band_text(band)
+        bands.append((band, offset, offset + len(text)))
+        texts.append(text)
+        offset += len(text)
+    text = ''.join(texts)
+
+    words, starts, ends = tokenize(text)
+    vocab = {}
+    tokens = array('I', (vocab.setdefault(word, len(vocab)) for word in words))
+
+    # Each band opens a new sentence even if the previous band ends mid-sentence
+    sentence_starts = {start for _, start, _ in bands}
+    sentence_starts.update(match.end() for match in _SENTENCE_END.finditer(text))
+
+    return {
+        'bands': bands,
+        'vocab': vocab,
+        'tokens': tokens,
+        'starts': starts,
+        'ends': ends,
+        'suffixes': build_suffix_array(tokens),
+        'sentences': array('I', sorted(sentence_starts)),
+    }
+
+
+# =============================================================================
+# CONCORDANCE
+# =============================================================================
+
+class Concordance:
+    """Suffix-array phrase index over one kernel's band text."""
+
+    def __init__(self, kernel, index):
+        self.kernel = kernel
+        self.index = index
+        self.text = ''.join(kernel.band_text(band) for band, _, _ in index['bands'])
+        self.chapters = ChapterIndex.load(kernel, self.text)
+
+    @classmethod
+    def load(cls, kernel):
+        """Return the concordance for a LazyKernel, building the index if stale."""
+        if not kernel.band_names():
+            raise ValueError(f'{kernel.path} has no band_extraction text to index')
+        index = load_sidecar(kernel.path, 'concordance.pickle', lambda: build_index(kernel), version=INDEX_VERSION)
+        return cls(kernel, index)
+
+    def _encode(self, phrase):
+        """Map a phrase to token ids, or None if any word never occurs."""
+        vocab = self.index['vocab']
+        words, _, _ = tokenize(phrase)
+        ids = [vocab.get(word) for word in words]
+        if not ids or None in ids:
+            return None
+        return array('I', ids)
+
+    def _range(self, query):
+        """Return the [lo, hi) suffix array slice whose suffixes start with query."""
+        tokens = self.index['tokens']
+        suffixes = self.index['suffixes']
+        width = len(query)
+
+        lo, hi = 0, len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = suffixes[mid]
+            if tokens[start:start + width] < query:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+
+        hi = len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = suffixes[mid]
+            if tokens[start:start + width] <= query:
+                lo = mid + 1
+            else:
+                hi = mid
+        return first, lo
+
+    def positions(self, phrase):
+        """Return the token positions where phrase occurs, in text order."""
+        query = self._encode(phrase)
+        if query is None:
+            return []
+        lo, hi = self._range(query)
+        return sorted(self.index['suffixes'][lo:hi])
+
+    def count(self, phrase):
+        """Return the number of occurrences of phrase."""
+        query = self._encode(phrase)
+        if query is None:
+            return 0
+        lo, hi = self._range(query)
+        return hi - lo
+
+    def locate(self, offset):
+        """Return (band, band_offset) for a char offset in the concatenated text."""
+        for band, start, end in self.index['bands']:
+            if start <= offset < end:
+                return band, offset - start
+        return None, None
+
+    def query(self, phrase, sentences=1, limit=None):
+        """
+        Return keyword-in-context hits for phrase.
+
+        Each hit is {'band', 'chapter', 'offset', 'left', 'match', 'right'}:
+        offset is the char offset within the band, and left/right hold the
+        rest of the matching sentence plus `sentences` sentences either side.
+        """
+        width = len(self._encode(phrase) or ())
+        starts = self.index['starts']
+        ends = self.index['ends']
+        boundaries = self.index['sentences']
+
+        hits = []
+        for position in self.positions(phrase)[:limit]:
+            start = starts[position]
+            end = ends[position + width - 1]
+
+            first = bisect_right(boundaries, start) - 1
+            last = bisect_right(boundaries, end - 1)
+            context_start = boundaries[max(0, first - sentences)]
+            context_end = boundaries[last + sentences] if last + sentences < len(boundaries) else len(self.text)
+
+            band, band_offset = self.locate(start)
+            hits.append({
+                'band': band,
+                'chapter': self.chapters.chapter_at(start),
+                'offset': band_offset,
+                'left': self.text[context_start:start],
+                'match': self.text[start:end],
+                'right': self.text[end:context_end].rstrip(),
+            })
+        return hits
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    import time
+    from kernel_loader import load_kernel
+
+    if len(sys.argv) < 3:
+        print('Usage: python concordance.py <kernel.json> "<phrase>" [sentences]')
+        sys.exit(1)
+
+    sentences = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    concordance = Concordance.load(load_kernel(sys.argv[1]))
+
+    started = time.perf_counter()
+    hits = concordance.query(sys.argv[2], sentences=sentences)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    for hit in hits:
+        print(f'[{hit["band"]}, chapter {hit["chapter"]}, offset {hit["offset"]}]')
+        print(f'  {hit["left"]}[{hit["match"]}]{hit["right"]}')
+        print()
+    print(f'{len(hits)} hit(s) in {elapsed:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
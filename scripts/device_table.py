@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Device Table
+Flattens every micro_device across the corpus into one columnar NumPy
+table, for cross-book questions such as "which books prioritise
+Juxtaposition in the climax band".
+
+Each device is one row of a structured array:
+    book       index into table.books (queried by index, kernel path or title)
+    name       interned device name (index into table.names)
+    band       band id (BANDS order; falls back to assigned_section, -1 if unknown)
+    section    assigned_section id
+    location   location_percent as a whole-book percent (v5.1 values, which
+               are relative to the section, mapped through its range; NaN
+               if missing)
+    tier       pedagogical_tier (-1 if missing)
+    verified   quote_verified (1, 0, or -1 if missing)
+    rank       position in device_priorities (-1 if not prioritised)
+    index      position in the kernel's micro_devices
+
+Filters and group-bys are plain vectorized mask/bincount operations over
+the columns. A built table can be saved to .npz and reloaded without
+opening any kernel.
+
+Usage:
+    python scripts/device_table.py kernels/ name=Juxtaposition band=climax rank=0:5
+    python scripts/device_table.py kernels/ band=climax --by name
+    python scripts/device_table.py kernels/ --save corpus_devices.npz
+    python scripts/device_table.py corpus_devices.npz name=Symbolism --by book
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from kernel_archive import kernel_paths
+from kernel_model import BAND_IDS, BANDS, Kernel
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DTYPE = np.dtype([
+    ('book', np.int32),
+    ('name', np.int32),
+    ('band', np.int8),
+    ('section', np.int8),
+    ('location', np.float32),
+    ('tier', np.int8),
+    ('verified', np.int8),
+    ('rank', np.int16),
+    ('index', np.int32),
+])
+
+# Columns holding ids into a lookup list; query values are encoded before matching
+_ENCODED = {'book', 'name', 'band', 'section'}
+
+
+# =============================================================================
+# DEVICE TABLE
+# =============================================================================
+
+class DeviceTable:
+    """Structured array of devices plus the book and name lookup lists."""
+
+    def __init__(self, rows, books, names):
+        self.rows = rows
+        self.books = books
+        self.names = names
+        self._name_ids = {name: i for i, name in enumerate(names)}
+        self._book_ids = {book['path']: i for i, book in enumerate(books)}
+        self._title_ids = {}
+        for i, book in enumerate(books):
+            self._title_ids.setdefault(book['title'], []).append(i)
+        # Books sharing a title are labelled with their path as well
+        self._book_labels = [
+            book['title'] if len(self._title_ids[book['title']]) == 1 else f'{book["title"]} ({book["path"]})'
+            for book in books
+        ]
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, paths):
+        """Load kernels and flatten their devices."""
+        books = []
+        names = []
+        name_ids = {}
+        rows = []
+
+        for book_id, path in enumerate(paths):
+            kernel = Kernel.load(path)
+            books.append({'title': kernel.title, 'author': kernel.author,
+                          'kernel_version': kernel.kernel_version, 'path': str(path)})
+            ranks = {}
+            for rank, name in enumerate(kernel.device_priorities):
+                ranks.setdefault(name, rank)
+
+            for device in kernel.devices:
+                if device.name not in name_ids:
+                    name_ids[device.name] = len(names)
+                    names.append(device.name)
+                section = BAND_IDS.get(device.assigned_section, -1)
+                location = kernel.book_location(device)
+                rows.append((
+                    book_id,
+                    name_ids[device.name],
+                    BAND_IDS.get(device.band, section),
+                    section,
+                    np.nan if location is None else location,
+                    device.pedagogical_tier if isinstance(device.pedagogical_tier, int) else -1,
+                    -1 if device.quote_verified is None else int(bool(device.quote_verified)),
+                    ranks.get(device.name, -1),
+                    device.index,
+                ))
+
+        return cls(np.array(rows, dtype=DTYPE), books, names)
+
+    @classmethod
+    def load(cls, path):
+        """Load a table saved with save()."""
+        with np.load(path, allow_pickle=False) as archive:
+            lookups = json.loads(str(archive['lookups']))
+            return cls(archive['rows'], lookups['books'], lookups['names'])
+
+    def save(self, path):
+        """Save the table as .npz (rows plus JSON lookups)."""
+        lookups = json.dumps({'books': self.books, 'names': self.names})
+        np.savez_compressed(path, rows=self.rows, lookups=np.array(lookups))
+
+    def _encode(self, column, value):
+        """Map a query value for an id column to its ids ([-2] if unknown)."""
+        if column == 'name':
+            return [self._name_ids.get(value, -2)]
+        if column == 'book':
+            if isinstance(value, int):
+                return [value]
+            if value in self._book_ids:
+                return [self._book_ids[value]]
+            return self._title_ids.get(value, [-2])
+        return [BAND_IDS.get(value, -2)]
+
+    def _decode(self, column, value):
+        """Map an id back to its label."""
+        if column == 'name':
+            return self.names[value]
+        if column == 'book':
+            return self._book_labels[value]
+        if column in ('band', 'section'):
+            return BANDS[value] if value >= 0 else None
+        return value.item() if hasattr(value, 'item') else value
+
+    def mask(self, **conditions):
+        """
+        Return a boolean mask of rows matching every condition.
+
+        A condition is a single value, a list/set of values, or for numeric
+        columns a (low, high) tuple meaning low <= value < high.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        for column, value in conditions.items():
+            data = self.rows[column]
+            if isinstance(value, tuple):
+                low, high = value
+                if low is not None:
+                    mask &= data >= low
+                if high is not None:
+                    mask &= data < high
+                continue
+            values = value if isinstance(value, (list, set, frozenset)) else [value]
+            if column in _ENCODED:
+                values = [i for v in values for i in self._encode(column, v)]
+            elif column == 'verified':
+                values = [int(v) if isinstance(v, bool) else v for v in values]
+            mask &= np.isin(data, values)
+        return mask
+
+    def filter(self, **conditions):
+        """Return a new table holding only the matching rows."""
+        return DeviceTable(self.rows[self.mask(**conditions)], self.books, self.names)
+
+    def unique(self, column):
+        """Return the distinct decoded values of a column, in id order."""
+        return [self._decode(column, v) for v in np.unique(self.rows[column])]
+
+    def group_by(self, column, value=None, agg='count'):
+        """
+        Group rows by a column.
+
+        Without `value` returns {label: row count}. Otherwise aggregates
+        the `value` column with 'mean', 'sum', 'min' or 'max' (NaNs ignored).
+        """
+        keys, inverse = np.unique(self.rows[column], return_inverse=True)
+        if value is None or agg == 'count':
+            totals = np.bincount(inverse, minlength=len(keys))
+        else:
+            data = self.rows[value].astype(np.float64)
+            if agg in ('mean', 'sum'):
+                valid = ~np.isnan(data)
+                sums = np.bincount(inverse, weights=np.where(valid, data, 0), minlength=len(keys))
+                counts = np.bincount(inverse, weights=valid, minlength=len(keys))
+                totals = sums if agg == 'sum' else np.divide(
+                    sums, counts, out=np.full(len(keys), np.nan), where=counts > 0
+                )
+            elif agg in ('min', 'max'):
+                fill = np.inf if agg == 'min' else -np.inf
+                totals = np.full(len(keys), fill)
+                reduce = np.minimum if agg == 'min' else np.maximum
+                reduce.at(totals, inverse, np.where(np.isnan(data), fill, data))
+            else:
+                raise ValueError(f'Unknown aggregate: {agg}')
+        return {self._decode(column, k): t.item() for k, t in zip(keys, totals)}
+
+    def records(self):
+        """Yield rows as dicts with ids decoded."""
+        for row in self.rows:
+            yield {column: self._decode(column, row[column]) for column in DTYPE.names}
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def parse_condition(text):
+    """Parse 'column=value', 'column=a,b' or 'column=low:high' from the command line."""
+    column, _, value = text.partition('=')
+    if column not in DTYPE.names:
+        raise ValueError(f'Unknown column: {column}')
+
+    def convert(item):
+        if column in _ENCODED and column != 'book':
+            return item
+        if item.lower() in ('true', 'false'):
+            return item.lower() == 'true'
+        try:
+            return float(item) if '.' in item else int(item)
+        except ValueError:
+            return item
+
+    if ':' in value:
+        low, _, high = value.partition(':')
+        return column, (convert(low) if low else None, convert(high) if high else None)
+    if ',' in value:
+        return column, [convert(item) for item in value.split(',')]
+    return column, convert(value)
+
+
+def usage():
+    print('Usage: python device_table.py <kernels/ | kernel.json | table.npz> [column=value ...] [--by column] [--save table.npz]')
+    sys.exit(1)
+
+
+def main():
+    if len(sys.argv) < 2:
+        usage()
+
+    sources = []
+    conditions = {}
+    args = sys.argv[1:]
+    group = save = None
+    while args:
+        arg = args.pop(0)
+        if arg in ('--by', '--save') and not args:
+            print(f'✗ {arg} needs a value')
+            usage()
+        if arg == '--by':
+            group = args.pop(0)
+        elif arg == '--save':
+            save = args.pop(0)
+        elif '=' in arg:
+            try:
+                column, value = parse_condition(arg)
+            except ValueError as e:
+                print(f'✗ {e}')
+                usage()
+            conditions[column] = value
+        else:
+            sources.append(arg)
+
+    if len(sources) == 1 and sources[0].endswith('.npz'):
+        table = DeviceTable.load(sources[0])
+    else:
+        paths = [path for source in sources for path in kernel_paths(source)]
+        table = DeviceTable.build(paths)
+    if save:
+        table.save(save)
+        print(f'Written: {save} ({len(table):,} devices, {len(table.books)} books)')
+
+    matches = table.filter(**conditions)
+    print(f'{len(matches):,} of {len(table):,} devices match\n')
+    if group:
+        for label, count in sorted(matches.group_by(group).items(), key=lambda item: -item[1]):
+            print(f'  {count:>6}  {label}')
+    else:
+        for record in matches.records():
+            rank = record['rank'] if record['rank'] >= 0 else '-'
+            print(f'  {record["book"]}: {record["name"]} ({record["band"]}, '
+                  f'{record["location"]:.1f}%, tier {record["tier"]}, rank {rank})')
+
+
+if __name__ == '__main__':
+    main()
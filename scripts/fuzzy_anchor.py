@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Fuzzy Anchor
+Relocates anchor phrases that fail exact matching because of smart quotes,
+whitespace, hyphenation or OCR slips.
+
+Each band's text is normalized (quotes/dashes folded, whitespace collapsed,
+line-break hyphens joined, lowercased) and indexed by character n-grams.
+A lookup votes on candidate start positions using only the postings of the
+phrase's own n-grams, then scores the best few candidates with difflib.
+The index is built once per kernel version and cached with the kernel's
+other sidecars.
+
+Usage:
+    python scripts/fuzzy_anchor.py kernels/To_Kill_a_Mockingbird_kernel_v6_1.json "phrase to find"
+"""
+
+import sys
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+
+from kernel_loader import load_sidecar
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+GRAM_SIZE = 4
+MAX_POSTINGS = 2000     # Grams more common than this carry no signal; skip them
+CANDIDATES = 5          # Candidate starts scored with difflib per lookup
+MIN_SCORE = 0.85        # Below this a match is not trusted as a relocation
+INDEX_VERSION = 1
+
+_CHAR_MAP = {
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-',
+    '\u00a0': ' ', '\u2007': ' ', '\u2009': ' ', '\u202f': ' ',
+    '\u00ad': '', '\u200b': '',
+}
+
+
+# =============================================================================
+# NORMALIZATION
+# =============================================================================
+
+def normalize(text):
+    """
+    Normalize text for fuzzy matching.
+
+    Returns (normalized, offsets) where offsets[i] is the index in the
+    original text that produced normalized[i].
+    """
+    out = []
+    offsets = array('I')
+
+    for i, char in enumerate(text):
+        char = _CHAR_MAP.get(char, char)
+        if not char:
+            continue
+        if char.isspace():
+            if out and out[-1] == '-' and len(out) > 1 and out[-2].isalpha():
+                # Line-break hyphenation: "equiv- ocal" -> "equivocal"
+                out.pop()
+                offsets.pop()
+                continue
+            if out and out[-1] != ' ':
+                out.append(' ')
+                offsets.append(i)
+            continue
+        for piece in char.lower():
+            out.append(piece)
+            offsets.append(i)
+
+    return ''.join(out), offsets
+
+
+# =============================================================================
+# ANCHOR INDEX
+# =============================================================================
+
+class AnchorIndex:
+    """Per-band n-gram index over normalized band text."""
+
+    def __init__(self, bands):
+        # band -> (normalized text, offsets into original text, gram postings)
+        self.bands = bands
+
+    @classmethod
+    def build(cls, kernel):
+        """Build an index from a LazyKernel's band texts."""
+        bands = {}
+        for band in kernel.band_names():
+            normalized, offsets = normalize(kernel.band_text(band))
+            postings = {}
+            for pos in range(len(normalized) - GRAM_SIZE + 1):
+                postings.setdefault(normalized[pos:pos + GRAM_SIZE], []).append(pos)
+            postings = {gram: array('I', positions) for gram, positions in postings.items()}
+            bands[band] = (normalized, offsets, postings)
+        return cls(bands)
+
+    @classmethod
+    def load(cls, kernel):
+        """Return the cached index for a LazyKernel, building it if stale."""
+        bands = load_sidecar(
+            kernel.path, 'anchors.pickle', lambda: cls.build(kernel).bands, version=INDEX_VERSION
+        )
+        return cls(bands)
+
+    def _score(self, phrase, normalized, start):
+        """Align phrase against text near start. Returns (score, span_start, span_end)."""
+        slack = max(8, len(phrase) // 4)
+        lo = max(0, start - slack)
+        window = normalized[lo:start + len(phrase) + slack]
+        blocks = [b for b in SequenceMatcher(None, phrase, window, autojunk=False).get_matching_blocks() if b.size]
+        if not blocks:
+            return 0.0, start, start
+        matched = sum(b.size for b in blocks)
+        span_start = lo + blocks[0].b
+        span_end = lo + blocks[-1].b + blocks[-1].size
+        return 2.0 * matched / (len(phrase) + span_end - span_start), span_start, span_end
+
+    def _best(self, query, bands):
+        """Best-scoring candidate for a normalized query within the given bands."""
+        votes = Counter()
+        for name in bands:
+            postings = self.bands[name][2]
+            for k in range(len(query) - GRAM_SIZE + 1):
+                positions = postings.get(query[k:k + GRAM_SIZE])
+                if not positions or len(positions) > MAX_POSTINGS:
+                    continue
+                for pos in positions:
+                    votes[(name, pos - k)] += 1
+
+        best = None
+        for (name, start), _ in votes.most_common(CANDIDATES):
+            normalized, offsets, _ = self.bands[name]
+            score, span_start, span_end = self._score(query, normalized, max(0, start))
+            if span_end > span_start and (best is None or score > best['score']):
+                best = {
+                    'band': name,
+                    'start': offsets[span_start],
+                    'end': offsets[span_end - 1] + 1,
+                    'score': round(score, 3),
+                }
+        return best
+
+    def locate(self, phrase, band=None):
+        """
+        Find the best fuzzy match for phrase.
+
+        Returns {'band', 'start', 'end', 'score'} with start/end as offsets
+        into the original band text, or None if nothing shares an n-gram.
+        With a band, that band is searched first; if nothing there reaches
+        MIN_SCORE the whole index is searched, and 'band' names where the
+        match was actually found.
+        """
+        query, _ = normalize(phrase)
+        query = query.strip()
+        if len(query) < GRAM_SIZE:
+            return None
+
+        if band not in self.bands:
+            return self._best(query, list(self.bands))
+
+        best = self._best(query, [band])
+        if best is None or best['score'] < MIN_SCORE:
+            others = self._best(query, [name for name in self.bands if name != band])
+            if others is not None and (best is None or others['score'] > best['score']):
+                best = others
+        return best
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    from kernel_loader import load_kernel
+
+    if len(sys.argv) < 3:
+        print('Usage: python fuzzy_anchor.py <kernel.json> "<phrase>" [band]')
+        sys.exit(1)
+
+    kernel = load_kernel(sys.argv[1])
+    index = AnchorIndex.load(kernel)
+    band = sys.argv[3] if len(sys.argv) > 3 else None
+    match = index.locate(sys.argv[2], band)
+    if match is None:
+        print('No match')
+        sys.exit(1)
+
+    text = kernel.band_text(match['band'])[match['start']:match['end']]
+    if band and match['band'] != band:
+        print(f'Band: {match["band"]} (not found in {band})')
+    else:
+        print(f'Band: {match["band"]}')
+    print(f'Offset: {match["start"]}-{match["end"]}')
+    print(f'Score: {match["score"]}')
+    print(f'Text: {text}')
+
+
+if __name__ == '__main__':
+    main()
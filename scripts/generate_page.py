@@ -6,14 +6,52 @@ Converts kernel JSON to analysis HTML page via Claude API.
 Usage:
     python scripts/generate_page.py kernels/Orbital_kernel_v6_1.json
     python scripts/generate_page.py kernels/  # Process all kernels in folder
+    python scripts/generate_page.py kernels/catalogue.kpack  # Process all kernels in an archive
+    python scripts/generate_page.py kernels/ --concurrency 8
+    python scripts/generate_page.py kernels/ --batch
+    python scripts/generate_page.py kernels/ --dry-run  # Estimated prompt tokens per section, nothing sent
+
+Several kernels are generated concurrently (default 4 API calls in flight);
+each page is written as soon as its response arrives, and one kernel failing
+does not stop the others. --concurrency 1 processes them one at a time.
+Pages that fail transiently (the API still overloaded after the gateway's
+retries, or off-spec output) are queued and tried once more at the end.
+
+Responses are streamed: each page is written to a temp file next to
+dist/<slug>/index.html as the text arrives (tail it to watch a slow page)
+and swapped into place when complete, so an interrupted or failed
+generation never leaves a partial page behind. Time to first token and
+output tokens per second are reported per page.
+
+The stream is checked against the page skeleton as it arrives (header,
+then five section.section blocks in PAGE_SECTIONS order, with device blocks
+under Key Techniques). Off-spec output - a code fence, a wrong or missing
+section - is cancelled at the first bad tag and retried, up to
+PAGE_ATTEMPTS attempts; generation is stopped as soon as </main> closes.
+
+--batch sends every page request as one Message Batches job instead
+(cheaper, for overnight rebuilds; see llm_batch.py) and writes the pages
+once the batch ends.
+
+A page prompt over LLM_PROMPT_BUDGET tokens (see prompt_budget.py) loses
+its quote contexts, then long device effects, then its last device before
+it is sent.
 """
 
+import asyncio
 import os
 import sys
-import json
 import re
+import tempfile
+import time
 from pathlib import Path
-from anthropic import Anthropic
+from kernel_model import Kernel, select_devices
+from concordance import Concordance
+from kernel_archive import kernel_paths
+from llm_batch import run_batch
+from llm_gateway import (STATS, RejectResponse, StopStream, astream, build_request, cacheable, is_transient,
+                         print_stats, response_cache, stream)
+from prompt_budget import describe, fit_prompt, print_report
 
 # =============================================================================
 # CONFIGURATION
@@ -21,8 +59,18 @@ from anthropic import Anthropic
 
 DIST_DIR = Path('./dist')
 BASE_URL = 'https://luminait.app'
-
-client = Anthropic()
+CONTEXT_SENTENCES = 1   # Sentences either side of each device quote sent as context
+EFFECT_CHARS = 200      # Device effects are cut to this length if the prompt is over budget
+PAGE_MAX_TOKENS = 8000
+DEFAULT_CONCURRENCY = 4 # Pages generated at once when given several kernels
+BATCH_NAME = 'pages'    # Saved batch state for --batch (resumed if interrupted)
+PROGRESS_SECONDS = 0.5  # Live progress refresh interval for single-page runs
+PAGE_ATTEMPTS = 3       # Attempts per page when the stream is cancelled as off-spec
+RETRY_ROUNDS = 1        # Passes over the retry queue (transiently failed pages) at the end of a run
+
+# Expected <h2> of each section.section, in order (see PAGE_INSTRUCTIONS)
+PAGE_SECTIONS = ['What the Novel Does', 'The Central Pattern', 'Key Techniques', 'Structure', 'Themes']
+DEVICE_SECTION = 'Key Techniques'   # Must contain class="device" blocks
 
 # =============================================================================
 # REWRITING METHOD (from REWRITING_METHOD_v1_0.md)
@@ -216,14 +264,16 @@ def slugify(text):
 
 
 def extract_kernel_data(kernel):
-    """Extract relevant data from kernel JSON."""
-    metadata = kernel.get('metadata', {})
-    pattern = kernel.get('alignment_pattern', {})
-    macro = kernel.get('macro_variables', {})
-    devices = kernel.get('micro_devices', [])
+    """Extract relevant data from an indexed Kernel."""
+    metadata = kernel.metadata
+    pattern = kernel.alignment
+    macro = kernel.macro
     
     # Select best devices
-    selected_devices = select_devices(devices, 4)
+    selected_devices = select_devices(kernel.devices, 4)
+    
+    # Surrounding passage for each quote (None when it cannot be looked up)
+    contexts = quote_contexts(kernel, selected_devices)
     
     return {
         'title': metadata.get('title', 'Unknown'),
@@ -232,41 +282,41 @@ def extract_kernel_data(kernel):
         'pattern_name': pattern.get('pattern_name', 'Unknown Pattern'),
         'core_dynamic': pattern.get('core_dynamic', ''),
         'reader_effect': pattern.get('reader_effect', ''),
-        'device_priorities': pattern.get('device_priorities', []),
+        'device_priorities': kernel.device_priorities,
         'narrative': macro.get('narrative', {}),
         'rhetoric': macro.get('rhetoric', {}),
         'device_mediation': macro.get('device_mediation', {}).get('summary', ''),
-        'devices': selected_devices
+        'devices': selected_devices,
+        'contexts': contexts
     }
 
 
-def select_devices(devices, count):
-    """Select best devices for variety."""
-    # Filter to verified quotes only
-    verified = [d for d in devices if d.get('quote_verified') == True]
-    
-    # Prefer variety: different device types, different sections
-    selected = []
-    used_types = set()
-    used_sections = set()
-    
-    # First pass: one of each type from different sections
-    for device in verified:
-        if len(selected) >= count:
-            break
-        if device['name'] not in used_types and device.get('assigned_section') not in used_sections:
-            selected.append(device)
-            used_types.add(device['name'])
-            used_sections.add(device.get('assigned_section'))
+def quote_contexts(kernel, devices):
+    """Look up the passage around each device quote via the concordance."""
+    if not kernel.data.band_names():
+        return [None] * len(devices)
     
-    # Second pass: fill remaining slots
-    for device in verified:
-        if len(selected) >= count:
-            break
-        if device not in selected:
-            selected.append(device)
-    
-    return selected
+    concordance = Concordance.load(kernel.data)
+    contexts = []
+    for device in devices:
+        hits = concordance.query(device['anchor_phrase'], sentences=CONTEXT_SENTENCES)
+        # Prefer the hit in the device's own band
+        hits = [h for h in hits if h['band'] == device.get('band')] or hits
+        if not hits:
+            contexts.append(None)
+            continue
+        hit = hits[0]
+        contexts.append({
+            'passage': ' '.join((hit['left'] + hit['match'] + hit['right']).split()),
+            'chapter': hit['chapter'],
+        })
+    return contexts
+
+
+def class_names(attrs):
+    """CSS class names from a tag's attribute text."""
+    match = re.search(r'class\s*=\s*["\']([^"\']*)', attrs)
+    return match.group(1).split() if match else []
 
 
 def generate_seo_tags(data, slug):
@@ -290,59 +340,21 @@ def generate_seo_tags(data, slug):
 # CLAUDE API CALL
 # =============================================================================
 
-def generate_content(kernel_data):
-    """Call Claude API to generate page content."""
-    
-    # Format devices for prompt
-    devices_text = ""
-    for i, d in enumerate(kernel_data['devices'], 1):
-        devices_text += f"""
-{i}. **{d['name']}**
-   Quote: "{d['anchor_phrase']}"
-   Effect: {d['effect']}
-   Section: {d.get('assigned_section', 'unknown')}
-"""
-    
-    # Get narrative info
-    narrative = kernel_data['narrative']
-    rhetoric = kernel_data['rhetoric']
-    
-    prompt = f"""
+# Everything identical across kernels: sent as a prompt-cached system prompt,
+# ahead of the per-kernel user message from build_prompt()
+PAGE_INSTRUCTIONS = f"""
 You are generating the main content (inside <body>) for an HTML analysis page.
 
 {REWRITING_METHOD}
 
-## Kernel Data
-
-**Title:** {kernel_data['title']}
-**Author:** {kernel_data['author']}
-
-**Pattern Name:** {kernel_data['pattern_name']}
-**Core Dynamic:** {kernel_data['core_dynamic']}
-**Reader Effect:** {kernel_data['reader_effect']}
-
-**Narrative Voice:**
-- POV: {narrative.get('voice', {}).get('pov_description', 'Not specified')}
-- Tone: {rhetoric.get('voice', {}).get('tone', 'Not specified')}
-
-**Narrative Structure:**
-- Chronology: {narrative.get('structure', {}).get('chronology', 'Not specified')}
-- Plot Architecture: {narrative.get('structure', {}).get('plot_architecture_description', 'Not specified')}
-- Beginning: {narrative.get('structure', {}).get('beginning_type', 'Not specified')}
-- Ending: {narrative.get('structure', {}).get('ending_type', 'Not specified')}
-
-**Device Mediation:** {kernel_data['device_mediation']}
-
-**Selected Devices (use these exact quotes):**
-{devices_text}
-
 ## Output Format
 
-Generate ONLY the content that goes inside <body>, structured as:
+Generate ONLY the content that goes inside <body>, structured as below, where
+[Title], [Author] and [Pattern Name] are taken from the Kernel Data:
 
 <header>
-    <h1>{kernel_data['title']}</h1>
-    <p class="author">by {kernel_data['author']}</p>
+    <h1>[Title]</h1>
+    <p class="author">by [Author]</p>
 </header>
 
 <main>
@@ -353,7 +365,7 @@ Generate ONLY the content that goes inside <body>, structured as:
     </section>
     
     <section class="section">
-        <h2>The Central Pattern: {kernel_data['pattern_name']}</h2>
+        <h2>The Central Pattern: [Pattern Name]</h2>
         [Pattern explanation - unpacked, with bullet list of components]
         [Include scaffold box explaining "why this name"]
     </section>
@@ -385,44 +397,228 @@ Use these CSS classes:
 Output ONLY the HTML content. No explanation, no markdown, no code blocks.
 """
 
-    message = client.messages.create(
-        model='claude-sonnet-4-20250514',
-        max_tokens=8000,
-        messages=[
-            {'role': 'user', 'content': prompt}
-        ]
-    )
+PAGE_SYSTEM = cacheable(PAGE_INSTRUCTIONS.strip())
+
+
+PAGE_INPUT = """
+## Kernel Data
+
+{kernel}
+
+**Selected Devices (use these exact quotes):**
+{devices}
+"""
+
+
+def format_devices(kernel_data, count=None, effect_chars=None, contexts=True):
+    """Device entries for the page prompt, optionally fewer or shorter."""
+    devices_text = ""
+    devices = kernel_data['devices'][:count]
+    passages = (kernel_data.get('contexts') if contexts else None) or [None] * len(devices)
+    for i, (d, context) in enumerate(zip(devices, passages), 1):
+        effect = d['effect']
+        if effect_chars and len(effect) > effect_chars:
+            effect = effect[:effect_chars] + '...'
+        devices_text += f"""
+{i}. **{d['name']}**
+   Quote: "{d['anchor_phrase']}"
+   Effect: {effect}
+   Section: {d.get('assigned_section', 'unknown')}
+"""
+        if context:
+            devices_text += f"""   Context (chapter {context['chapter']}): {context['passage']}
+"""
+    return devices_text
+
+
+def fit_page_prompt(kernel_data):
+    """
+    Assemble the per-kernel part of the page prompt (the user message)
+    within the prompt budget. Returns (prompt, report).
+
+    Over budget, the quote context passages go first, then long device
+    effects are cut, then the last device is dropped.
+    """
+    # Get narrative info
+    narrative = kernel_data['narrative']
+    rhetoric = kernel_data['rhetoric']
     
-    return message.content[0].text
+    kernel = f"""**Title:** {kernel_data['title']}
+**Author:** {kernel_data['author']}
+
+**Pattern Name:** {kernel_data['pattern_name']}
+**Core Dynamic:** {kernel_data['core_dynamic']}
+**Reader Effect:** {kernel_data['reader_effect']}
+
+**Narrative Voice:**
+- POV: {narrative.get('voice', {}).get('pov_description', 'Not specified')}
+- Tone: {rhetoric.get('voice', {}).get('tone', 'Not specified')}
+
+**Narrative Structure:**
+- Chronology: {narrative.get('structure', {}).get('chronology', 'Not specified')}
+- Plot Architecture: {narrative.get('structure', {}).get('plot_architecture_description', 'Not specified')}
+- Beginning: {narrative.get('structure', {}).get('beginning_type', 'Not specified')}
+- Ending: {narrative.get('structure', {}).get('ending_type', 'Not specified')}
+
+**Device Mediation:** {kernel_data['device_mediation']}"""
+
+    def no_contexts(fields):
+        fields['devices'] = format_devices(kernel_data, contexts=False)
+
+    def short_effects(fields):
+        fields['devices'] = format_devices(kernel_data, effect_chars=EFFECT_CHARS, contexts=False)
+
+    def fewer_devices(fields):
+        fields['devices'] = format_devices(kernel_data, max(len(kernel_data['devices']) - 1, 1), EFFECT_CHARS, False)
+
+    return fit_prompt(PAGE_INPUT, {'kernel': kernel, 'devices': format_devices(kernel_data)}, [
+        ('quote contexts', no_contexts),
+        (f'device effects cut to {EFFECT_CHARS} chars', short_effects),
+        ('last device', fewer_devices),
+    ], system=PAGE_INSTRUCTIONS)
+
+
+def build_prompt(kernel_data):
+    """Per-kernel page prompt (the user message), trimmed to the prompt budget."""
+    prompt, report = fit_page_prompt(kernel_data)
+    if report['trimmed']:
+        print(f'  ⚠ {kernel_data["title"]}: {describe(report)}')
+    return prompt
+
+
+def generate_content(kernel_data, on_text=None, check=None):
+    """
+    Stream page content from Claude, passing each chunk to on_text. Returns (content, timing).
+
+    check(text) runs on the finished text before it is cached (see stream()).
+    """
+    return stream('page', build_prompt(kernel_data), on_text, max_tokens=PAGE_MAX_TOKENS, check=check,
+                  system=PAGE_SYSTEM)
+
+
+async def generate_content_async(kernel_data, on_text=None, check=None):
+    """Async version of generate_content, for batch runs."""
+    return await astream('page', build_prompt(kernel_data), on_text, max_tokens=PAGE_MAX_TOKENS, check=check,
+                         system=PAGE_SYSTEM)
 
 
 # =============================================================================
-# MAIN FUNCTIONS
+# STRUCTURE GUARD
 # =============================================================================
 
-def generate_page(kernel_path):
-    """Generate HTML page from kernel JSON."""
-    kernel_path = Path(kernel_path)
-    print(f'Processing: {kernel_path}')
-    
-    # Read kernel
-    with open(kernel_path, 'r', encoding='utf-8') as f:
-        kernel = json.load(f)
-    
-    # Extract data
-    kernel_data = extract_kernel_data(kernel)
-    print(f'  Title: {kernel_data["title"]}')
-    print(f'  Pattern: {kernel_data["pattern_name"]}')
-    print(f'  Devices: {len(kernel_data["devices"])} selected')
-    
-    # Generate slug
-    slug = slugify(kernel_data['title'])
-    print(f'  Slug: {slug}')
-    
-    # Generate content via Claude
-    print('  Calling Claude API...')
-    content = generate_content(kernel_data)
-    
+_TAG = re.compile(r'<(/?)(header|main|section|h2)\b([^>]*)>', re.IGNORECASE)
+
+
+class OffSpecPage(RejectResponse):
+    """
+    Raised as soon as generated HTML leaves the expected page skeleton.
+    The gateway never caches a response rejected with it.
+    """
+
+
+class StructureGuard:
+    """
+    Follows streamed page HTML against the skeleton in PAGE_INSTRUCTIONS:
+    <header>, then <main> holding five <section class="section"> whose <h2>
+    headings follow PAGE_SECTIONS, with device blocks under Key Techniques.
+
+    feed() raises OffSpecPage at the first deviation, so the request can be
+    cancelled and retried, and StopStream once </main> has closed, so
+    nothing after it is generated. content() is the body up to </main>.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.pos = 0            # Tag scan resumes here (a tag may be split across chunks)
+        self.started = False
+        self.header_closed = False
+        self.in_main = False
+        self.sections = 0
+        self.section_start = None
+        self.h2_start = None
+        self.end = None         # Index just past </main>
+
+    def feed(self, chunk):
+        self.text += chunk
+        if not self.started:
+            head = self.text.lstrip()
+            if len(head) < len('<header'):
+                return
+            if head.startswith('```'):
+                raise OffSpecPage('output wrapped in a code fence')
+            if not head.lower().startswith('<header'):
+                raise OffSpecPage(f'output starts with {head[:30]!r} instead of <header>')
+            self.started = True
+        for match in _TAG.finditer(self.text, self.pos):
+            self.pos = match.end()
+            self._tag(match)
+
+    def _tag(self, match):
+        closing, name, attrs = match.group(1) == '/', match.group(2).lower(), match.group(3)
+        if name == 'header':
+            if closing:
+                self.header_closed = True
+            elif self.header_closed:
+                raise OffSpecPage('second <header>')
+        elif name == 'main':
+            if not closing:
+                if not self.header_closed or self.in_main:
+                    raise OffSpecPage('<main> before </header>')
+                self.in_main = True
+            elif self.sections < len(PAGE_SECTIONS):
+                raise OffSpecPage(f'</main> after {self.sections} of {len(PAGE_SECTIONS)} sections')
+            else:
+                self.end = match.end()
+                raise StopStream()
+        elif name == 'section':
+            if closing:
+                section = self.text[self.section_start:match.start()]
+                if (PAGE_SECTIONS[self.sections - 1] == DEVICE_SECTION
+                        and not re.search(r'class\s*=\s*["\'][^"\']*\bdevice\b', section)):
+                    raise OffSpecPage(f'{DEVICE_SECTION} has no class="device" blocks')
+                return
+            if not self.in_main:
+                raise OffSpecPage('<section> outside <main>')
+            if 'section' not in class_names(attrs):
+                raise OffSpecPage(f'<section{attrs}> without class="section"')
+            self.sections += 1
+            if self.sections > len(PAGE_SECTIONS):
+                raise OffSpecPage(f'more than {len(PAGE_SECTIONS)} sections')
+            self.section_start = match.end()
+        elif name == 'h2':
+            if not closing:
+                self.h2_start = match.end()
+            elif self.sections and self.h2_start is not None:
+                heading = re.sub(r'<[^>]+>', '', self.text[self.h2_start:match.start()]).strip()
+                expected = PAGE_SECTIONS[self.sections - 1]
+                if not heading.lower().startswith(expected.lower()):
+                    raise OffSpecPage(f'section {self.sections} is {heading!r}, expected {expected!r}')
+                self.h2_start = None
+
+    def finish(self):
+        """Raise OffSpecPage if the response ended before </main>."""
+        if self.end is None:
+            raise OffSpecPage(f'response ended before </main> ({self.sections} section(s))')
+
+    def content(self):
+        return self.text[:self.end] if self.end is not None else self.text
+
+    def check(self, text):
+        """Check a complete (non-streamed) response. Returns its body up to </main>."""
+        try:
+            self.feed(text)
+        except StopStream:
+            pass
+        self.finish()
+        return self.content()
+
+
+# =============================================================================
+# PAGE OUTPUT
+# =============================================================================
+
+def render_page(kernel_data, slug, content):
+    """Wrap generated content in the page template."""
     # Clean content (remove markdown code blocks if present)
     content = re.sub(r'^```html?\s*', '', content)
     content = re.sub(r'\s*```$', '', content)
@@ -434,51 +630,381 @@ def generate_page(kernel_path):
     seo_tags = generate_seo_tags(kernel_data, slug)
     
     # Assemble HTML
-    html = HTML_TEMPLATE.format(
+    return HTML_TEMPLATE.format(
         seo_tags=seo_tags,
         content=content,
         title=kernel_data['title'],
         kernel_version=kernel_data['kernel_version']
     )
+
+
+class PageWriter:
+    """
+    Writes a page to a temp file in dist/<slug>/ while it streams in.
+
+    write() appends raw chunks as they arrive; commit() rewrites the temp
+    file with the finished, cleaned page and renames it over index.html;
+    abort() removes it. index.html is therefore only ever a complete page.
+    """
+
+    def __init__(self, kernel_data, slug, progress=False):
+        self.kernel_data = kernel_data
+        self.slug = slug
+        self.output_path = DIST_DIR / slug / 'index.html'
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=self.output_path.parent, prefix='.index.html.', suffix='.tmp')
+        os.chmod(self.tmp_path, 0o644)     # mkstemp creates 0600; pages are served as-is
+        self.file = os.fdopen(fd, 'w', encoding='utf-8', errors='replace')
+        self.chars = 0
+        self.progress = progress
+        self.start = time.perf_counter()
+        self.last_progress = 0.0
+
+    def _end_progress(self):
+        if self.progress and self.last_progress:
+            print()
+            self.last_progress = 0.0
+
+    def reset(self):
+        """Discard the text streamed so far (before a retry)."""
+        self._end_progress()
+        self.file.seek(0)
+        self.file.truncate()
+        self.chars = 0
+        self.start = time.perf_counter()
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.file.flush()
+        self.chars += len(chunk)
+        if self.progress:
+            now = time.perf_counter()
+            if now - self.last_progress >= PROGRESS_SECONDS:
+                self.last_progress = now
+                print(f'\r  Streaming: {self.chars:,} chars in {now - self.start:.1f}s', end='', flush=True)
+
+    def commit(self, content):
+        """Replace the streamed text with the finished page and move it into place."""
+        self._end_progress()
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(render_page(self.kernel_data, self.slug, content))
+        self.file.close()
+        os.replace(self.tmp_path, self.output_path)
+        return self.output_path
+
+    def abort(self):
+        self._end_progress()
+        self.file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def prepare_page(kernel_path):
+    """Load a kernel and return (kernel_data, slug)."""
+    # Read kernel (band text stays on disk)
+    kernel = Kernel.load(kernel_path)
+    kernel_data = extract_kernel_data(kernel)
+    return kernel_data, slugify(kernel_data['title'])
+
+
+def write_page(kernel_data, slug, content):
+    """Write finished content to dist/<slug>/index.html (atomically)."""
+    return PageWriter(kernel_data, slug).commit(content)
+
+
+def guarded(writer, guard):
+    """on_text callback: write each chunk, then check the structure so far."""
+    def on_text(chunk):
+        writer.write(chunk)
+        guard.feed(chunk)
+    return on_text
+
+
+def finished(guard):
+    """check callback: reject a response that ended before </main>, before it can be cached."""
+    def check(text):
+        guard.finish()
+    return check
+
+
+def cancelled(slug, attempt, writer, error):
+    """Report an off-spec attempt and prepare the retry; raise once attempts run out."""
+    chars = writer.chars
+    writer.reset()
+    retrying = attempt < PAGE_ATTEMPTS
+    print(f'  ⚠ {slug}: cancelled after {chars:,} chars, {error}' + (' - retrying' if retrying else ''))
+    if not retrying:
+        raise OffSpecPage(f'{error} (after {PAGE_ATTEMPTS} attempts)') from error
+
+
+def generate_streamed(kernel_data, slug, progress=False):
+    """
+    Stream one page into dist/<slug>/index.html. Returns (output_path, timing).
+
+    The stream is cancelled as soon as StructureGuard finds it off-spec and
+    retried, up to PAGE_ATTEMPTS attempts; it is ended at </main>.
+    """
+    writer = PageWriter(kernel_data, slug, progress)
+    try:
+        for attempt in range(1, PAGE_ATTEMPTS + 1):
+            guard = StructureGuard()
+            try:
+                content, timing = generate_content(kernel_data, guarded(writer, guard), finished(guard))
+            except OffSpecPage as e:
+                cancelled(slug, attempt, writer, e)
+                continue
+            return writer.commit(guard.content()), dict(timing, attempts=attempt)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+async def generate_streamed_async(kernel_data, slug):
+    """Async version of generate_streamed."""
+    writer = PageWriter(kernel_data, slug)
+    try:
+        for attempt in range(1, PAGE_ATTEMPTS + 1):
+            guard = StructureGuard()
+            try:
+                content, timing = await generate_content_async(kernel_data, guarded(writer, guard), finished(guard))
+            except OffSpecPage as e:
+                cancelled(slug, attempt, writer, e)
+                continue
+            return writer.commit(guard.content()), dict(timing, attempts=attempt)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def describe_timing(timing):
+    """One-line summary of a streamed call's latency."""
+    retries = f', {timing["attempts"]} attempts' if timing.get('attempts', 1) > 1 else ''
+    if timing['cached']:
+        return 'cached' + retries
+    if timing['stopped']:
+        return f'first token {timing["first_token"]:.1f}s, stopped at </main>' + retries
+    return (f'first token {timing["first_token"]:.1f}s, '
+            f'{timing["tokens_per_second"]:.0f} tok/s, {timing["output_tokens"]:,} tokens' + retries)
+
+
+def generate_page(kernel_path):
+    """Generate HTML page from kernel JSON."""
+    kernel_path = Path(kernel_path)
+    print(f'Processing: {kernel_path}')
     
-    # Create directory
-    output_dir = DIST_DIR / slug
-    output_dir.mkdir(parents=True, exist_ok=True)
-    print(f'  Created: {output_dir}')
+    kernel_data, slug = prepare_page(kernel_path)
+    print(f'  Title: {kernel_data["title"]}')
+    print(f'  Pattern: {kernel_data["pattern_name"]}')
+    print(f'  Devices: {len(kernel_data["devices"])} selected')
+    print(f'  Slug: {slug}')
     
-    # Write file
-    output_path = output_dir / 'index.html'
-    with open(output_path, 'w', encoding='utf-8', errors='replace') as f:
-        f.write(html)
-    print(f'  Written: {output_path}')
+    # Generate content via Claude, streaming into the page file
+    print('  Calling Claude API...')
+    output_path, timing = generate_streamed(kernel_data, slug, progress=True)
+    print(f'  Written: {output_path} ({describe_timing(timing)}, {timing["seconds"]:.1f}s)')
     
-    return {'slug': slug, 'output_path': str(output_path)}
+    return {'slug': slug, 'output_path': str(output_path), **timing}
+
+
+async def generate_page_async(kernel_path, slots):
+    """Generate one page inside a batch; at most `slots` API calls run at once."""
+    start = time.perf_counter()
+    # Kernel parsing and concordance lookups are blocking; keep them off the event loop
+    kernel_data, slug = await asyncio.to_thread(prepare_page, kernel_path)
+    async with slots:
+        output_path, timing = await generate_streamed_async(kernel_data, slug)
+    return dict(timing, slug=slug, output_path=str(output_path), seconds=time.perf_counter() - start)
+
+
+def retry_later(error):
+    """
+    True if a page failed for a reason worth one more try after the rest of
+    the run. Off-spec pages qualify because they are never cached: the
+    retry is a fresh API call, not a replay of the rejected text.
+    """
+    return isinstance(error, OffSpecPage) or is_transient(error)
+
+
+async def generate_batch(paths, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Generate pages for many kernels concurrently, writing each as it finishes.
+
+    Returns one result per kernel; a failed kernel's result holds 'error'
+    instead of stopping the batch. Pages that failed transiently (API
+    overload after the gateway's own retries, off-spec output) go to a
+    retry queue that is run again once every other page is done.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    
+    async def run(kernel_path):
+        try:
+            result = await generate_page_async(kernel_path, slots)
+        except Exception as e:
+            print(f'  ✗ {kernel_path}: {e}')
+            return {'kernel_path': str(kernel_path), 'error': str(e), 'retry': retry_later(e)}
+        print(f'  ✓ {result["slug"]} ({result["seconds"]:.1f}s, {describe_timing(result)}) -> {result["output_path"]}')
+        return result
+    
+    results = await asyncio.gather(*(run(path) for path in paths))
+    for _ in range(RETRY_ROUNDS):
+        queue = [i for i, result in enumerate(results) if result.get('retry')]
+        if not queue:
+            break
+        print(f'\n  Retrying {len(queue)} page(s) that failed transiently')
+        for i, result in zip(queue, await asyncio.gather(*(run(paths[i]) for i in queue))):
+            results[i] = result
+    return results
+
+
+def generate_sequential(paths):
+    """Generate pages one at a time. Returns the failed kernels ({'kernel_path', 'error'})."""
+    failed = []
+    queue = list(paths)
+    for retry_round in range(RETRY_ROUNDS + 1):
+        if retry_round:
+            print(f'Retrying {len(queue)} page(s) that failed transiently\n')
+        retry_queue = []
+        for kernel_path in queue:
+            try:
+                generate_page(kernel_path)
+                print('  ✓ Done\n')
+            except Exception as e:
+                print(f'  ✗ Error: {e}\n')
+                if retry_round < RETRY_ROUNDS and retry_later(e):
+                    retry_queue.append(kernel_path)
+                else:
+                    failed.append({'kernel_path': str(kernel_path), 'error': str(e)})
+        queue = retry_queue
+        if not queue:
+            break
+    return failed
+
+
+def generate_pages_batch(paths, name=BATCH_NAME):
+    """
+    Generate pages through the Message Batches API.
+
+    Every uncached page request goes into one batch (resumed if a run with
+    the same name was interrupted); pages are written once results arrive.
+    """
+    pages = []
+    entries = []
+    failed = []
+    for kernel_path in paths:
+        try:
+            kernel_data, slug = prepare_page(kernel_path)
+        except Exception as e:
+            failed.append({'kernel_path': str(kernel_path), 'error': str(e)})
+            continue
+        request, key = build_request('page', build_prompt(kernel_data), max_tokens=PAGE_MAX_TOKENS,
+                                     system=PAGE_SYSTEM)
+        pages.append((kernel_path, kernel_data, slug, key))
+        entries.append({'stage': 'page', 'key': key, 'params': request})
+    
+    texts, errors = run_batch(name, entries)
+    
+    done = []
+    for kernel_path, kernel_data, slug, key in pages:
+        if key not in texts:
+            failed.append({'kernel_path': str(kernel_path), 'error': errors.get(key, 'no result')})
+            continue
+        try:
+            content = StructureGuard().check(texts[key])
+        except OffSpecPage as e:
+            # Batch results are cached on arrival; drop this one so a re-run asks again
+            response_cache.discard(key)
+            failed.append({'kernel_path': str(kernel_path), 'error': f'off-spec: {e}'})
+            continue
+        output_path = write_page(kernel_data, slug, content)
+        print(f'  ✓ {slug} -> {output_path}')
+        done.append({'slug': slug, 'output_path': str(output_path)})
+    return done, failed
+
+
+def usage(error=None):
+    if error:
+        print(f'✗ {error}')
+    print('Usage: python generate_page.py <kernel.json> [kernel2.json ...] [--concurrency N] [--batch] [--dry-run]')
+    print('       python generate_page.py kernels/')
+    sys.exit(1)
 
 
 def main():
-    if len(sys.argv) < 2:
-        print('Usage: python generate_page.py <kernel.json> [kernel2.json ...]')
-        print('       python generate_page.py kernels/')
-        sys.exit(1)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    concurrency = DEFAULT_CONCURRENCY
+    if '--concurrency' in sys.argv:
+        position = sys.argv.index('--concurrency') + 1
+        value = sys.argv[position] if position < len(sys.argv) else ''
+        if not value.isdigit() or int(value) < 1:
+            usage(f'--concurrency needs a whole number of at least 1, got {value!r}' if value
+                  else '--concurrency needs a value')
+        concurrency = int(value)
+        args.remove(value)
+    
+    if not args:
+        usage()
     
     paths = []
     
-    for arg in sys.argv[1:]:
-        arg_path = Path(arg)
-        if arg_path.is_dir():
-            # Process all JSON files in directory
-            paths.extend(arg_path.glob('*.json'))
-        else:
-            paths.append(arg_path)
+    for arg in args:
+        # Directories and archives expand to every kernel they hold
+        paths.extend(kernel_paths(arg))
     
     print(f'Found {len(paths)} kernel(s) to process\n')
     
-    for kernel_path in paths:
-        try:
-            generate_page(kernel_path)
-            print('  ✓ Done\n')
-        except Exception as e:
-            print(f'  ✗ Error: {e}\n')
+    if '--dry-run' in sys.argv:
+        for kernel_path in paths:
+            kernel_data, slug = prepare_page(kernel_path)
+            print_report(slug, fit_page_prompt(kernel_data)[1])
+            print()
+        return
+    
+    if '--batch' in sys.argv:
+        print('Submitting through the Message Batches API\n')
+        done, failed = generate_pages_batch(paths)
+        print(f'\nSummary: {len(done)} succeeded, {len(failed)} failed')
+        for result in failed:
+            print(f'  ✗ {result["kernel_path"]}: {result["error"]}')
+        print()
+    elif len(paths) > 1 and concurrency > 1:
+        print(f'Generating with up to {concurrency} concurrent API calls\n')
+        start = time.perf_counter()
+        results = asyncio.run(generate_batch(paths, concurrency))
+        elapsed = time.perf_counter() - start
+        done = [r for r in results if 'error' not in r]
+        failed = [r for r in results if 'error' in r]
+        print(f'\nSummary: {len(done)} succeeded, {len(failed)} failed in {elapsed:.1f}s')
+        if done:
+            slowest = max(done, key=lambda r: r['seconds'])
+            print(f'  Slowest page: {slowest["slug"]} ({slowest["seconds"]:.1f}s), '
+                  f'sum of page times {sum(r["seconds"] for r in done):.1f}s')
+            streamed = [r for r in done if not r['cached']]
+            if streamed:
+                late = max(streamed, key=lambda r: r['first_token'])
+                print(f'  Slowest first token: {late["slug"]} ({late["first_token"]:.1f}s)')
+        for result in failed:
+            print(f'  ✗ {result["kernel_path"]}: {result["error"]}')
+        print()
+    else:
+        failed = generate_sequential(paths)
+        if len(paths) > 1:
+            print(f'Summary: {len(paths) - len(failed)} succeeded, {len(failed)} failed')
+            for result in failed:
+                print(f'  ✗ {result["kernel_path"]}: {result["error"]}')
+            print()
+    
+    if STATS:
+        print('API usage:')
+        print_stats()
+        print()
     
     print('Run "python scripts/build_all.py" to update homepage and sitemap')
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+JSON Repair
+Pulls the JSON object out of a Claude response and repairs the defects
+that otherwise fail a whole run, so the response can be used instead of
+paying for the call again.
+
+    value, repairs = extract_json(response_text)
+    for note in repairs:
+        print(f"⚠ Repaired JSON: {note}")
+
+One pass over the text, respecting strings and escapes:
+  - prose or a ```json fence before the first '{' and anything after the
+    matching '}' is ignored
+  - trailing commas before '}' or ']' are dropped
+  - raw newlines, tabs and other control characters inside strings are escaped
+  - a truncated response is cut back to its last complete top-level entry
+    or array element (a half-written angle is dropped, not kept half-empty)
+    and the open arrays and objects are closed
+  - a closing bracket of the wrong kind is replaced by the right one
+
+repairs is a list of human-readable notes, empty for a clean response.
+json.JSONDecodeError is raised if there is no object or the result still
+does not parse.
+
+Usage (salvages a saved .raw response):
+    python scripts/json_repair.py outputs/.../TKAM_stage_3_messages.json.raw [output.json]
+"""
+
+import json
+import sys
+
+CLOSERS = {'{': '}', '[': ']'}
+KEEP_DEPTH = 2      # A truncated value nested deeper than this (e.g. one angle in 'angles') is dropped whole
+ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+
+# =============================================================================
+# EXTRACTION
+# =============================================================================
+
+def extract_json(text):
+    """Return (value, repairs) for the first JSON object in text."""
+    fence = text.find('```json')
+    start = text.find('{', max(fence, 0))
+    if start < 0:
+        raise json.JSONDecodeError('No JSON object found', text, 0)
+
+    out = []
+    repairs = []
+    stack = []
+    keys = []               # Per open object: True while the next string is a key
+    checkpoint = (0, ())    # (len(out), stack) after the last complete value
+    last_comma = None       # Index in out of a comma not yet followed by a value
+    in_string = False
+    escape = False
+    is_key = False
+    control_chars = 0
+    end = None
+
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == '"':
+                in_string = False
+                out.append(c)
+                if not is_key and len(stack) <= KEEP_DEPTH:
+                    checkpoint = (len(out), tuple(stack))
+                continue
+            elif c < ' ':
+                out.append(ESCAPES.get(c, f'\\u{ord(c):04x}'))
+                control_chars += 1
+                continue
+            out.append(c)
+            continue
+
+        if c.isspace():
+            out.append(c)
+            continue
+        if c == '"':
+            in_string = True
+            is_key = bool(stack) and stack[-1] == '{' and keys[-1]
+        elif c in '{[':
+            stack.append(c)
+            keys.append(True)
+        elif c in '}]':
+            if last_comma is not None:
+                del out[last_comma]
+                repairs.append(f'removed trailing comma before {c!r}')
+            expected = CLOSERS[stack.pop()]
+            keys.pop()
+            if c != expected:
+                repairs.append(f'replaced {c!r} with {expected!r} at char {i}')
+                c = expected
+        elif c == ',':
+            if len(stack) <= KEEP_DEPTH:
+                checkpoint = (len(out), tuple(stack))
+            if stack[-1] == '{':
+                keys[-1] = True
+        elif c == ':':
+            keys[-1] = False
+
+        last_comma = len(out) if c == ',' else None
+        out.append(c)
+        if c in '{[}]':
+            if len(stack) <= KEEP_DEPTH:
+                checkpoint = (len(out), tuple(stack))
+            if not stack:
+                end = i + 1
+                break
+
+    if control_chars:
+        repairs.append(f'escaped {control_chars} raw control character(s) inside strings')
+
+    if end is None:
+        # Truncated: keep everything up to the last complete value, close the rest
+        length, open_brackets = checkpoint
+        dropped = ''.join(out[length:]).strip()
+        out = out[:length]
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == ',':
+            out.pop()
+        out.extend(CLOSERS[bracket] for bracket in reversed(open_brackets))
+        repairs.append(f'response truncated: dropped {len(dropped)} chars of incomplete tail, '
+                       f'closed {len(open_brackets)} open bracket(s)')
+    else:
+        trailing = text[end:].strip().strip('`').strip()
+        if trailing:
+            repairs.append(f'ignored {len(trailing)} chars after the JSON')
+
+    value = json.loads(''.join(out))
+    return value, repairs
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: python json_repair.py <response.raw> [output.json]')
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    try:
+        value, repairs = extract_json(text)
+    except json.JSONDecodeError as e:
+        print(f'✗ Could not salvage {sys.argv[1]}: {e}')
+        sys.exit(1)
+
+    for note in repairs:
+        print(f'  ⚠ {note}')
+    print(f'✓ Parsed {type(value).__name__} with {len(value)} top-level entr(ies)'
+          f'{" (clean)" if not repairs else ""}')
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'w', encoding='utf-8') as f:
+            json.dump(value, f, indent=2)
+        print(f'  Written: {sys.argv[2]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+JSON Stream
+Incremental parser that pulls completed elements out of one top-level array
+of a JSON object while the object is still streaming in.
+
+    items = ArrayItems('angles')
+    for chunk in chunks:
+        for angle in items.feed(chunk):
+            ...                      # each angle as soon as its closing brace arrives
+
+Anything before the first '{' (prose, a ```json fence) is skipped. Each
+character is scanned once, so feeding a 16000-token response costs the same
+as one json.loads. If the response is cut off, items.items still holds every
+element that was complete, and items.closed tells whether the array ended.
+
+Usage (replays a saved response, printing each element as it completes):
+    python scripts/json_stream.py response.raw angles
+"""
+
+import json
+import sys
+
+# =============================================================================
+# ARRAY ITEMS
+# =============================================================================
+
+class ArrayItems:
+    """Yields the elements of object[key] one by one as the JSON text grows."""
+
+    def __init__(self, key):
+        self.key = key
+        self.items = []
+        self.errors = []        # (element text, error) for elements that did not parse
+        self.closed = False     # True once the array's closing ']' has been seen
+        self.buffer = ''
+        self.pos = 0
+        self.stack = []         # open '{' / '['
+        self.started = False
+        self.finished = False   # top-level object closed
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None # most recent string closed directly inside the top-level object
+        self.array_depth = None # len(stack) while directly inside the target array
+        self.item_start = None
+        self.item_container = False
+
+    def _emit(self, end, found):
+        text = self.buffer[self.item_start:end].strip()
+        self.item_start = None
+        if not text:
+            return
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.errors.append((text, str(e)))
+            return
+        self.items.append(item)
+        found.append(item)
+
+    def feed(self, chunk):
+        """Add text; return the elements completed by it."""
+        self.buffer += chunk
+        found = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer) and not self.finished:
+            c = buffer[i]
+            in_array = self.array_depth is not None and len(self.stack) == self.array_depth
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.stack == ['{']:
+                        self.last_string = buffer[self.string_start + 1:i]
+            elif not self.started:
+                if c == '{':
+                    self.started = True
+                    self.stack.append(c)
+            elif c == '"':
+                self.in_string = True
+                self.string_start = i
+                if in_array and self.item_start is None:
+                    self.item_start = i
+                    self.item_container = False
+            elif c in '{[':
+                if (c == '[' and self.stack == ['{'] and self.array_depth is None
+                        and not self.closed and self.last_string == self.key):
+                    self.array_depth = 2
+                elif in_array and self.item_start is None:
+                    self.item_start = i
+                    self.item_container = True
+                self.stack.append(c)
+            elif c in '}]':
+                if in_array and c == ']':
+                    # End of the target array: flush a trailing scalar element
+                    if self.item_start is not None:
+                        self._emit(i, found)
+                    self.array_depth = None
+                    self.closed = True
+                if self.stack:
+                    self.stack.pop()
+                if (self.array_depth is not None and len(self.stack) == self.array_depth
+                        and self.item_start is not None and self.item_container):
+                    self._emit(i + 1, found)
+                if not self.stack:
+                    self.finished = True
+            elif c == ',':
+                if in_array and self.item_start is not None:
+                    self._emit(i, found)
+            elif in_array and self.item_start is None and not c.isspace():
+                self.item_start = i
+                self.item_container = False
+            i += 1
+        self.pos = i
+        return found
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    if len(sys.argv) < 3:
+        print('Usage: python json_stream.py <response.raw> <array key>')
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    items = ArrayItems(sys.argv[2])
+    for start in range(0, len(text), 64):       # Replay in small chunks, as a stream would arrive
+        for item in items.feed(text[start:start + 64]):
+            summary = json.dumps(item, ensure_ascii=False)
+            print(f'✓ [{len(items.items)}] {summary[:100]}{"..." if len(summary) > 100 else ""}')
+
+    print(f'\n{len(items.items)} element(s), array {"closed" if items.closed else "NOT closed (truncated)"}')
+    for text, error in items.errors:
+        print(f'  ✗ Unparseable element ({error}): {text[:80]}')
+
+
+if __name__ == '__main__':
+    main()
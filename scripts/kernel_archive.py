@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Kernel Archive
+Packs many kernels into one file, each member compressed on its own, with a
+central index at the end of the file (like a zip).
+
+    [header: magic, index offset, index length]
+    [member 1: gzip or lzma stream]
+    [member 2: ...]
+    [index: JSON {members: {name: {offset, length, size, compression, sha256,
+                                   title, author, kernel_version, pattern_name,
+                                   devices}}}]
+
+Listing the catalogue reads the header and index only; opening a kernel
+reads and decompresses just that member. The shared loader accepts member
+paths directly:
+
+    load_kernel('kernels/catalogue.kpack/To_Kill_a_Mockingbird_kernel_v6_1.json')
+
+Archives are read-only to the rest of the pipeline: scripts that write
+results back (--write, --strip) need a loose kernel file.
+
+Usage:
+    python scripts/kernel_archive.py pack kernels/catalogue.kpack kernels/ [--lzma] [--append]
+    python scripts/kernel_archive.py list kernels/catalogue.kpack
+    python scripts/kernel_archive.py extract kernels/catalogue.kpack Book_kernel_v6_1.json [output.json]
+"""
+
+import copy
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+ARCHIVE_SUFFIX = '.kpack'
+MAGIC = b'KPACK\x00\x01\x00'
+HEADER = struct.Struct('<8sQQ')     # magic, index offset, index length
+
+COMPRESSORS = {
+    'gzip': (lambda data: gzip.compress(data, compresslevel=9), gzip.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+# Parsed central indexes, keyed on (path, mtime, size)
+_INDEX_CACHE = {}
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def split_member_path(path):
+    """Return (archive_path, member_name) if path points inside an archive, else None."""
+    path = Path(path)
+    for parent in path.parents:
+        if parent.suffix == ARCHIVE_SUFFIX and parent.is_file():
+            return parent, path.relative_to(parent).as_posix()
+    return None
+
+
+def is_member_path(path):
+    return split_member_path(path) is not None
+
+
+def read_index(archive_path):
+    """Read an archive's central index (header + index bytes only)."""
+    archive_path = Path(archive_path)
+    stat = archive_path.stat()
+    key = (str(archive_path.resolve()), stat.st_mtime_ns, stat.st_size)
+    if key in _INDEX_CACHE:
+        return _INDEX_CACHE[key]
+
+    with open(archive_path, 'rb') as f:
+        magic, index_offset, index_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f'{archive_path} is not a kernel archive')
+        f.seek(index_offset)
+        index = json.loads(f.read(index_length))
+
+    _INDEX_CACHE[key] = index
+    return index
+
+
+def member_info(path):
+    """Return the index entry for an archive member path."""
+    archive_path, name = split_member_path(path)
+    members = read_index(archive_path)['members']
+    if name not in members:
+        raise FileNotFoundError(f'{name} is not in {archive_path}')
+    return members[name]
+
+
+def read_member(path):
+    """Return the decompressed bytes of one archive member."""
+    archive_path, name = split_member_path(path)
+    entry = member_info(path)
+    with open(archive_path, 'rb') as f:
+        f.seek(entry['offset'])
+        compressed = f.read(entry['length'])
+    return COMPRESSORS[entry['compression']][1](compressed)
+
+
+def list_members(archive_path):
+    """Return member paths (archive/member) in index order."""
+    archive_path = Path(archive_path)
+    return [archive_path / name for name in read_index(archive_path)['members']]
+
+
+def kernel_paths(arg):
+    """
+    Expand a command-line argument into kernel paths.
+
+    A directory yields its *.json files and the members of any archives in
+    it, each kernel name once: a loose file wins over an archived copy (as
+    after `pack kernels/catalogue.kpack kernels/`), and an earlier archive
+    over a later one. An archive yields its members; anything else is
+    returned as is.
+    """
+    arg = Path(arg)
+    if arg.is_dir():
+        paths = sorted(arg.glob('*.json'))
+        seen = {path.name for path in paths}
+        for archive_path in sorted(arg.glob(f'*{ARCHIVE_SUFFIX}')):
+            for member in list_members(archive_path):
+                if member.name not in seen:
+                    seen.add(member.name)
+                    paths.append(member)
+        return paths
+    if arg.suffix == ARCHIVE_SUFFIX and arg.is_file():
+        return list_members(arg)
+    return [arg]
+
+
+def _summary(data):
+    """Catalogue fields stored in the index for one kernel."""
+    metadata = data.get('metadata', {})
+    return {
+        'title': metadata.get('title', 'Unknown'),
+        'author': metadata.get('author', 'Unknown'),
+        'kernel_version': metadata.get('kernel_version', 'Unknown'),
+        'pattern_name': data.get('alignment_pattern', {}).get('pattern_name', 'Not found'),
+        'devices': len(data.get('micro_devices', [])),
+    }
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def pack_archive(archive_path, kernel_files, compression='gzip', append=False):
+    """
+    Write kernel files into an archive, replacing members with the same name.
+
+    The archive is built in a temp file next to it and swapped in once
+    complete, so an interrupted pack (or --append) leaves the previous
+    archive readable.
+    """
+    from kernel_loader import load_kernel
+
+    archive_path = Path(archive_path)
+    compress = COMPRESSORS[compression][0]
+
+    fd, tmp_path = tempfile.mkstemp(dir=archive_path.parent, prefix=archive_path.name, suffix='.tmp')
+    os.close(fd)
+    try:
+        if append and archive_path.exists():
+            index = copy.deepcopy(read_index(archive_path))
+            shutil.copyfile(archive_path, tmp_path)
+            f = open(tmp_path, 'r+b')
+            _, offset, _ = HEADER.unpack(f.read(HEADER.size))
+            f.seek(offset)
+        else:
+            index = {'version': 1, 'members': {}}
+            f = open(tmp_path, 'wb')
+            f.write(HEADER.pack(MAGIC, 0, 0))
+            offset = HEADER.size
+
+        with f:
+            for kernel_file in kernel_files:
+                kernel_file = Path(kernel_file)
+                raw = kernel_file.read_bytes()
+                compressed = compress(raw)
+                f.write(compressed)
+                entry = {
+                    'offset': offset,
+                    'length': len(compressed),
+                    'size': len(raw),
+                    'compression': compression,
+                    'sha256': hashlib.sha256(raw).hexdigest(),
+                }
+                entry.update(_summary(load_kernel(kernel_file)))
+                # Replacing a member leaves its old bytes as dead space until the next full pack
+                index['members'][kernel_file.name] = entry
+                offset += len(compressed)
+                print(f'  + {kernel_file.name}: {len(raw):,} -> {len(compressed):,} bytes')
+
+            index_bytes = json.dumps(index, indent=2).encode('utf-8')
+            f.write(index_bytes)
+            f.truncate()
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, offset, len(index_bytes)))
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {'archive_path': str(archive_path), 'members': len(index['members']), 'bytes': offset + len(index_bytes)}
+
+
+def extract_member(archive_path, name, output_path=None):
+    """Write one member back out as a loose kernel file."""
+    data = read_member(Path(archive_path) / name)
+    output_path = Path(output_path or name)
+    with open(output_path, 'wb') as out:
+        out.write(data)
+    return {'output_path': str(output_path), 'bytes': len(data)}
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('pack', 'list', 'extract'):
+        print('Usage: python kernel_archive.py pack <archive.kpack> <kernel.json | kernels/> [...] [--lzma] [--append]')
+        print('       python kernel_archive.py list <archive.kpack>')
+        print('       python kernel_archive.py extract <archive.kpack> <member.json> [output.json]')
+        sys.exit(1)
+
+    command, archive_path = sys.argv[1], sys.argv[2]
+    args = [arg for arg in sys.argv[3:] if not arg.startswith('--')]
+
+    if command == 'pack':
+        kernel_files = []
+        for arg in args:
+            arg_path = Path(arg)
+            kernel_files.extend(sorted(arg_path.glob('*.json')) if arg_path.is_dir() else [arg_path])
+        compression = 'lzma' if '--lzma' in sys.argv else 'gzip'
+        print(f'Packing {len(kernel_files)} kernel(s) into {archive_path} ({compression})')
+        result = pack_archive(archive_path, kernel_files, compression, append='--append' in sys.argv)
+        print(f'Written: {result["archive_path"]} ({result["members"]} members, {result["bytes"]:,} bytes)')
+
+    elif command == 'list':
+        members = read_index(archive_path)['members']
+        print(f'{archive_path}: {len(members)} kernel(s)\n')
+        for name, entry in members.items():
+            print(f'{name}')
+            print(f'  {entry["title"]} by {entry["author"]} (v{entry["kernel_version"]})')
+            print(f'  Pattern: {entry["pattern_name"]}, {entry["devices"]} devices')
+            print(f'  {entry["size"]:,} -> {entry["length"]:,} bytes ({entry["compression"]})')
+
+    else:
+        if not args:
+            print('Usage: python kernel_archive.py extract <archive.kpack> <member.json> [output.json]')
+            sys.exit(1)
+        result = extract_member(archive_path, args[0], args[1] if len(args) > 1 else None)
+        print(f'Written: {result["output_path"]} ({result["bytes"]:,} bytes)')
+
+
+if __name__ == '__main__':
+    main()
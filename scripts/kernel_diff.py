@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Kernel Diff
+Structural diff between two versions of a kernel, mapped onto the artifacts
+that consume kernel data, so batch runs regenerate only what changed.
+
+Changes are reported per field:
+    alignment_pattern.core_dynamic                  changed
+    macro_variables.rhetoric.voice.tone             changed
+    micro_devices[Juxtaposition (climax)].effect    changed
+    micro_devices[Symbolism (resolution)]           added
+    band_extraction.bands.climax.text               changed (text compared, not printed)
+
+Devices are matched by name and assigned_section, so reordering is not a
+change. Each artifact declares the exact kernel inputs it reads (the same
+device selection and truncation its script uses); an artifact is affected
+only if those inputs differ, and stages fed by an affected stage's output
+are affected in turn.
+
+Usage:
+    python scripts/kernel_diff.py old_kernel.json new_kernel.json
+    python scripts/kernel_diff.py old_kernel.json new_kernel.json --json
+"""
+
+import hashlib
+import json
+import sys
+
+from kernel_model import Kernel, select_devices
+from stage_inputs import stage_1_fields, stage_3_fields, stage_4_fields, stage_5a_fields, stage_5a_title
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEVICES_KEY = 'micro_devices'
+PAGE_DEVICE_COUNT = 4       # generate_page.extract_kernel_data selects this many
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def _get(data, *keys, default=None):
+    """Walk nested dicts, returning default on any missing step."""
+    for key in keys:
+        if not isinstance(data, dict) or key not in data:
+            return default
+        data = data[key]
+    return data
+
+
+def device_key(device):
+    """Label identifying a device across kernel versions."""
+    return f'{device.name} ({device.assigned_section or device.band or "-"})'
+
+
+def keyed_devices(kernel):
+    """Return {label: Device}, numbering repeats of the same name and section."""
+    devices = {}
+    for device in kernel.devices:
+        label = device_key(device)
+        if label in devices:
+            n = 2
+            while f'{label} #{n}' in devices:
+                n += 1
+            label = f'{label} #{n}'
+        devices[label] = device
+    return devices
+
+
+def deferred_texts(kernel):
+    """Return {field path: loader} for the text fields kept on disk."""
+    data = kernel.data
+    texts = {}
+    for band in data.band_names():
+        texts[('band_extraction', 'bands', band, 'text')] = lambda band=band: data.band_text(band)
+    for keys in data.deferred:
+        if keys[0] != 'band_extraction':
+            texts[keys] = lambda keys=keys: data.text(*keys)
+    return texts
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# =============================================================================
+# STRUCTURAL DIFF
+# =============================================================================
+
+def _diff_values(old, new, path, changes):
+    """Recurse through dicts; anything else is compared as a whole."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in list(old) + [k for k in new if k not in old]:
+            child = f'{path}.{key}' if path else key
+            if key not in new:
+                changes.append({'field': child, 'kind': 'removed', 'old': old[key], 'new': None})
+            elif key not in old:
+                changes.append({'field': child, 'kind': 'added', 'old': None, 'new': new[key]})
+            else:
+                _diff_values(old[key], new[key], child, changes)
+    elif old != new:
+        changes.append({'field': path, 'kind': 'changed', 'old': old, 'new': new})
+
+
+def diff_kernels(old, new):
+    """
+    Return a list of changes between two Kernels.
+
+    Each change is {'field', 'kind', 'old', 'new'} with kind 'added',
+    'removed' or 'changed'. Deferred text fields are compared in full but
+    reported with word counts instead of their text.
+    """
+    changes = []
+    old_top = {k: v for k, v in old.data.items() if k != DEVICES_KEY}
+    new_top = {k: v for k, v in new.data.items() if k != DEVICES_KEY}
+    _diff_values(old_top, new_top, '', changes)
+
+    old_devices, new_devices = keyed_devices(old), keyed_devices(new)
+    for label in list(old_devices) + [k for k in new_devices if k not in old_devices]:
+        field = f'{DEVICES_KEY}[{label}]'
+        if label not in new_devices:
+            changes.append({'field': field, 'kind': 'removed', 'old': old_devices[label].raw, 'new': None})
+        elif label not in old_devices:
+            changes.append({'field': field, 'kind': 'added', 'old': None, 'new': new_devices[label].raw})
+        else:
+            _diff_values(old_devices[label].raw, new_devices[label].raw, field, changes)
+
+    old_texts, new_texts = deferred_texts(old), deferred_texts(new)
+    for keys in list(old_texts) + [k for k in new_texts if k not in old_texts]:
+        old_text = old_texts[keys]() if keys in old_texts else None
+        new_text = new_texts[keys]() if keys in new_texts else None
+        if old_text == new_text:
+            continue
+        kind = 'added' if old_text is None else 'removed' if new_text is None else 'changed'
+        changes.append({
+            'field': '.'.join(keys),
+            'kind': kind,
+            'old': None if old_text is None else f'<{len(old_text.split()):,} words>',
+            'new': None if new_text is None else f'<{len(new_text.split()):,} words>',
+        })
+
+    return changes
+
+
+# =============================================================================
+# ARTIFACT INPUTS
+# =============================================================================
+# Each function returns exactly what one artifact reads from the kernel.
+# The pedagogy stages share their field builders with stage_inputs; the page
+# and prompt inputs mirror generate_page and the derive_themes/generate_thesis
+# prompts, so keep those in step with them.
+
+def _pattern(kernel):
+    return {
+        'pattern_name': kernel.pattern_name,
+        'core_dynamic': kernel.core_dynamic,
+        'reader_effect': kernel.reader_effect,
+    }
+
+
+def page_meta_inputs(kernel):
+    """<head>, <header> and footer: filled in without an API call."""
+    return {
+        'title': kernel.metadata.get('title', 'Unknown'),
+        'author': kernel.metadata.get('author', 'Unknown'),
+        'kernel_version': kernel.metadata.get('kernel_version', '6.0'),
+        'description': kernel.alignment.get('core_dynamic', '')[:155],
+    }
+
+
+def page_novel_inputs(kernel):
+    """'What the Novel Does' section."""
+    return {
+        'title': kernel.title,
+        'author': kernel.author,
+        'pov': _get(kernel.macro, 'narrative', 'voice', 'pov_description'),
+        'tone': _get(kernel.macro, 'rhetoric', 'voice', 'tone'),
+    }
+
+
+def page_pattern_inputs(kernel):
+    """'The Central Pattern' section."""
+    inputs = _pattern(kernel)
+    inputs['device_mediation'] = _get(kernel.macro, 'device_mediation', 'summary', default='')
+    return inputs
+
+
+def page_techniques_inputs(kernel):
+    """'Key Techniques' section: the selected devices and their quote contexts."""
+    devices = select_devices(kernel.devices, PAGE_DEVICE_COUNT)
+    inputs = {
+        'devices': [
+            [d['name'], d['anchor_phrase'], d['effect'], d.get('assigned_section'), d.get('band')]
+            for d in devices
+        ],
+    }
+    if devices and kernel.data.band_names():
+        inputs['band_text'] = [text_digest(kernel.band_text(b)) for b in kernel.data.band_names()]
+    return inputs
+
+
+def page_structure_inputs(kernel):
+    """'Structure' section."""
+    structure = _get(kernel.macro, 'narrative', 'structure', default={})
+    return {
+        key: structure.get(key)
+        for key in ('chronology', 'plot_architecture_description', 'beginning_type', 'ending_type')
+    }
+
+
+def page_themes_inputs(kernel):
+    """'Themes' section."""
+    return _pattern(kernel)
+
+
+def stage_1_inputs(kernel):
+    """stage_1_generate.generate_audience_profile."""
+    return stage_1_fields(kernel)
+
+
+def stage_3_inputs(kernel):
+    """stage_3_generate.generate_message_matrix."""
+    return stage_3_fields(kernel)
+
+
+def stage_5a_inputs(kernel):
+    """stage_5a_generate.generate_exploratory_drafts, including the book title."""
+    return dict(stage_5a_fields(kernel), title=stage_5a_title(kernel))
+
+
+def stage_4_inputs(kernel):
+    """stage_4_evaluate: the pattern summary only."""
+    return stage_4_fields(kernel)
+
+
+def themes_inputs(kernel):
+    """prompts/derive_themes_v1_0.md."""
+    inputs = _pattern(kernel)
+    inputs['tone'] = _get(kernel.macro, 'rhetoric', 'voice', 'tone')
+    inputs['device_priorities'] = kernel.device_priorities
+    inputs['device_mediation'] = _get(kernel.macro, 'device_mediation', 'summary', default='')
+    inputs['devices'] = [[d.name, d.anchor_phrase, d.effect] for d in kernel.priority_devices]
+    return inputs
+
+
+def thesis_inputs(kernel):
+    """prompts/generate_thesis_v1_0.md (plus the derived themes)."""
+    inputs = _pattern(kernel)
+    inputs['device_priorities'] = kernel.device_priorities
+    return inputs
+
+
+# artifact -> (kernel inputs, artifacts whose output it consumes)
+ARTIFACTS = {
+    'page.meta': (page_meta_inputs, []),
+    'page.what_the_novel_does': (page_novel_inputs, []),
+    'page.central_pattern': (page_pattern_inputs, []),
+    'page.key_techniques': (page_techniques_inputs, []),
+    'page.structure': (page_structure_inputs, []),
+    'page.themes': (page_themes_inputs, []),
+    'stage_1': (stage_1_inputs, []),
+    'stage_3': (stage_3_inputs, ['stage_1']),
+    'stage_5a': (stage_5a_inputs, ['stage_3']),
+    'stage_4': (stage_4_inputs, ['stage_3', 'stage_5a']),
+    'stage_2': (None, ['stage_4']),
+    'stage_5b': (None, ['stage_2', 'stage_4', 'stage_5a']),
+    'themes': (themes_inputs, []),
+    'thesis': (thesis_inputs, ['themes']),
+}
+
+
+def affected_artifacts(old, new):
+    """
+    Return {artifact: [reasons]} for every artifact needing regeneration.
+
+    Reasons name the changed inputs ('core_dynamic', 'devices', ...) or the
+    upstream artifact ('via stage_1'). Artifacts appear in ARTIFACTS order.
+    """
+    affected = {}
+    for artifact, (inputs, upstream) in ARTIFACTS.items():
+        reasons = []
+        if inputs is not None:
+            old_inputs, new_inputs = inputs(old), inputs(new)
+            reasons = [key for key in new_inputs if old_inputs.get(key) != new_inputs[key]]
+        reasons += [f'via {name}' for name in upstream if name in affected]
+        if reasons:
+            affected[artifact] = reasons
+    return affected
+
+
+def page_needs_api_call(affected):
+    """True if any LLM-written page section is affected (page.meta alone is not)."""
+    return any(name.startswith('page.') and name != 'page.meta' for name in affected)
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def _short(value, limit=70):
+    text = value if isinstance(value, str) else json.dumps(value)
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) != 2:
+        print('Usage: python kernel_diff.py <old_kernel.json> <new_kernel.json> [--json]')
+        sys.exit(1)
+
+    old, new = Kernel.load(args[0]), Kernel.load(args[1])
+    changes = diff_kernels(old, new)
+    affected = affected_artifacts(old, new)
+
+    if '--json' in sys.argv:
+        print(json.dumps({
+            'changes': changes,
+            'affected': affected,
+            'page_api_call': page_needs_api_call(affected),
+        }, indent=2))
+        return
+
+    print(f'Comparing: {args[0]} -> {args[1]}\n')
+    print(f'Changes: {len(changes)}')
+    for change in changes:
+        if change['kind'] == 'changed':
+            print(f'  ~ {change["field"]}: {_short(change["old"])} -> {_short(change["new"])}')
+        else:
+            marker = '+' if change['kind'] == 'added' else '-'
+            print(f'  {marker} {change["field"]}')
+
+    print(f'\nAffected artifacts: {len(affected)} of {len(ARTIFACTS)}')
+    for artifact, reasons in affected.items():
+        print(f'  ⚠ {artifact}: {", ".join(reasons)}')
+    unaffected = [name for name in ARTIFACTS if name not in affected]
+    if unaffected:
+        print(f'  ✓ Unchanged: {", ".join(unaffected)}')
+    if affected and not page_needs_api_call(affected) and 'page.meta' in affected:
+        print('\n  Page content unchanged: only the page head/footer needs rebuilding')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Kernel Loader
+Shared reader for kernel JSON files.
+
+The structural sections (metadata, alignment_pattern, macro_variables,
+micro_devices, ...) are parsed straight away. The large novel text blobs
+(band_extraction.bands.*.text and chapter_optimization.*.chapter_text) are
+only located, never decoded, until a caller asks for them.
+
+Parsed kernels are cached as pickle sidecars in .kernel_cache/ (override
+with KERNEL_CACHE_DIR), keyed on the kernel's path and the SHA-256 of its
+contents. Editing a kernel changes its hash, so stale sidecars are rebuilt
+automatically; kernels with the same file name in different folders keep
+separate sidecars.
+
+Kernels packed into a .kpack archive (kernel_archive.py) load the same way,
+using the member path archive.kpack/Book_kernel_v6_1.json.
+
+Usage:
+    from kernel_loader import load_kernel
+
+    kernel = load_kernel('kernels/To_Kill_a_Mockingbird_kernel_v6_1.json')
+    kernel['micro_devices']             # available immediately
+    kernel.band_text('rising_action')   # decoded on request
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+import tempfile
+from pathlib import Path
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+CACHE_DIR = Path(os.environ.get('KERNEL_CACHE_DIR', Path(__file__).parent.parent / '.kernel_cache'))
+CACHE_VERSION = 1
+
+# Paths of string fields that are skipped during parsing ('*' matches any key)
+DEFERRED_FIELDS = [
+    ('band_extraction', 'bands', '*', 'text'),
+    ('chapter_optimization', '*', 'chapter_text'),
+]
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRUCTURAL = re.compile(rb'["{}\[\]]')
+_SCALAR = re.compile(rb'[^,}\]\s]+')
+
+
+# =============================================================================
+# LAZY KERNEL
+# =============================================================================
+
+class LazyKernel(dict):
+    """Kernel dict whose deferred text fields are read from disk on request."""
+
+    def __init__(self, data, path, deferred):
+        super().__init__(data)
+        self.path = Path(path)
+        self.deferred = deferred
+        self._member = None
+
+    def text(self, *keys):
+        """Decode one deferred field, e.g. text('band_extraction', 'bands', 'climax', 'text')."""
+        span = self.deferred.get(tuple(keys))
+        if span is None:
+            raise KeyError('/'.join(keys))
+        start, end = span
+        if self._member is not None or _is_member(self.path):
+            # Archive members are decompressed once, on the first text request
+            if self._member is None:
+                from kernel_archive import read_member
+                self._member = read_member(self.path)
+            return json.loads(self._member[start:end])
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+
+    def band_names(self):
+        """Return band names in kernel order."""
+        return list(self.get('band_extraction', {}).get('bands', {}))
+
+    def band_text(self, band):
+        """Return the full text of one band (from its band store if stripped)."""
+        keys = ('band_extraction', 'bands', band, 'text')
+        if keys not in self.deferred:
+            from band_store import BandStore, has_band_store
+            if has_band_store(self.path):
+                with BandStore(self.path) as store:
+                    return store.band_text(band)
+        return self.text(*keys)
+
+    def chapter_text(self, section):
+        """Return the chapter_optimization text for one section (v5.1 kernels)."""
+        return self.text('chapter_optimization', section, 'chapter_text')
+
+    def materialize(self):
+        """Return a plain dict with every deferred field filled back in."""
+        kernel = json.loads(json.dumps(self))
+        for keys in self.deferred:
+            node = kernel
+            for key in keys[:-1]:
+                node = node[key]
+            node[keys[-1]] = self.text(*keys)
+        return kernel
+
+
+# =============================================================================
+# SKELETON PARSER
+# =============================================================================
+
+def _skip_ws(buf, pos):
+    return _WHITESPACE.match(buf, pos).end()
+
+
+def _string_end(buf, pos):
+    """Return the index just past the JSON string starting at pos."""
+    i = pos + 1
+    while True:
+        j = buf.find(b'"', i)
+        if j < 0:
+            raise ValueError(f'Unterminated string at byte {pos}')
+        k = j - 1
+        while buf[k] == 0x5C:  # backslash
+            k -= 1
+        if (j - 1 - k) % 2 == 0:
+            return j + 1
+        i = j + 1
+
+
+def _value_end(buf, pos):
+    """Return the index just past the JSON value starting at pos."""
+    first = buf[pos:pos + 1]
+    if first == b'"':
+        return _string_end(buf, pos)
+    if first in (b'{', b'['):
+        depth = 0
+        i = pos
+        while True:
+            match = _STRUCTURAL.search(buf, i)
+            if match is None:
+                raise ValueError(f'Unterminated container at byte {pos}')
+            char = match.group()
+            if char == b'"':
+                i = _string_end(buf, match.start())
+                continue
+            depth += 1 if char in (b'{', b'[') else -1
+            i = match.end()
+            if depth == 0:
+                return i
+    match = _SCALAR.match(buf, pos)
+    if match is None:
+        raise ValueError(f'Unexpected character at byte {pos}')
+    return match.end()
+
+
+def _path_state(path):
+    """Return 'defer', 'descend' or None for a path relative to DEFERRED_FIELDS."""
+    state = None
+    for pattern in DEFERRED_FIELDS:
+        if len(path) > len(pattern):
+            continue
+        if all(p == '*' or p == k for p, k in zip(pattern, path)):
+            if len(path) == len(pattern):
+                return 'defer'
+            state = 'descend'
+    return state
+
+
+def _parse_object(buf, pos, path, deferred):
+    """Parse the object at pos, skipping deferred fields. Returns (dict, end)."""
+    result = {}
+    pos = _skip_ws(buf, pos + 1)
+    if buf[pos:pos + 1] == b'}':
+        return result, pos + 1
+
+    while True:
+        key_end = _string_end(buf, pos)
+        key = json.loads(buf[pos:key_end])
+        pos = _skip_ws(buf, key_end)
+        if buf[pos:pos + 1] != b':':
+            raise ValueError(f'Expected ":" at byte {pos}')
+        pos = _skip_ws(buf, pos + 1)
+
+        child = path + (key,)
+        state = _path_state(child)
+        if state == 'descend' and buf[pos:pos + 1] == b'{':
+            result[key], pos = _parse_object(buf, pos, child, deferred)
+        else:
+            end = _value_end(buf, pos)
+            if state == 'defer' and buf[pos:pos + 1] == b'"':
+                deferred[child] = (pos, end)
+            else:
+                result[key] = json.loads(buf[pos:end])
+            pos = end
+
+        pos = _skip_ws(buf, pos)
+        separator = buf[pos:pos + 1]
+        if separator == b'}':
+            return result, pos + 1
+        if separator != b',':
+            raise ValueError(f'Expected "," or "}}" at byte {pos}')
+        pos = _skip_ws(buf, pos + 1)
+
+
+def parse_buffer(buf, path=''):
+    """Parse kernel bytes (or an mmap) into (data, deferred)."""
+    pos = _skip_ws(buf, 0)
+    if buf[pos:pos + 1] != b'{':
+        raise ValueError(f'Kernel is not a JSON object: {path}')
+    deferred = {}
+    data, _ = _parse_object(buf, pos, (), deferred)
+    return data, deferred
+
+
+def parse_kernel(path):
+    """Parse a kernel file into (data, deferred) without decoding deferred fields."""
+    if _is_member(path):
+        from kernel_archive import read_member
+        return parse_buffer(read_member(path), path)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return parse_buffer(buf, path)
+
+
+# =============================================================================
+# SIDECAR CACHE
+# =============================================================================
+
+def _is_member(path):
+    """Return True if path points inside a kernel archive."""
+    from kernel_archive import ARCHIVE_SUFFIX, is_member_path
+    return ARCHIVE_SUFFIX in str(path) and is_member_path(path)
+
+
+def kernel_digest(path):
+    """Return the SHA-256 hex digest of a kernel file's contents."""
+    if _is_member(path):
+        # Recorded at pack time, so archive members are never decompressed to hash
+        from kernel_archive import member_info
+        return member_info(path)['sha256']
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sidecar_stem(path):
+    """Sidecar name prefix for a kernel: its stem plus a short hash of its resolved path."""
+    location = hashlib.sha256(str(Path(path).resolve()).encode('utf-8')).hexdigest()[:8]
+    return f'{Path(path).stem}.{location}'
+
+
+def sidecar_path(path, kind, digest=None):
+    """Return the cache file holding one kind of derived data for a kernel."""
+    digest = digest or kernel_digest(path)
+    return CACHE_DIR / f'{_sidecar_stem(path)}.{digest[:16]}.{kind}'
+
+
+def _write_sidecar(target, payload):
+    """Write a sidecar atomically so concurrent readers never see a partial file."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=target.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _remove_stale(path, kind, keep):
+    """Delete sidecars of this kind left behind by earlier versions of the kernel."""
+    for stale in CACHE_DIR.glob(f'{_sidecar_stem(path)}.*.{kind}'):
+        if stale != keep:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+
+def load_sidecar(path, kind, build, version=CACHE_VERSION):
+    """Return cached data derived from a kernel, calling build() when missing or stale."""
+    target = sidecar_path(path, kind)
+    try:
+        with open(target, 'rb') as f:
+            cached_version, payload = pickle.load(f)
+        if cached_version == version:
+            return payload
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        pass
+
+    payload = build()
+    try:
+        _write_sidecar(target, (version, payload))
+        _remove_stale(path, kind, target)
+    except OSError as e:
+        print(f'  Warning: could not write kernel cache {target}: {e}')
+    return payload
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def load_kernel(path, use_cache=True):
+    """Load a kernel, deferring band and chapter text until requested."""
+    if use_cache:
+        data, deferred = load_sidecar(path, 'kernel.pickle', lambda: parse_kernel(path))
+    else:
+        data, deferred = parse_kernel(path)
+    return LazyKernel(data, path, deferred)
+
+
+def main():
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print('Usage: python kernel_loader.py <kernel.json> [kernel2.json ...]')
+        sys.exit(1)
+
+    for arg in sys.argv[1:]:
+        started = time.perf_counter()
+        kernel = load_kernel(arg)
+        elapsed = (time.perf_counter() - started) * 1000
+        title = kernel.get('metadata', {}).get('title', 'Unknown')
+        deferred_bytes = sum(end - start for start, end in kernel.deferred.values())
+        print(f'{arg}')
+        print(f'  Title: {title}')
+        print(f'  Devices: {len(kernel.get("micro_devices", []))}')
+        print(f'  Deferred: {len(kernel.deferred)} text field(s), {deferred_bytes:,} bytes')
+        print(f'  Parsed in {elapsed:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Kernel Model
+Indexed view over a loaded kernel, built once per load.
+
+Holds compact device records, a name -> devices index, the devices in
+device_priorities order, and band/section groupings, so stage scripts and
+validators no longer rescan micro_devices for every priority name.
+
+Usage:
+    from kernel_model import Kernel
+
+    kernel = Kernel.load('kernels/To_Kill_a_Mockingbird_kernel_v6_1.json')
+    kernel.pattern_name
+    kernel.top_devices(8, priority_limit=5)
+    kernel.by_band['climax']
+    kernel.book_location(device)        # whole-book percent, also for v5.1 kernels
+    select_devices(kernel.devices, 4)   # verified quotes, varied by type and section
+"""
+
+from kernel_loader import load_kernel
+
+BANDS = ['exposition', 'rising_action', 'climax', 'falling_action', 'resolution']
+BAND_IDS = {band: i for i, band in enumerate(BANDS)}
+
+
+# =============================================================================
+# DEVICE RECORD
+# =============================================================================
+
+class Device:
+    """One micro_devices entry. Supports dict-style access for existing callers."""
+
+    __slots__ = (
+        'index', 'name', 'anchor_phrase', 'effect', 'band', 'location_percent',
+        'assigned_section', 'quote_verified', 'pedagogical_tier', 'raw',
+    )
+
+    def __init__(self, raw, index):
+        self.raw = raw
+        self.index = index
+        self.name = raw['name']
+        self.anchor_phrase = raw.get('anchor_phrase')
+        self.effect = raw.get('effect', '')
+        self.band = raw.get('band')
+        self.location_percent = raw.get('location_percent')
+        self.assigned_section = raw.get('assigned_section')
+        self.quote_verified = raw.get('quote_verified')
+        self.pedagogical_tier = raw.get('pedagogical_tier')
+
+    def __getitem__(self, key):
+        return self.raw[key]
+
+    def __contains__(self, key):
+        return key in self.raw
+
+    def get(self, key, default=None):
+        return self.raw.get(key, default)
+
+    def __repr__(self):
+        return f'Device({self.name!r}, section={self.assigned_section!r})'
+
+
+# =============================================================================
+# KERNEL MODEL
+# =============================================================================
+
+class Kernel:
+    """Kernel with device indexes precomputed at load time."""
+
+    def __init__(self, data):
+        self.data = data
+        self.metadata = data.get('metadata', {})
+        self.alignment = data.get('alignment_pattern', {})
+        self.macro = data.get('macro_variables', {})
+
+        self.title = self.metadata.get('title', 'Unknown')
+        self.author = self.metadata.get('author', 'Unknown')
+        self.kernel_version = self.metadata.get('kernel_version', 'Unknown')
+        self.pattern_name = self.alignment.get('pattern_name', 'Not found')
+        self.core_dynamic = self.alignment.get('core_dynamic', 'Not found')
+        self.reader_effect = self.alignment.get('reader_effect', 'Not found')
+        self.device_priorities = self.alignment.get('device_priorities', [])
+
+        self.devices = [Device(raw, i) for i, raw in enumerate(data.get('micro_devices', []))]
+
+        # Name -> devices (kernel order); a name can appear once per section
+        self.by_name = {}
+        self.by_band = {}
+        self.by_section = {}
+        for device in self.devices:
+            self.by_name.setdefault(device.name, []).append(device)
+            self.by_band.setdefault(device.band, []).append(device)
+            self.by_section.setdefault(device.assigned_section, []).append(device)
+
+        self.device_names = set(self.by_name)
+        self.device_names_lower = {name.lower() for name in self.by_name}
+
+        # First device for each priority name, in priority order
+        self.priority_devices = []
+        for name in dict.fromkeys(self.device_priorities):
+            if name in self.by_name:
+                self.priority_devices.append(self.by_name[name][0])
+
+    @classmethod
+    def load(cls, path):
+        """Load a kernel file through the shared loader and index it."""
+        return cls(load_kernel(path))
+
+    @property
+    def bands(self):
+        """Band metadata (without text) in kernel order."""
+        bands = self.data.get('band_extraction', {}).get('bands')
+        return bands if bands is not None else self.data.get('chapter_alignment', {})
+
+    def band_text(self, band):
+        """Return one band's text via the lazy loader."""
+        return self.data.band_text(band)
+
+    @property
+    def locations_relative(self):
+        """
+        True if location_percent is the position within the device's
+        assigned section rather than the whole book (kernels without
+        band_extraction, i.e. v5.1).
+        """
+        return not self.data.get('band_extraction', {}).get('bands')
+
+    def band_ranges(self):
+        """
+        Return [(start_percent, end_percent)] in BANDS order, or None.
+
+        From band_extraction start/end percents, or from the cumulative
+        chapter_alignment percentages for kernels without band text.
+        """
+        bands = self.data.get('band_extraction', {}).get('bands')
+        if bands:
+            return [(bands.get(b, {}).get('start_percent', 0), bands.get(b, {}).get('end_percent', 0)) for b in BANDS]
+
+        alignment = self.data.get('chapter_alignment', {})
+        if not alignment:
+            return None
+        ranges = []
+        start = 0
+        for band in BANDS:
+            end = start + alignment.get(band, {}).get('percentage', 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def book_location(self, device):
+        """
+        Return a device's location as a whole-book percent, or None.
+
+        Section-relative locations (see locations_relative) are mapped
+        through the assigned section's range.
+        """
+        location = device.location_percent
+        if not isinstance(location, (int, float)) or isinstance(location, bool):
+            return None
+        if not self.locations_relative:
+            return location
+        ranges = self.band_ranges()
+        if ranges is None or device.assigned_section not in BAND_IDS:
+            return None
+        start, end = ranges[BAND_IDS[device.assigned_section]]
+        return start + (end - start) * location / 100
+
+    def first(self, name, require=None):
+        """Return the first device with this name (and the required field), or None."""
+        for device in self.by_name.get(name, ()):
+            if require is None or require in device.raw:
+                return device
+        return None
+
+    def top_devices(self, limit=8, priority_limit=5, require=None):
+        """
+        Return up to `limit` devices, one per name.
+
+        Devices named in the first `priority_limit` device_priorities come
+        first, in priority order; the rest are filled in kernel order.
+        """
+        chosen = []
+        seen = set()
+
+        for name in self.device_priorities[:priority_limit]:
+            if len(chosen) >= limit:
+                break
+            device = self.first(name, require)
+            if device is not None and name not in seen:
+                chosen.append(device)
+                seen.add(name)
+
+        for device in self.devices:
+            if len(chosen) >= limit:
+                break
+            if device.name not in seen and (require is None or require in device.raw):
+                chosen.append(device)
+                seen.add(device.name)
+
+        return chosen
+
+
+# =============================================================================
+# DEVICE SELECTION
+# =============================================================================
+
+def select_devices(devices, count):
+    """Select best devices for variety."""
+    # Filter to verified quotes only
+    verified = [d for d in devices if d.get('quote_verified') == True]
+
+    # Prefer variety: different device types, different sections
+    selected = []
+    used_types = set()
+    used_sections = set()
+
+    # First pass: one of each type from different sections
+    for device in verified:
+        if len(selected) >= count:
+            break
+        if device['name'] not in used_types and device.get('assigned_section') not in used_sections:
+            selected.append(device)
+            used_types.add(device['name'])
+            used_sections.add(device.get('assigned_section'))
+
+    # Second pass: fill remaining slots
+    for device in verified:
+        if len(selected) >= count:
+            break
+        if device not in selected:
+            selected.append(device)
+
+    return selected
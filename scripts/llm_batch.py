@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+LLM Batch
+Sends many pending Claude requests as one Message Batches job, for
+overnight rebuilds where throughput and cost matter more than latency.
+
+Results are fanned back out through the response cache (llm_cache.py):
+each succeeded message is stored under its request key, so the normal
+scripts pick it up as a cache hit and write their usual outputs with their
+usual parsers.
+
+    # 1. Record requests instead of sending them
+    LLM_BATCH_COLLECT=pending.jsonl python pedagogy/phase_1/stage_1_generate.py ...
+    LLM_BATCH_COLLECT=pending.jsonl python pedagogy/phase_1/stage_1_generate.py ...   # next book
+    # 2. Submit, poll until done, store results in the cache
+    python scripts/llm_batch.py run pending.jsonl
+    # 3. Re-run step 1 unchanged: every request is now a cache hit
+
+generate_page.py --batch does all three steps in one process.
+
+The batch id is saved in .kernel_cache/batches/<name>.json as soon as the
+job is created; running again with the same name resumes polling that job
+instead of submitting a new one. Polling starts at LLM_BATCH_POLL_SECONDS
+(default 30) and backs off to at most 10 minutes. Point ANTHROPIC_BASE_URL
+at a local stand-in server to exercise the whole flow offline.
+
+Usage:
+    python scripts/llm_batch.py run pending.jsonl [name]
+    python scripts/llm_batch.py status <name>
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from kernel_loader import CACHE_DIR
+from llm_gateway import cached_text, get_client, response_cache, store_response
+from prompt_budget import OverBudget, check_request
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+BATCH_DIR = Path(os.environ.get('LLM_BATCH_DIR', CACHE_DIR / 'batches'))
+POLL_SECONDS = float(os.environ.get('LLM_BATCH_POLL_SECONDS', 30))
+POLL_MAX_SECONDS = 600
+POLL_BACKOFF = 1.5
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def custom_id(entry):
+    """Batch custom_id for a pending entry (<= 64 chars of [A-Za-z0-9_-])."""
+    return f'{entry["stage"]}-{entry["key"][:40]}'
+
+
+def read_pending(path):
+    """Read a LLM_BATCH_COLLECT file, dropping repeated requests."""
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.setdefault(entry['key'], entry)
+    return list(entries.values())
+
+
+def state_path(name):
+    return BATCH_DIR / f'{name}.json'
+
+
+def load_state(name):
+    try:
+        with open(state_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(name, state):
+    """Write batch state atomically."""
+    path = state_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# =============================================================================
+# BATCH LIFECYCLE
+# =============================================================================
+
+def submit(name, entries):
+    """Create a batch for the entries not already cached. Returns its state, or None."""
+    todo = [entry for entry in entries if entry['key'] not in response_cache]
+    if not todo:
+        return None
+    batch = get_client().messages.batches.create(requests=[
+        {'custom_id': custom_id(entry), 'params': entry['params']} for entry in todo
+    ])
+    state = {
+        'batch_id': batch.id,
+        'submitted': time.time(),
+        'requests': {custom_id(entry): {'stage': entry['stage'], 'key': entry['key']} for entry in todo},
+    }
+    save_state(name, state)
+    print(f'  Submitted batch {batch.id} ({len(todo)} request(s), {len(entries) - len(todo)} already cached)')
+    return state
+
+
+def wait(state, poll=POLL_SECONDS):
+    """Poll a batch with exponential backoff until it has ended."""
+    delay = poll
+    while True:
+        batch = get_client().messages.batches.retrieve(state['batch_id'])
+        counts = batch.request_counts
+        print(f'  {batch.processing_status}: {counts.succeeded} succeeded, {counts.errored} errored, '
+              f'{counts.processing} processing')
+        if batch.processing_status == 'ended':
+            return batch
+        time.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_SECONDS)
+
+
+def collect(name, state):
+    """
+    Store every succeeded result in the response cache. Returns ({key: text}, {key: error}).
+
+    A result cut off at max_tokens is not cached (as with live calls), so
+    it is reported as an error rather than returned.
+    """
+    texts = {}
+    errors = {}
+    for item in get_client().messages.batches.results(state['batch_id']):
+        request = state['requests'].get(item.custom_id)
+        if request is None:
+            continue
+        result = item.result
+        if result.type == 'succeeded':
+            text = store_response(request['stage'], request['key'], result.message)
+            if result.message.stop_reason == 'max_tokens':
+                errors[request['key']] = 'stopped at max_tokens (truncated, not cached)'
+            else:
+                texts[request['key']] = text
+        else:
+            error = getattr(getattr(result, 'error', None), 'error', None)
+            errors[request['key']] = f'{result.type}: {getattr(error, "message", "")}'.rstrip(': ')
+    state['collected'] = time.time()
+    state['errors'] = errors
+    save_state(name, state)
+    return texts, errors
+
+
+def run_batch(name, entries, poll=POLL_SECONDS):
+    """
+    Resolve every entry through the Batches API.
+
+    An unfinished batch saved under name is resumed first; whatever is then
+    still missing from the cache is submitted as a new batch. Entries over
+    the prompt budget are refused, as the gateway refuses live calls.
+    Returns ({key: text}, {key: error}).
+    """
+    refused = {}
+    for entry in entries:
+        try:
+            check_request(entry['stage'], entry['params'])
+        except OverBudget as e:
+            refused[entry['key']] = str(e)
+
+    received, errors = {}, {}
+    state = load_state(name)
+    if state is not None and not state.get('collected'):
+        print(f'  Resuming batch {state["batch_id"]}')
+        wait(state, poll)
+        for part, result in zip((received, errors), collect(name, state)):
+            part.update(result)
+
+    state = submit(name, [entry for entry in entries if entry['key'] not in refused])
+    if state is not None:
+        wait(state, poll)
+        for part, result in zip((received, errors), collect(name, state)):
+            part.update(result)
+
+    errors.update(refused)
+    texts = {}
+    for entry in entries:
+        key = entry['key']
+        text = received[key] if key in received else cached_text(entry['stage'], key)
+        if text is not None:
+            texts[key] = text
+            errors.pop(key, None)
+        else:
+            errors.setdefault(key, 'no result')
+    return texts, errors
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('run', 'status'):
+        print('Usage: python llm_batch.py run <pending.jsonl> [name]')
+        print('       python llm_batch.py status <name>')
+        sys.exit(1)
+
+    if sys.argv[1] == 'status':
+        state = load_state(sys.argv[2])
+        if state is None:
+            print(f'✗ No batch saved as {sys.argv[2]}')
+            sys.exit(1)
+        batch = get_client().messages.batches.retrieve(state['batch_id'])
+        counts = batch.request_counts
+        print(f'{state["batch_id"]}: {batch.processing_status}, {len(state["requests"])} request(s)')
+        print(f'  {counts.succeeded} succeeded, {counts.errored} errored, {counts.expired} expired, '
+              f'{counts.canceled} canceled, {counts.processing} processing')
+        print(f'  Collected: {"yes" if state.get("collected") else "no"}')
+        return
+
+    pending_path = Path(sys.argv[2])
+    name = sys.argv[3] if len(sys.argv) > 3 else pending_path.stem
+    entries = read_pending(pending_path)
+    print(f'Batch {name}: {len(entries)} request(s) from {pending_path}')
+    texts, errors = run_batch(name, entries)
+    print(f'\n✓ {len(texts)} result(s) in the cache')
+    for key, error in errors.items():
+        print(f'  ✗ {key[:16]}: {error}')
+    missing = [entry for entry in entries if entry['key'] not in response_cache]
+    if not missing:
+        pending_path.unlink()
+        print(f'  Removed {pending_path}; re-run the collecting scripts to write their outputs')
+    else:
+        print(f'  Kept {pending_path}: {len(missing)} request(s) still not cached')
+
+
+if __name__ == '__main__':
+    main()
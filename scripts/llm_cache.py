@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+LLM Cache
+Content-addressed on-disk cache of Claude responses, used by llm_gateway.
+
+The key is a SHA-256 over the canonical JSON of everything that shapes a
+response: model, messages, max_tokens, temperature and any other request
+params. Each entry is one small JSON file, written atomically, under
+.kernel_cache/llm/ (or LLM_CACHE_DIR). A hit refreshes the entry's mtime;
+when the cache grows past its size cap the least recently used entries are
+evicted. The cache's size is measured once per process and then kept as a
+running total, so a write only scans the directory when it may have
+pushed the cache over the cap.
+
+Caching is on for every stage unless bypassed: set LLM_CACHE_BYPASS to a
+comma-separated list of stages (e.g. stage_1,stage_3 to resample the
+temperature=1.0 stages) or to 'all', or pass cache=False to complete().
+
+Usage:
+    python scripts/llm_cache.py            # show size and entry count
+    python scripts/llm_cache.py --clear    # remove every entry
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from kernel_loader import CACHE_DIR
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+LLM_CACHE_DIR = Path(os.environ.get('LLM_CACHE_DIR', CACHE_DIR / 'llm'))
+MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+EVICT_TO = 0.9              # Evict down to this fraction of MAX_BYTES
+BYPASS = {stage.strip() for stage in os.environ.get('LLM_CACHE_BYPASS', '').split(',') if stage.strip()}
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def request_key(request):
+    """Canonical hash of a messages.create request."""
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def bypassed(stage):
+    return 'all' in BYPASS or stage in BYPASS
+
+
+# =============================================================================
+# RESPONSE CACHE
+# =============================================================================
+
+class ResponseCache:
+    """Size-bounded LRU cache of response entries, one JSON file per key."""
+
+    def __init__(self, directory=LLM_CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self.size = None        # Running total of entry bytes, measured on the first write
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+    def __contains__(self, key):
+        return self._path(key).exists()
+
+    def get(self, key):
+        """Return the cached entry dict, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+        try:
+            os.utime(path)      # Mark as recently used
+        except OSError:
+            pass
+        self.stats['hits'] += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry atomically, then evict if over the size cap."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.stats['writes'] += 1
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.entries())
+            else:
+                self.size += path.stat().st_size - replaced
+            over = self.size > self.max_bytes
+        if over:
+            self.evict()
+
+    def discard(self, key):
+        """Remove one entry (e.g. a response found to be unusable), if present."""
+        path = self._path(key)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self.lock:
+            if self.size is not None:
+                self.size -= size
+
+    def entries(self):
+        """Return [(mtime, size, path)] for every entry, oldest first."""
+        found = []
+        for path in self.directory.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, stat.st_size, path))
+        return sorted(found)
+
+    def evict(self):
+        """Drop least recently used entries until under the cap (rescans the directory)."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        self.size = total
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.size = total
+        self.stats['evictions'] += removed
+        return removed
+
+    def clear(self):
+        removed = 0
+        for _, _, path in self.entries():
+            path.unlink()
+            removed += 1
+        self.size = 0
+        return removed
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    cache = ResponseCache()
+    if '--clear' in sys.argv:
+        print(f'Removed {cache.clear()} entr(ies) from {cache.directory}')
+        return
+
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f'Cache: {cache.directory}')
+    print(f'  Entries: {len(entries)}')
+    print(f'  Size: {total:,} of {cache.max_bytes:,} bytes')
+    if entries:
+        print(f'  Least recently used: {time.ctime(entries[0][0])}')
+    print(f'  Bypassed stages: {", ".join(sorted(BYPASS)) or "none"}')
+
+
+if __name__ == '__main__':
+    main()
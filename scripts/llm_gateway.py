@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway
+Single entry point for every Claude API call in the pipeline.
+
+One Anthropic client is created per process, on first use. Its HTTP
+connection pool keeps connections alive between requests, so connection
+and TLS setup happen once no matter how many pages or stages run.
+Importing this module costs nothing (no client, no network), so --help
+and dry runs stay fast.
+
+    from llm_gateway import complete
+    text = complete('stage_3', prompt, max_tokens=6000, temperature=1.0)
+
+acomplete() is the asyncio counterpart (one shared AsyncAnthropic client),
+for batch runs that keep several requests in flight. stream() and astream()
+deliver the text as it is generated, to a callback, and report time to
+first token and output tokens per second.
+
+Every call is tagged with a stage name; per-stage call counts, cache hits,
+token usage and wall time are kept in STATS. Responses are cached on disk
+by request content (see llm_cache.py); pass cache=False or list the stage
+in LLM_CACHE_BYPASS to force a fresh call.
+
+Static instructions go in a system prompt marked for prompt caching, with
+the per-kernel data last in the user message: split_prompt() cuts a filled
+template at its '=== INPUT ===' line, cacheable() wraps any other static
+text. Cache read/write token counts are kept per stage alongside the rest.
+
+Transient failures (timeouts after LLM_TIMEOUT_SECONDS, dropped
+connections, 429 rate limits, 529 overloaded, 5xx) are retried with
+jittered exponential backoff, honoring retry-after, up to LLM_MAX_RETRIES
+times. A per-stage circuit breaker pauses a stage for
+LLM_BREAKER_COOLDOWN_SECONDS when most of its recent calls fail, so an
+overloaded API is not hammered by every worker at once.
+
+With LLM_BATCH_COLLECT=pending.jsonl set, a cache miss is not sent: the
+request is appended to that file and DeferredToBatch is raised. Submit the
+file with llm_batch.py, then re-run the same scripts (still collecting) to
+pick the batch results up from the cache through their normal parsers.
+
+A request that misses the cache is first estimated offline (prompt_budget.py)
+and refused with OverBudget if it is over LLM_PROMPT_BUDGET tokens, rather
+than sent to fail.
+
+Usage (prints the gateway settings):
+    python scripts/llm_gateway.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from llm_cache import ResponseCache, bypassed, request_key
+from prompt_budget import PROMPT_BUDGET, check_request
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_MODEL = 'claude-sonnet-4-20250514'
+DEFAULT_MAX_TOKENS = 4000
+BATCH_COLLECT = os.environ.get('LLM_BATCH_COLLECT')
+PROMPT_INPUT_MARKER = '=== INPUT ==='
+
+MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 4))
+REQUEST_TIMEOUT = float(os.environ.get('LLM_TIMEOUT_SECONDS', 300))
+BACKOFF_SECONDS = 1.0       # First retry waits up to this long; doubles per attempt (full jitter)
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_AFTER_MAX_SECONDS = 300.0
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}   # 429 rate limited, 529 overloaded
+
+BREAKER_WINDOW = 10         # Recent API calls per stage considered by its circuit breaker
+BREAKER_MIN_CALLS = 4
+BREAKER_FAILURE_RATE = 0.5  # Failing share of the window that opens the breaker
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', 30))
+
+USAGE_FIELDS = ['input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens']
+
+# stage -> {'calls', 'cached', 'seconds', 'streams', 'first_token_seconds', 'retries', 'pauses', *USAGE_FIELDS}
+STATS = {}
+
+response_cache = ResponseCache()
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+class DeferredToBatch(Exception):
+    """Raised instead of calling the API while collecting requests for a batch."""
+
+
+class StopStream(Exception):
+    """
+    Raised from a stream() on_text callback to end generation early and
+    keep the text received so far (e.g. the caller has everything it needs).
+    Any other exception from on_text cancels the request and propagates.
+    """
+
+
+class RejectResponse(Exception):
+    """
+    Raised from a stream() on_text or check callback to refuse a response
+    (e.g. it is off-spec): it is not cached, and a cached copy that fails
+    the same way is evicted, so the next call reaches the API again.
+    """
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+def check_api_key():
+    """Exit with the usual message if ANTHROPIC_API_KEY is not set."""
+    if not os.environ.get('ANTHROPIC_API_KEY'):
+        print('ERROR: ANTHROPIC_API_KEY environment variable not set')
+        sys.exit(1)
+
+
+def get_client():
+    """Return the process-wide Anthropic client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from anthropic import Anthropic
+                _client = Anthropic()
+    return _client
+
+
+def get_async_client():
+    """Return the process-wide AsyncAnthropic client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from anthropic import AsyncAnthropic
+                _async_client = AsyncAnthropic()
+    return _async_client
+
+
+def _stats(stage):
+    return STATS.setdefault(stage, dict({'calls': 0, 'cached': 0, 'seconds': 0.0, 'streams': 0,
+                                         'first_token_seconds': 0.0, 'retries': 0, 'pauses': 0},
+                                        **{field: 0 for field in USAGE_FIELDS}))
+
+
+def _record(stage, usage, seconds, cached=False):
+    stats = _stats(stage)
+    stats['calls'] += 1
+    stats['seconds'] += seconds
+    if cached:
+        stats['cached'] += 1
+        return
+    for field in USAGE_FIELDS:
+        stats[field] += usage.get(field) or 0
+
+
+# =============================================================================
+# RETRIES
+# =============================================================================
+
+def is_transient(error):
+    """True for API errors worth retrying: timeouts, lost connections, 429/529 and 5xx."""
+    from anthropic import APIConnectionError, APIStatusError
+    if isinstance(error, APIConnectionError):      # Includes APITimeoutError
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRY_STATUSES
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retry number attempt (0-based): retry-after if sent, else jittered backoff."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        try:
+            return min(float(headers[header]) * scale, RETRY_AFTER_MAX_SECONDS)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return random.uniform(0, min(BACKOFF_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS))
+
+
+def describe_error(error):
+    status = getattr(error, 'status_code', None)
+    return f'{status} {type(error).__name__}' if status else type(error).__name__
+
+
+class CircuitBreaker:
+    """
+    Pauses one stage while its API calls are failing.
+
+    The outcome of each API call attempt is kept for the last BREAKER_WINDOW
+    calls. Once BREAKER_FAILURE_RATE of them (and at least BREAKER_MIN_CALLS)
+    have failed, the breaker opens: every call of the stage waits out
+    BREAKER_COOLDOWN_SECONDS instead of adding load, then calls resume with
+    a fresh window.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def pause(self):
+        """Seconds left before calls may be sent (0 when closed)."""
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record(self, ok):
+        with self.lock:
+            self.outcomes.append(ok)
+            failures = self.outcomes.count(False)
+            if (not ok and len(self.outcomes) >= BREAKER_MIN_CALLS
+                    and failures >= BREAKER_FAILURE_RATE * len(self.outcomes)):
+                print(f'  ⚠ {self.stage}: {failures} of the last {len(self.outcomes)} calls failed, '
+                      f'pausing the stage for {BREAKER_COOLDOWN_SECONDS:.0f}s')
+                self.open_until = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+                self.outcomes.clear()
+                _stats(self.stage)['pauses'] += 1
+
+
+_breakers = {}
+
+
+def breaker(stage):
+    """The stage's CircuitBreaker."""
+    with _client_lock:
+        return _breakers.setdefault(stage, CircuitBreaker(stage))
+
+
+def _failed(stage, error, attempt, retryable):
+    """Record a failed attempt. Returns the delay before retrying, or re-raises."""
+    if not is_transient(error):
+        raise error
+    breaker(stage).record(False)
+    if attempt >= MAX_RETRIES or not retryable:
+        raise error
+    delay = retry_delay(error, attempt)
+    _stats(stage)['retries'] += 1
+    print(f'  ⚠ {stage}: {describe_error(error)}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})')
+    return delay
+
+
+def _call(stage, send, retryable=lambda: True):
+    """
+    Run send() (one API request) under the stage's circuit breaker,
+    retrying transient errors up to MAX_RETRIES times with backoff.
+    retryable() is consulted before each retry (False once a stream has
+    delivered text). Other exceptions propagate at once.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        time.sleep(breaker(stage).pause())
+        try:
+            result = send()
+        except Exception as e:
+            time.sleep(_failed(stage, e, attempt, retryable()))
+            continue
+        breaker(stage).record(True)
+        return result
+
+
+async def _acall(stage, send, retryable=lambda: True):
+    """Async version of _call(); send() returns an awaitable."""
+    for attempt in range(MAX_RETRIES + 1):
+        await asyncio.sleep(breaker(stage).pause())
+        try:
+            result = await send()
+        except Exception as e:
+            await asyncio.sleep(_failed(stage, e, attempt, retryable()))
+            continue
+        breaker(stage).record(True)
+        return result
+
+
+def _api(client):
+    """Client view for stage requests: retries are _call()'s job, each attempt has REQUEST_TIMEOUT."""
+    return client.with_options(max_retries=0, timeout=REQUEST_TIMEOUT)
+
+
+# =============================================================================
+# PROMPT ASSEMBLY
+# =============================================================================
+
+def cacheable(text):
+    """System prompt blocks for static text, marked as a prompt-cache breakpoint."""
+    return [{'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}]
+
+
+def split_prompt(prompt, marker=PROMPT_INPUT_MARKER):
+    """
+    Split a filled-in template at its marker line.
+
+    Returns (system, user prompt): the instructions before the marker as a
+    cacheable system prompt, the per-kernel input after it as the user
+    message. Without a marker the whole prompt is the user message and
+    system is None.
+    """
+    instructions, found, data = prompt.partition(marker)
+    if not found:
+        return None, prompt
+    return cacheable(instructions.strip()), data.strip()
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def build_request(stage, prompt, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, **params):
+    """Return (messages.create kwargs, cache key) for one user prompt."""
+    params = {name: value for name, value in params.items() if value is not None}
+    request = dict(params, model=model, max_tokens=max_tokens,
+                   messages=[{'role': 'user', 'content': prompt}])
+    return request, request_key(request)
+
+
+def _request(stage, prompt, model, max_tokens, cache, params):
+    """Build the request and its cache key (None when not caching)."""
+    request, key = build_request(stage, prompt, model, max_tokens, **params)
+    # Batch results come back through the cache, so collecting always keys
+    if not (BATCH_COLLECT or (cache and not bypassed(stage))):
+        key = None
+    return request, key
+
+
+def cached_text(stage, key):
+    """Return the cached response text for key (counted as a cache hit), or None."""
+    return _from_cache(stage, key, time.perf_counter())
+
+
+def store_response(stage, key, message):
+    """
+    Record and cache a message obtained outside complete() (batch results).
+    As with live calls, a message cut off at max_tokens is not cached.
+    """
+    return _finish(stage, key, message, time.perf_counter())
+
+
+def _defer(stage, request, key):
+    """Append a request to the LLM_BATCH_COLLECT file and raise DeferredToBatch."""
+    with open(BATCH_COLLECT, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'stage': stage, 'key': key, 'params': request}) + '\n')
+    raise DeferredToBatch(f'{stage} request added to {BATCH_COLLECT}')
+
+
+def _from_cache(stage, key, start):
+    """Return cached text for key (recording the hit), or None."""
+    if key is None:
+        return None
+    entry = response_cache.get(key)
+    if entry is None:
+        return None
+    _record(stage, entry['usage'], time.perf_counter() - start, cached=True)
+    return entry['text']
+
+
+def _finish(stage, key, response, start, check=None):
+    """Record a live response, cache it if complete (and accepted by check), and return its text."""
+    text = response.content[0].text
+    usage = {field: getattr(response.usage, field, None) or 0 for field in USAGE_FIELDS}
+    _record(stage, usage, time.perf_counter() - start)
+    if check is not None:
+        check(text)
+    if key is not None and response.stop_reason != 'max_tokens':
+        response_cache.put(key, {'stage': stage, 'model': response.model, 'text': text,
+                                 'usage': usage, 'created': time.time()})
+    return text
+
+
+def complete(stage, prompt, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, cache=True, **params):
+    """
+    Send one user prompt and return the response text.
+
+    prompt is a string (or a list of content blocks). Extra params
+    (temperature, system, ...) are passed through to messages.create and
+    are part of the cache key; params set to None are left out.
+    cache=False skips the response cache.
+
+    Timeouts, dropped connections, 429, 529 and 5xx responses are retried
+    up to MAX_RETRIES times, waiting as long as retry-after asks or else
+    with jittered exponential backoff; the stage's CircuitBreaker pauses
+    it while most recent calls fail.
+    """
+    start = time.perf_counter()
+    request, key = _request(stage, prompt, model, max_tokens, cache, params)
+    text = _from_cache(stage, key, start)
+    if text is not None:
+        return text
+    check_request(stage, request)
+    if BATCH_COLLECT:
+        _defer(stage, request, key)
+    response = _call(stage, lambda: _api(get_client()).messages.create(**request))
+    return _finish(stage, key, response, start)
+
+
+async def acomplete(stage, prompt, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, cache=True, **params):
+    """Async version of complete()."""
+    start = time.perf_counter()
+    request, key = _request(stage, prompt, model, max_tokens, cache, params)
+    text = _from_cache(stage, key, start)
+    if text is not None:
+        return text
+    check_request(stage, request)
+    if BATCH_COLLECT:
+        _defer(stage, request, key)
+    response = await _acall(stage, lambda: _api(get_async_client()).messages.create(**request))
+    return _finish(stage, key, response, start)
+
+
+def _timing(stage, response, start, first_token):
+    """Per-call timing for a streamed response; also added to STATS."""
+    seconds = time.perf_counter() - start
+    first_token = seconds if first_token is None else first_token
+    stats = STATS[stage]
+    stats['streams'] += 1
+    stats['first_token_seconds'] += first_token
+    generating = seconds - first_token
+    output_tokens = response.usage.output_tokens
+    return {
+        'cached': False,
+        'first_token': first_token,
+        'seconds': seconds,
+        'output_tokens': output_tokens,
+        'tokens_per_second': output_tokens / generating if generating > 0 else 0.0,
+    }
+
+
+def _cached_timing(start):
+    seconds = time.perf_counter() - start
+    return {'cached': True, 'stopped': False, 'first_token': seconds, 'seconds': seconds,
+            'output_tokens': 0, 'tokens_per_second': 0.0}
+
+
+def _deliver_cached(key, text, on_text, check):
+    """Pass a cache hit to on_text and check; evict it if either rejects it."""
+    try:
+        if on_text is not None:
+            try:
+                on_text(text)
+            except StopStream:
+                pass
+        if check is not None:
+            check(text)
+    except RejectResponse:
+        response_cache.discard(key)
+        raise
+
+
+def stream(stage, prompt, on_text=None, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, cache=True, check=None,
+           **params):
+    """
+    Streaming version of complete(): on_text(chunk) is called as text arrives.
+
+    Returns (text, timing) where timing holds 'first_token' and 'seconds'
+    (from the start of the call), 'output_tokens', 'tokens_per_second'
+    (after the first token), 'cached' and 'stopped'. A cache hit is
+    delivered to on_text in one chunk.
+
+    on_text may raise StopStream to close the connection and return what
+    has arrived so far; any other exception it raises cancels the request
+    (nothing is cached) and propagates. check(text), if given, is called
+    on the finished text before it is cached. RejectResponse from either
+    also evicts a cached copy. Transient errors are retried like
+    complete()'s only until the first chunk has been delivered.
+    """
+    start = time.perf_counter()
+    request, key = _request(stage, prompt, model, max_tokens, cache, params)
+    text = _from_cache(stage, key, start)
+    if text is not None:
+        _deliver_cached(key, text, on_text, check)
+        return text, _cached_timing(start)
+    check_request(stage, request)
+    if BATCH_COLLECT:
+        _defer(stage, request, key)
+    first_token = None
+
+    def send():
+        nonlocal first_token
+        with _api(get_client()).messages.stream(**request) as response_stream:
+            try:
+                for chunk in response_stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    if on_text is not None:
+                        on_text(chunk)
+                return response_stream.get_final_message(), False
+            except StopStream:
+                # Leaving the with block closes the connection and ends generation
+                return response_stream.current_message_snapshot, True
+
+    # A failure after text has reached on_text is not retried here
+    response, stopped = _call(stage, send, lambda: first_token is None)
+    text = _finish(stage, key, response, start, check)
+    return text, dict(_timing(stage, response, start, first_token), stopped=stopped)
+
+
+async def astream(stage, prompt, on_text=None, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, cache=True,
+                  check=None, **params):
+    """Async version of stream(); on_text is a plain (non-async) callable."""
+    start = time.perf_counter()
+    request, key = _request(stage, prompt, model, max_tokens, cache, params)
+    text = _from_cache(stage, key, start)
+    if text is not None:
+        _deliver_cached(key, text, on_text, check)
+        return text, _cached_timing(start)
+    check_request(stage, request)
+    if BATCH_COLLECT:
+        _defer(stage, request, key)
+    first_token = None
+
+    async def send():
+        nonlocal first_token
+        async with _api(get_async_client()).messages.stream(**request) as response_stream:
+            try:
+                async for chunk in response_stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    if on_text is not None:
+                        on_text(chunk)
+                return await response_stream.get_final_message(), False
+            except StopStream:
+                return response_stream.current_message_snapshot, True
+
+    response, stopped = await _acall(stage, send, lambda: first_token is None)
+    text = _finish(stage, key, response, start, check)
+    return text, dict(_timing(stage, response, start, first_token), stopped=stopped)
+
+
+def print_api_error(error):
+    """Print the standard failure message for a failed stage call."""
+    if isinstance(error, DeferredToBatch):
+        print(f'Deferred: {error}')
+        return
+    print(f'ERROR: API call failed: {error}')
+    if is_transient(error):
+        print(f'Transient error, still failing after retries (LLM_MAX_RETRIES={MAX_RETRIES}); re-run later')
+    print('Check:')
+    print('  1. ANTHROPIC_API_KEY is set')
+    print(f'  2. Prompt length < {PROMPT_BUDGET:,} tokens (--dry-run shows the estimate per section)')
+    print('  3. Internet connection working')
+
+
+def print_stats():
+    """Print per-stage call statistics."""
+    for stage, stats in STATS.items():
+        print(f'  {stage}: {stats["calls"]} call(s) ({stats["cached"]} cached), '
+              f'{stats["input_tokens"]:,} in / {stats["output_tokens"]:,} out tokens, '
+              f'prompt cache {stats["cache_read_input_tokens"]:,} read / '
+              f'{stats["cache_creation_input_tokens"]:,} written, {stats["seconds"]:.1f}s')
+        if stats['retries'] or stats['pauses']:
+            print(f'    {stats["retries"]} retried request(s), paused {stats["pauses"]} time(s) by the circuit breaker')
+        if stats['streams']:
+            print(f'    first token after {stats["first_token_seconds"] / stats["streams"]:.1f}s on average '
+                  f'({stats["streams"]} streamed)')
+
+
+def main():
+    print(f'Model: {DEFAULT_MODEL}')
+    print(f'API key: {"set" if os.environ.get("ANTHROPIC_API_KEY") else "not set"}')
+    print(f'Retries: {MAX_RETRIES} (timeout {REQUEST_TIMEOUT:.0f}s per attempt, '
+          f'breaker cooldown {BREAKER_COOLDOWN_SECONDS:.0f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Prompt Budget
+Offline token estimates for stage prompts, and trimming to fit a budget
+before anything is sent.
+
+    prompt, report = fit_prompt(template, fields, trims=[
+        ('compact angles JSON', compact_angles),      # lowest priority first
+        ('top 5 devices', fewer_devices),
+    ])
+    print(describe(report))
+
+fields are the template's placeholder values; each trim is (label,
+trim(fields)) and edits fields in place. Trims are applied in order, only
+while the estimate is over LLM_PROMPT_BUDGET (default 100,000 tokens).
+report holds the estimate per section (the static instructions and each
+field) and the trims applied; print_report() shows it as a table, which is
+what every stage prints for --dry-run (prompt rendered, nothing sent).
+
+The gateway checks every request against the same budget before sending
+it and raises OverBudget instead of paying for a call that would fail.
+
+The estimate needs no tokenizer or network: words, digit groups, symbols
+and line breaks are counted as tokens, long words as several. On English
+prose and indented JSON it errs slightly high, which is the safe side for
+a budget.
+
+Usage (estimates files, e.g. a saved prompt):
+    python scripts/prompt_budget.py prompts/phase_1/stage_3_messages.txt [...]
+"""
+
+import os
+import re
+import sys
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+PROMPT_BUDGET = int(os.environ.get('LLM_PROMPT_BUDGET', 100000))
+WORD_CHARS = 8          # Letters per token in long words
+
+_PIECES = re.compile(r'[A-Za-z]+|[0-9]{1,3}|\n[ \t]*|[^\sA-Za-z0-9]')
+
+
+class OverBudget(ValueError):
+    """Raised instead of sending a request estimated over PROMPT_BUDGET."""
+
+
+# =============================================================================
+# ESTIMATION
+# =============================================================================
+
+def estimate_tokens(text):
+    """Approximate token count of text (or of a list of text content blocks)."""
+    if isinstance(text, list):
+        return sum(estimate_tokens(block.get('text', '')) for block in text)
+    tokens = 0
+    for piece in _PIECES.findall(str(text or '')):
+        tokens += 1 + len(piece) // WORD_CHARS if piece[0].isalpha() else 1
+    return tokens
+
+
+def request_tokens(request):
+    """Approximate input tokens of a messages.create request."""
+    return estimate_tokens(request.get('system')) + sum(
+        estimate_tokens(message['content']) for message in request['messages'])
+
+
+def check_request(stage, request, budget=PROMPT_BUDGET):
+    """Raise OverBudget if a request's estimated input exceeds budget."""
+    tokens = request_tokens(request)
+    if tokens > budget:
+        raise OverBudget(f'{stage} prompt is ~{tokens:,} tokens, over the {budget:,} token budget '
+                         f'(LLM_PROMPT_BUDGET)')
+
+
+# =============================================================================
+# FITTING
+# =============================================================================
+
+def fit_prompt(template, fields, trims=(), system='', budget=PROMPT_BUDGET, render=None):
+    """
+    Fill template with fields, trimming until the estimate fits budget.
+
+    system is any static text sent alongside (counted with the template's
+    own instructions). render(fields) replaces template.format(**fields)
+    for templates filled another way. Returns (prompt, report); a prompt
+    still over budget after every trim is returned as is, for the caller
+    (or the gateway) to refuse.
+    """
+    if render is None:
+        def render(values):
+            return template.format(**values)
+    pending = list(trims)
+    trimmed = []
+    while True:
+        prompt = render(fields)
+        total = estimate_tokens(prompt) + estimate_tokens(system)
+        if total <= budget or not pending:
+            break
+        label, trim = pending.pop(0)
+        trim(fields)
+        trimmed.append(label)
+
+    instructions = estimate_tokens(render({name: '' for name in fields})) + estimate_tokens(system)
+    report = {
+        'total': total,
+        'budget': budget,
+        'sections': [('instructions', instructions)] + [
+            (name, estimate_tokens(value)) for name, value in fields.items()],
+        'trimmed': trimmed,
+    }
+    return prompt, report
+
+
+def describe(report):
+    """One-line summary of a fit_prompt report."""
+    line = f'Prompt: ~{report["total"]:,} tokens (budget {report["budget"]:,})'
+    if report['trimmed']:
+        line += f', trimmed: {", ".join(report["trimmed"])}'
+    if report['total'] > report['budget']:
+        line += ' - OVER BUDGET'
+    return line
+
+
+def print_report(stage, report):
+    """Per-section token table for a fit_prompt report (the --dry-run output)."""
+    print(f'{stage} prompt (estimated tokens):')
+    width = max(len(name) for name, _ in report['sections'])
+    for name, tokens in sorted(report['sections'], key=lambda section: -section[1]):
+        print(f'  {name:<{width}}  {tokens:>8,}')
+    print(f'  {"total":<{width}}  {report["total"]:>8,}  of {report["budget"]:,}')
+    for label in report['trimmed']:
+        print(f'  ⚠ Trimmed: {label}')
+    if report['total'] > report['budget']:
+        print('  ✗ Over budget after every trim; the request would not be sent')
+
+
+def dry_run_args(argv):
+    """Split --dry-run out of a script's arguments. Returns (args, dry_run)."""
+    return [arg for arg in argv if arg != '--dry-run'], '--dry-run' in argv
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: python prompt_budget.py <file> [file2 ...]')
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        print(f'{path}: ~{estimate_tokens(text):,} tokens ({len(text):,} chars)')
+    print(f'Budget: {PROMPT_BUDGET:,} tokens (LLM_PROMPT_BUDGET)')
+
+
+if __name__ == '__main__':
+    main()
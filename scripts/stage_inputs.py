@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Stage Inputs
+Kernel-derived prompt fields for the pedagogy stages.
+
+The stage scripts fill their prompts from these functions and kernel_diff
+compares them between kernel versions, so a stage is reported as affected
+exactly when the kernel text it sends changes. Nothing here touches the
+LLM gateway, so kernel_diff can import it without the API stack.
+
+Usage:
+    from stage_inputs import stage_1_fields, stage_1_devices
+
+    fields = stage_1_fields(kernel)              # top 8 devices
+    stage_1_devices(kernel, 5)                   # the prompt-budget fallback
+"""
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def preview(text, limit):
+    """Truncate text to limit chars, marking the cut with '...'."""
+    return text[:limit] + '...' if len(text) > limit else text
+
+
+# =============================================================================
+# STAGE FIELDS
+# =============================================================================
+
+def stage_1_devices(kernel, count):
+    """Device list for the prompt (top devices, prioritized first)."""
+    return "\n".join(
+        f"- {device.name} ({device.get('assigned_section', 'N/A')})"
+        for device in kernel.top_devices(count, priority_limit=5)
+    )
+
+
+def stage_1_fields(kernel):
+    """Kernel fields of the Stage 1 audience prompt."""
+    return {
+        'pattern_from_kernel': kernel.pattern_name,
+        'core_dynamic_from_kernel': kernel.core_dynamic,
+        'reader_effect_from_kernel': kernel.reader_effect,
+        'list_of_device_names_and_layers': stage_1_devices(kernel, 8),
+    }
+
+
+def stage_3_devices(kernel, count):
+    """Device summary for the prompt (top devices with effect, prioritized first)."""
+    return "\n".join(
+        f"- {device.name} ({device.get('assigned_section', 'N/A')}): {device.effect[:80]}"
+        for device in kernel.top_devices(count, priority_limit=8)
+    )
+
+
+def stage_3_fields(kernel):
+    """Kernel fields of the Stage 3 message matrix prompt."""
+    return {
+        'pattern': kernel.pattern_name,
+        'core_dynamic': kernel.core_dynamic,
+        'reader_effect': kernel.reader_effect,
+        'device_list': stage_3_devices(kernel, 8),
+    }
+
+
+def stage_4_fields(kernel):
+    """Kernel fields of the Stage 4 evaluation prompt."""
+    return {
+        'kernel_pattern': f"Pattern: {kernel.pattern_name}\nCore Dynamic: {kernel.core_dynamic}\nReader Effect: {kernel.reader_effect}",
+    }
+
+
+def stage_5a_devices(kernel, count, effect_chars):
+    """Device list with effects (top devices, prioritized first)."""
+    return "\n".join(
+        f"- {device.name}: {preview(device.get('effect', 'No effect listed'), effect_chars)}"
+        for device in kernel.top_devices(count, priority_limit=8)
+    )
+
+
+def stage_5a_title(kernel):
+    """Book title substituted into the Stage 5A prompt."""
+    return kernel.metadata.get('title', 'Unknown Book')
+
+
+def stage_5a_fields(kernel):
+    """Kernel fields of the Stage 5A drafts prompt."""
+
+    # Top 8 devices with effect, prioritized first
+    device_list = stage_5a_devices(kernel, 8, 100)
+
+    # Sample quotes (first 5 devices with anchor_phrase, prioritized first)
+    quotes = [
+        f'"{preview(device.anchor_phrase, 80)}" — {device.name}'
+        for device in kernel.top_devices(5, priority_limit=5, require='anchor_phrase')
+    ]
+
+    quote_list = "\n".join(quotes) if quotes else "See device entries for quotes"
+
+    return {
+        'kernel_pattern': kernel.pattern_name,
+        'core_dynamic': kernel.core_dynamic,
+        'reader_effect': kernel.reader_effect,
+        'device_list_with_effects': device_list,
+        'sample_quotes': quote_list
+    }
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Text Index
+Persistent inverted index over the editorial text fields of every kernel:
+pattern name, core_dynamic, reader_effect, device mediation summary, and
+each device's name, effect, anchor_phrase and scene.
+
+Postings are positional (term -> document -> word positions), so a query
+only touches the postings of its own terms. Queries support:
+    word                  documents containing the word
+    "two words"           exact phrase
+    a b / a AND b         both (AND is the default)
+    a OR b                either
+    -a / NOT a            exclude
+    ( ... )               grouping
+
+The index lives in .kernel_cache/text_index.pickle (or --index PATH) and is
+updated incrementally: a kernel is re-indexed only when its file changed.
+
+Usage:
+    python scripts/text_index.py update kernels/
+    python scripts/text_index.py search '"moral witness" (irony OR juxtaposition) -childhood'
+    python scripts/text_index.py search 'retrospective' --field effect
+"""
+
+import os
+import pickle
+import re
+import sys
+from pathlib import Path
+
+from concordance import tokenize
+from kernel_archive import is_member_path, kernel_paths, member_info
+from kernel_loader import CACHE_DIR, _write_sidecar
+from kernel_model import Kernel
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+INDEX_PATH = CACHE_DIR / 'text_index.pickle'
+INDEX_VERSION = 1
+
+KERNEL_FIELDS = [
+    ('alignment_pattern', 'pattern_name'),
+    ('alignment_pattern', 'core_dynamic'),
+    ('alignment_pattern', 'reader_effect'),
+    ('macro_variables', 'device_mediation', 'summary'),
+]
+DEVICE_FIELDS = ['name', 'effect', 'anchor_phrase', 'scene']
+
+_QUERY_TOKEN = re.compile(r'(-)?"([^"]*)"|(\()|(\))|(-)?([^\s()"]+)')
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def kernel_key(path):
+    """Stable key for a kernel path (archive members included)."""
+    return str(Path(path).resolve())
+
+
+def fingerprint(path):
+    """Cheap change marker: stat for loose files, recorded hash for archive members."""
+    if is_member_path(path):
+        return member_info(path)['sha256']
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def kernel_documents(kernel):
+    """Yield (field, device_index, device_name, text) for a Kernel's indexed fields."""
+    for keys in KERNEL_FIELDS:
+        node = kernel.data
+        for key in keys:
+            node = node.get(key, {}) if isinstance(node, dict) else {}
+        if isinstance(node, str) and node:
+            yield '.'.join(keys), None, None, node
+    for device in kernel.devices:
+        for field in DEVICE_FIELDS:
+            text = device.get(field)
+            if isinstance(text, str) and text:
+                yield f'micro_devices.{field}', device.index, device.name, text
+
+
+def words(text):
+    return tokenize(text)[0]
+
+
+# =============================================================================
+# TEXT INDEX
+# =============================================================================
+
+class TextIndex:
+    """Positional inverted index over kernel text fields."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        self.kernels = {}       # kernel key -> {'path', 'title', 'fingerprint', 'docs'}
+        self.docs = {}          # doc id -> (kernel key, field, device index, device name, text)
+        self.postings = {}      # term -> {doc id: [positions]}
+        self.next_doc = 0
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """Load a saved index, or return an empty one."""
+        index = cls(path)
+        try:
+            with open(path, 'rb') as f:
+                version, state = pickle.load(f)
+            if version == INDEX_VERSION:
+                index.__dict__.update(state)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            pass
+        return index
+
+    def save(self):
+        state = {k: v for k, v in self.__dict__.items() if k != 'path'}
+        _write_sidecar(self.path, (INDEX_VERSION, state))
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+
+    def remove(self, key):
+        """Drop one kernel's documents from the index."""
+        entry = self.kernels.pop(key, None)
+        if entry is None:
+            return
+        for doc_id in entry['docs']:
+            text = self.docs.pop(doc_id)[4]
+            for term in set(words(text)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def add(self, path):
+        """Index one kernel (replacing any earlier version of it)."""
+        key = kernel_key(path)
+        self.remove(key)
+        kernel = Kernel.load(path)
+        doc_ids = []
+        for field, device_index, device_name, text in kernel_documents(kernel):
+            doc_id = self.next_doc
+            self.next_doc += 1
+            self.docs[doc_id] = (key, field, device_index, device_name, text)
+            doc_ids.append(doc_id)
+            for position, term in enumerate(words(text)):
+                self.postings.setdefault(term, {}).setdefault(doc_id, []).append(position)
+        self.kernels[key] = {
+            'path': str(path),
+            'title': kernel.title,
+            'fingerprint': fingerprint(path),
+            'docs': doc_ids,
+        }
+
+    def update(self, paths=None):
+        """
+        Bring the index up to date. Returns (added_or_changed, removed) counts.
+
+        With paths, those kernels are checked (and new ones added); without,
+        every kernel already in the index is re-checked. Kernels whose file
+        has gone are dropped.
+        """
+        if paths is None:
+            paths = [entry['path'] for entry in self.kernels.values()]
+        changed = removed = 0
+        for path in paths:
+            key = kernel_key(path)
+            try:
+                current = fingerprint(path)
+            except (OSError, FileNotFoundError):
+                if key in self.kernels:
+                    self.remove(key)
+                    removed += 1
+                continue
+            entry = self.kernels.get(key)
+            if entry is None or entry['fingerprint'] != current:
+                self.add(path)
+                changed += 1
+        return changed, removed
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def phrase_docs(self, phrase):
+        """Documents containing the words of phrase consecutively."""
+        terms = words(phrase)
+        if not terms:
+            return set()
+        lists = [self.postings.get(term) for term in terms]
+        if any(postings is None for postings in lists):
+            return set()
+        # Intersect from the rarest term, then check positions
+        candidates = set.intersection(*(set(postings) for postings in sorted(lists, key=len)))
+        matches = set()
+        for doc_id in candidates:
+            starts = set(lists[0][doc_id])
+            for offset, postings in enumerate(lists[1:], 1):
+                starts &= {p - offset for p in postings[doc_id]}
+                if not starts:
+                    break
+            if starts:
+                matches.add(doc_id)
+        return matches
+
+    def _parse(self, query):
+        """
+        Split a query into ('phrase', text) atoms and '(' ')' 'OR' 'AND' 'NOT'
+        operators. Raises ValueError for an atom with no words in it (e.g. a
+        bare '-' or "").
+        """
+        tokens = []
+        for quoted_minus, quoted, opening, closing, minus, word in _QUERY_TOKEN.findall(query):
+            if opening:
+                tokens.append('(')
+            elif closing:
+                tokens.append(')')
+            elif word in ('OR', 'AND', 'NOT') and not minus:
+                tokens.append(word)
+            else:
+                text = word or quoted
+                if text == '-':
+                    raise ValueError("'-' must be followed by a word or a quoted phrase")
+                if not words(text):
+                    raise ValueError(f'{text!r} has no words to search for')
+                if minus or quoted_minus:
+                    tokens.append('NOT')
+                tokens.append(('phrase', text))
+        return tokens
+
+    def _evaluate(self, tokens, universe):
+        """Recursive-descent evaluation: OR of ANDs of (NOT) atoms."""
+        def parse_or():
+            result = parse_and()
+            while tokens and tokens[0] == 'OR':
+                tokens.pop(0)
+                result = result | parse_and()
+            return result
+
+        def parse_and():
+            result = None
+            while tokens and tokens[0] not in ('OR', ')'):
+                if tokens[0] == 'AND':
+                    tokens.pop(0)
+                    continue
+                operand = parse_not()
+                result = operand if result is None else result & operand
+            return result if result is not None else set()
+
+        def parse_not():
+            if tokens and tokens[0] == 'NOT':
+                tokens.pop(0)
+                return universe - parse_not()
+            return parse_atom()
+
+        def parse_atom():
+            if not tokens:
+                raise ValueError('query ends with NOT (or -) and nothing to exclude')
+            token = tokens.pop(0)
+            if token == '(':
+                result = parse_or()
+                if tokens and tokens[0] == ')':
+                    tokens.pop(0)
+                return result
+            if token == ')':
+                return set()
+            return self.phrase_docs(token[1]) & universe
+
+        return parse_or()
+
+    def search(self, query, fields=None, kernels=None):
+        """
+        Run a boolean/phrase query.
+
+        fields restricts matches to field names (e.g. ['effect'] or
+        ['alignment_pattern.reader_effect']); kernels to kernel paths.
+        Returns result dicts in kernel, then field order. Raises ValueError
+        for a malformed query.
+        """
+        universe = set(self.docs)
+        if fields:
+            universe = {d for d in universe if any(
+                self.docs[d][1] == f or self.docs[d][1].endswith('.' + f) for f in fields)}
+        if kernels:
+            keys = {kernel_key(path) for path in kernels}
+            universe = {d for d in universe if self.docs[d][0] in keys}
+
+        results = []
+        for doc_id in sorted(self._evaluate(self._parse(query), universe)):
+            key, field, device_index, device_name, text = self.docs[doc_id]
+            results.append({
+                'kernel': self.kernels[key]['path'],
+                'title': self.kernels[key]['title'],
+                'field': field,
+                'device': device_index,
+                'device_name': device_name,
+                'text': text,
+            })
+        return results
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('update', 'search'):
+        print('Usage: python text_index.py update <kernels/ | kernel.json> [...] [--index PATH]')
+        print('       python text_index.py search "<query>" [--field NAME] [--index PATH]')
+        sys.exit(1)
+
+    args = sys.argv[2:]
+    index_path = INDEX_PATH
+    fields = []
+    rest = []
+    while args:
+        arg = args.pop(0)
+        if arg == '--index':
+            index_path = args.pop(0)
+        elif arg == '--field':
+            fields.append(args.pop(0))
+        else:
+            rest.append(arg)
+
+    index = TextIndex.load(index_path)
+
+    if sys.argv[1] == 'update':
+        paths = [path for arg in rest for path in kernel_paths(arg)]
+        changed, removed = index.update(paths)
+        index.save()
+        print(f'Indexed: {changed} kernel(s) updated, {removed} removed, '
+              f'{len(index.kernels)} total, {len(index.postings):,} terms')
+        return
+
+    changed, removed = index.update()
+    if changed or removed:
+        index.save()
+        print(f'(refreshed {changed} changed kernel(s), dropped {removed})\n')
+
+    try:
+        results = index.search(' '.join(rest), fields=fields)
+    except ValueError as e:
+        print(f'✗ Bad query: {e}')
+        sys.exit(1)
+    for result in results:
+        where = result['field']
+        if result['device'] is not None:
+            where = f'{result["device_name"]} [{result["device"]}].{where.split(".")[-1]}'
+        text = result['text'] if len(result['text']) <= 160 else result['text'][:157] + '...'
+        print(f'{result["title"]} — {where}')
+        print(f'  {text}')
+    print(f'\n{len(results)} match(es)')
+
+
+if __name__ == '__main__':
+    main()
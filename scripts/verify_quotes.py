@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Verify Quotes
+Checks every device anchor_phrase against the kernel's band text in a single
+pass per band, using one Aho-Corasick automaton built from all phrases.
+
+For each device it records where the quote was found (band offset and
+chapter), recomputes location_percent from that offset, and flags devices
+whose quote sits in a different band from the one they are assigned to.
+
+With --fuzzy, quotes that fail exact matching are relocated through the
+n-gram anchor index (fuzzy_anchor.py); with --write the relocated span
+replaces the stored anchor_phrase.
+
+Usage:
+    python scripts/verify_quotes.py kernels/To_Kill_a_Mockingbird_kernel_v6_1.json
+    python scripts/verify_quotes.py kernels/ [--fuzzy] [--write]
+
+    --fuzzy   relocate quotes that fail exact matching
+    --write   store quote_verified, quote_offset, quote_band, quote_chapter
+              and location_percent back into each kernel file
+"""
+
+import json
+import sys
+from collections import deque
+from pathlib import Path
+
+from chapter_index import ChapterIndex
+from fuzzy_anchor import MIN_SCORE, AnchorIndex
+from kernel_archive import is_member_path, kernel_paths
+from kernel_model import Kernel
+
+
+# =============================================================================
+# AHO-CORASICK AUTOMATON
+# =============================================================================
+
+def build_automaton(phrases):
+    """Build goto/fail/output tables (plus phrase lengths) for a list of phrases."""
+    goto = [{}]
+    output = [[]]
+
+    for pattern_id, phrase in enumerate(phrases):
+        state = 0
+        for char in phrase:
+            next_state = goto[state].get(char)
+            if next_state is None:
+                next_state = len(goto)
+                goto[state][char] = next_state
+                goto.append({})
+                output.append([])
+            state = next_state
+        output[state].append(pattern_id)
+
+    # Breadth-first pass to wire failure links and merge outputs
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            queue.append(next_state)
+            fallback = fail[state]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[next_state] = goto[fallback].get(char, 0)
+            output[next_state] = output[next_state] + output[fail[next_state]]
+
+    return goto, fail, output, [len(phrase) for phrase in phrases]
+
+
+def scan(automaton, text):
+    """Yield (start_offset, pattern_id) for every phrase occurrence in text."""
+    goto, fail, output, lengths = automaton
+    state = 0
+    for position, char in enumerate(text):
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for pattern_id in output[state]:
+            yield position - lengths[pattern_id] + 1, pattern_id
+
+
+# =============================================================================
+# VERIFICATION
+# =============================================================================
+
+def band_location(band_meta, offset, band_chars):
+    """Convert a char offset inside a band into a whole-book percentage."""
+    start = band_meta.get('start_percent', 0)
+    end = band_meta.get('end_percent', start)
+    if not band_chars:
+        return float(start)
+    return round(start + (end - start) * offset / band_chars, 1)
+
+
+def verify_kernel(kernel, fuzzy=False):
+    """
+    Verify all device quotes in one indexed Kernel.
+
+    Returns a list of per-device results, or None when the kernel carries
+    no band text to verify against. With fuzzy=True, unmatched quotes are
+    relocated and reported with status 'relocated' and the recovered text.
+    """
+    bands = kernel.data.band_names()
+    if not bands:
+        return None
+
+    phrases = sorted({d.anchor_phrase for d in kernel.devices if d.anchor_phrase})
+    phrase_ids = {phrase: i for i, phrase in enumerate(phrases)}
+    automaton = build_automaton(phrases)
+
+    # phrase id -> {band: first offset}, plus band lengths for percentages
+    found = {}
+    band_chars = {}
+    for band in bands:
+        text = kernel.band_text(band)
+        band_chars[band] = len(text)
+        for offset, pattern_id in scan(automaton, text):
+            found.setdefault(pattern_id, {}).setdefault(band, offset)
+
+    chapters = ChapterIndex.load(kernel.data)
+    anchor_index = None
+    results = []
+    for device in kernel.devices:
+        result = {
+            'index': device.index,
+            'name': device.name,
+            'band': device.band,
+            'status': 'not_found',
+            'found_band': None,
+            'offset': None,
+            'chapter': None,
+            'location_percent': device.location_percent,
+        }
+        hits = found.get(phrase_ids.get(device.anchor_phrase), {})
+        if hits:
+            found_band = device.band if device.band in hits else next(iter(hits))
+            result['status'] = 'verified' if found_band == device.band else 'band_mismatch'
+            result['found_band'] = found_band
+            result['offset'] = hits[found_band]
+            result['location_percent'] = band_location(
+                kernel.bands.get(found_band, {}), hits[found_band], band_chars[found_band]
+            )
+        elif fuzzy and device.anchor_phrase:
+            if anchor_index is None:
+                anchor_index = AnchorIndex.load(kernel.data)
+            match = anchor_index.locate(device.anchor_phrase, band=device.band)
+            if match and match['score'] >= MIN_SCORE:
+                result['status'] = 'relocated'
+                result['found_band'] = match['band']
+                result['offset'] = match['start']
+                result['score'] = match['score']
+                result['anchor_phrase'] = kernel.band_text(match['band'])[match['start']:match['end']]
+                result['location_percent'] = band_location(
+                    kernel.bands.get(match['band'], {}), match['start'], band_chars[match['band']]
+                )
+        if result['offset'] is not None:
+            result['chapter'] = chapters.chapter_at(chapters.band_offset(result['found_band']) + result['offset'])
+        results.append(result)
+
+    return results
+
+
+def write_results(kernel_path, kernel, results):
+    """Store verification results back into the kernel JSON file."""
+    data = kernel.data.materialize()
+    for result in results:
+        device = data['micro_devices'][result['index']]
+        device['quote_verified'] = result['status'] in ('verified', 'relocated')
+        if result['status'] == 'relocated':
+            device['anchor_phrase'] = result['anchor_phrase']
+            device['extraction_method'] = 'fuzzy_relocation'
+        if result['offset'] is not None:
+            device['quote_offset'] = result['offset']
+            device['quote_band'] = result['found_band']
+            device['quote_chapter'] = result['chapter']
+            device['location_percent'] = result['location_percent']
+    with open(kernel_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+# =============================================================================
+# MAIN FUNCTIONS
+# =============================================================================
+
+def verify_quotes(kernel_path, write=False, fuzzy=False):
+    """Verify one kernel file and print a report."""
+    kernel_path = Path(kernel_path)
+    print(f'Processing: {kernel_path}')
+
+    kernel = Kernel.load(kernel_path)
+    results = verify_kernel(kernel, fuzzy=fuzzy)
+    if results is None:
+        print('  No band_extraction text, skipped\n')
+        return None
+
+    counts = {'verified': 0, 'relocated': 0, 'band_mismatch': 0, 'not_found': 0}
+    for result in results:
+        counts[result['status']] += 1
+        if result['status'] == 'band_mismatch':
+            print(f'  ⚠ {result["name"]}: assigned to {result["band"]}, quote found in {result["found_band"]}')
+        elif result['status'] == 'not_found':
+            print(f'  ✗ {result["name"]} ({result["band"]}): quote not found')
+        elif result['status'] == 'relocated':
+            where = result['found_band']
+            if result['found_band'] != result['band']:
+                where += f' (assigned {result["band"]})'
+            print(f'  ~ {result["name"]}: relocated in {where} (score {result["score"]})')
+            print(f'      "{result["anchor_phrase"]}"')
+
+    print(f'  ✓ Verified: {counts["verified"]}')
+    if fuzzy:
+        print(f'  ~ Relocated: {counts["relocated"]}')
+    print(f'  ⚠ Band mismatch: {counts["band_mismatch"]}')
+    print(f'  ✗ Not found: {counts["not_found"]}')
+
+    if write and is_member_path(kernel_path):
+        print('  ⚠ Archive member is read-only, not written')
+    elif write:
+        write_results(kernel_path, kernel, results)
+        print(f'  Written: {kernel_path}')
+    print()
+
+    return results
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: python verify_quotes.py <kernel.json> [kernel2.json ...] [--fuzzy] [--write]')
+        print('       python verify_quotes.py kernels/ [--fuzzy] [--write]')
+        sys.exit(1)
+
+    write = '--write' in sys.argv[1:]
+    fuzzy = '--fuzzy' in sys.argv[1:]
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            continue
+        paths.extend(kernel_paths(arg))
+
+    print(f'Found {len(paths)} kernel(s) to verify\n')
+    for kernel_path in paths:
+        verify_quotes(kernel_path, write=write, fuzzy=fuzzy)
+
+
+if __name__ == '__main__':
+    main()